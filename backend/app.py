@@ -5,22 +5,33 @@ import uuid
 import logging
 import base64
 import tempfile
+import json
+import secrets
+import contextlib
 import soundfile as sf
 import numpy as np
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Union
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException, status, BackgroundTasks, Depends
+from fastapi import FastAPI, HTTPException, status, BackgroundTasks, Depends, Query, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import APIKeyHeader
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse
 import uvicorn
 
 from pydantic import BaseModel, Field
 
 # 화자 인식 모듈 import
 from src.speaker_recognition import SpeakerRecognition
+from src.sharded_gallery import parse_addresses
+from src.metadata_store import SpeakerMetadataStore
+from src.profiling import RequestProfiler, span
+from src.tuned_profile import load_tuned_profile, DEFAULT_PROFILE_FILE
+from src.long_audio import LongAudioPolicy
+from src.pcm_stream import decode_pcm_bytes, PcmStreamRegistry, PCM_SAMPLE_RATE
+from src.enrollment_queue import EnrollmentQueue, EnrollmentWorker, JOB_QUEUED
+from src.gallery_migration import GalleryMigration
 
 # 로그 디렉토리 생성
 os.makedirs("logs", exist_ok=True)
@@ -40,9 +51,63 @@ logger = logging.getLogger("speaker_server")
 API_KEY_NAME = "X-API-Key"
 API_KEY_HEADER = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
+# 관리자 API 키 (프로파일링 설정/X-Profile 등 서버 동작을 바꾸는 요청용, 비어 있으면 관리자 API 비활성화)
+ADMIN_KEY_NAME = "X-Admin-Key"
+ADMIN_KEY_HEADER = APIKeyHeader(name=ADMIN_KEY_NAME, auto_error=False)
+ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY", "")
+
 # 임베딩 저장 파일 경로
 DEFAULT_EMBEDDINGS_FILE = os.environ.get("EMBEDDINGS_FILE", "speaker_embeddings.pkl")
 
+# PCA 식별 인덱스의 투영(압축기) 파일 경로 (비어 있으면 원본 임베딩으로 유사도 계산)
+COMPACTOR_FILE = os.environ.get("COMPACTOR_FILE", "")
+
+# 화자 메타데이터 DB 경로 (SQLite)
+DEFAULT_METADATA_DB = os.environ.get("METADATA_DB", "speaker_metadata.db")
+
+# 비동기 등록 작업 큐 (SQLite, 재시작 후에도 접수된 작업 유지)
+ENROLLMENT_DB = os.environ.get("ENROLLMENT_DB", "enrollment_jobs.db")
+ENROLLMENT_BATCH_SIZE = int(os.environ.get("ENROLLMENT_BATCH_SIZE", "8"))
+ENROLLMENT_BATCH_WAIT = float(os.environ.get("ENROLLMENT_BATCH_WAIT", "0.2"))
+
+# 음성 인식 텍스트용 ASR 모델 태그 (비어 있으면 기본 모델)
+ASR_MODEL_TAG = os.environ.get("ASR_MODEL_TAG", "")
+
+# 화자 임베딩 전용 모델 (ESPnet2 spk 체크포인트 디렉터리 또는 모델 태그)
+# 지정하면 새 갤러리는 이 모델로 임베딩하고 ASR 모델은 텍스트가 필요할 때만 로드
+# (기존 갤러리는 파일에 기록된 추출기로 서빙하며, 바꾸려면 마이그레이션 실행)
+SPEAKER_EMBEDDING_MODEL = os.environ.get("SPEAKER_EMBEDDING_MODEL", "")
+
+# 등록 음성 특징(fbank) 저장 디렉터리 (모델 교체 시 재임베딩에 사용, 비어 있으면 저장하지 않음)
+FEATURE_STORE_DIR = os.environ.get("FEATURE_STORE_DIR", "features")
+
+# 갤러리 샤드 주소 ("host:port,host:port", 비어 있으면 단일 프로세스 모드)
+GALLERY_SHARDS = parse_addresses(os.environ.get("GALLERY_SHARDS", ""))
+
+# CPU 스레드 수 (0이면 튜닝 프로파일, 없으면 cgroup 할당량을 반영한 CPU 수)
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.environ.get("TORCH_INTEROP_THREADS", "0"))
+
+# 업로드 제한 (디코딩 전 크기 확인, 디코딩은 최대 길이에서 중단)
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_AUDIO_SECONDS = float(os.environ.get("MAX_AUDIO_SECONDS", "300"))
+
+# 긴 음성 정책 (기준 길이를 넘으면 고정 길이 구간 K개만 샘플링하여 임베딩)
+LONG_AUDIO_MAX_SINGLE_SECONDS = float(os.environ.get("LONG_AUDIO_MAX_SINGLE_SECONDS", "20"))
+LONG_AUDIO_SEGMENT_SECONDS = float(os.environ.get("LONG_AUDIO_SEGMENT_SECONDS", "4"))
+LONG_AUDIO_NUM_SEGMENTS = int(os.environ.get("LONG_AUDIO_NUM_SEGMENTS", "5"))
+
+# 실시간 PCM 스트리밍 설정 (최근 WINDOW초 구간을 HOP초마다 식별)
+PCM_STREAM_WINDOW_SECONDS = float(os.environ.get("PCM_STREAM_WINDOW_SECONDS", "3"))
+PCM_STREAM_HOP_SECONDS = float(os.environ.get("PCM_STREAM_HOP_SECONDS", "1"))
+PCM_STREAM_IDLE_TIMEOUT = float(os.environ.get("PCM_STREAM_IDLE_TIMEOUT", "60"))
+
+# 요청 프로파일링 설정 (샘플링 비율 0이면 X-Profile 헤더가 있는 요청만 프로파일링)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODES = os.environ.get("PROFILE_MODES", "spans")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "logs/profiles")
+PROFILE_MAX_ARTIFACTS = int(os.environ.get("PROFILE_MAX_ARTIFACTS", "50"))
+
 # API 키 목록 (실제로는 환경 변수나 보안 스토리지에서 로드해야 함)
 API_KEYS = {
     "test_api_key_1234": "test_client",
@@ -59,12 +124,27 @@ class SpeakerRegisterRequest(BaseModel):
 class SpeakerIdentifyRequest(BaseModel):
     audioData: str = Field(..., description="Base64로 인코딩된 오디오 데이터")
     threshold: float = Field(default=0.7, ge=0.0, le=1.0, description="유사도 임계값")
+    includeText: bool = Field(default=True, description="음성 인식 텍스트 포함 여부 (false면 화자 임베딩만 추출)")
     metaverseContext: Optional[Dict[str, Any]] = Field(default_factory=dict, description="메타버스 컨텍스트")
 
+class SpeakerVerifyRequest(BaseModel):
+    audioData: str = Field(..., description="Base64로 인코딩된 오디오 데이터")
+    threshold: float = Field(default=0.7, ge=0.0, le=1.0, description="유사도 임계값")
+
 class BatchRequest(BaseModel):
     operation: str = Field(..., description="작업 유형 (register, identify, delete)")
     items: List[Dict[str, Any]] = Field(..., description="작업 항목 목록")
 
+class ProfilingConfigRequest(BaseModel):
+    sampleRate: Optional[float] = Field(default=None, ge=0.0, le=1.0, description="프로파일링할 요청 비율")
+    modes: Optional[List[str]] = Field(default=None, description="프로파일링 방식 (spans, torch, cprofile)")
+    maxArtifacts: Optional[int] = Field(default=None, ge=1, description="보관할 최대 프로파일 수")
+
+class MigrationRequest(BaseModel):
+    target: str = Field(..., description="새 추출기 (ASR 모델 태그 또는 spk-v1@<체크포인트>)")
+    batchSize: int = Field(default=16, ge=1, description="진행 상황을 갱신하는 재임베딩 단위")
+    dropMissing: bool = Field(default=False, description="특징이 없는 화자를 제외하고 진행")
+
 class AudioFile(BaseModel):
     filename: str
     content: str  # base64 encoded
@@ -99,7 +179,21 @@ app.add_middleware(
 speaker_model = None
 request_count = 0
 start_time = time.time()
-speaker_metadata = {}  # 화자별 메타데이터 저장
+metadata_store = None  # 화자별 메타데이터 저장소 (SQLite)
+enrollment_queue = None  # 비동기 등록 작업 큐
+enrollment_worker = None  # 등록 작업 백그라운드 워커
+gallery_migration = None  # 진행 중이거나 마지막으로 실행한 모델 교체 작업
+request_profiler = RequestProfiler(
+    output_dir=PROFILE_DIR,
+    max_artifacts=PROFILE_MAX_ARTIFACTS,
+    sample_rate=PROFILE_SAMPLE_RATE,
+    modes=PROFILE_MODES
+)
+pcm_streams = PcmStreamRegistry(  # 진행 중인 실시간 PCM 스트림
+    window_seconds=PCM_STREAM_WINDOW_SECONDS,
+    hop_seconds=PCM_STREAM_HOP_SECONDS,
+    idle_timeout=PCM_STREAM_IDLE_TIMEOUT
+)
 
 def verify_api_key(api_key: str = Depends(API_KEY_HEADER)) -> str:
     """API 키 검증"""
@@ -116,10 +210,59 @@ def verify_api_key(api_key: str = Depends(API_KEY_HEADER)) -> str:
         detail="유효하지 않은 API 키입니다"
     )
 
+def verify_admin_key(admin_key: Optional[str] = Depends(ADMIN_KEY_HEADER)) -> str:
+    """관리자 API 키 검증 (클라이언트 API 키와 별도)"""
+    if not ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="관리자 API가 비활성화되어 있습니다 (ADMIN_API_KEY 설정 필요)"
+        )
+    if not admin_key:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="관리자 API 키가 필요합니다",
+            headers={"WWW-Authenticate": ADMIN_KEY_NAME},
+        )
+    if not secrets.compare_digest(admin_key.encode(), ADMIN_API_KEY.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="유효하지 않은 관리자 API 키입니다"
+        )
+    return admin_key
+
+def requested_profile(
+    x_profile: Optional[str] = Header(default=None, description="프로파일링 요청 (1, torch, cprofile, all, X-Admin-Key 필요)"),
+    admin_key: Optional[str] = Depends(ADMIN_KEY_HEADER)
+) -> Optional[str]:
+    """X-Profile 헤더 (프로파일링은 서버 전체를 느리게 하므로 관리자 키가 있는 요청만 허용)"""
+    if x_profile:
+        verify_admin_key(admin_key)
+    return x_profile
+
+def start_request_profile(name: str, x_profile: Optional[str]):
+    """프로파일링 대상이면 프로파일 컨텍스트, 아니면 아무것도 하지 않는 컨텍스트 반환"""
+    try:
+        modes = request_profiler.select(x_profile)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if modes is None:
+        return contextlib.nullcontext()
+    return request_profiler.profile(name, modes)
+
 def decode_audio_data(audio_data: str) -> str:
     """Base64 오디오 데이터를 WAV 파일로 변환"""
     import subprocess
     
+    # 디코딩 전에 크기 제한 확인 (Base64는 원본의 약 4/3 크기)
+    if len(audio_data) * 3 // 4 > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"오디오 데이터가 너무 큽니다 (최대 {MAX_UPLOAD_BYTES} 바이트)"
+        )
+
     try:
         # Base64 디코딩
         audio_bytes = base64.b64decode(audio_data)
@@ -142,6 +285,7 @@ def decode_audio_data(audio_data: str) -> str:
                 '-acodec', 'pcm_s16le',   # 오디오 코덱: 16-bit PCM
                 '-ar', '16000',           # 샘플링 레이트: 16kHz
                 '-ac', '1',               # 모노 채널
+                '-t', str(MAX_AUDIO_SECONDS),  # 최대 길이까지만 디코딩
                 '-y',                     # 덮어쓰기 허용
                 temp_wav.name             # 출력 wav 파일
             ]
@@ -187,18 +331,177 @@ def decode_audio_data(audio_data: str) -> str:
             detail=f"유효하지 않은 오디오 데이터: {str(e)}"
         )
 
+async def read_pcm_body(request: Request, allow_empty: bool = False) -> np.ndarray:
+    """
+    요청 본문의 16kHz 모노 Int16 PCM을 파형으로 변환 (수신 중 크기 제한 확인, ffmpeg 변환 없음)
+    allow_empty이면 빈 본문을 빈 파형으로 반환 (보낼 음성이 없는 스트림 마지막 프레임)
+    """
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"오디오 데이터가 너무 큽니다 (최대 {MAX_UPLOAD_BYTES} 바이트)"
+            )
+        chunks.append(chunk)
+    if allow_empty and received == 0:
+        return np.zeros(0, dtype=np.float32)
+    try:
+        return decode_pcm_bytes(b"".join(chunks), max_seconds=MAX_AUDIO_SECONDS)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"유효하지 않은 PCM 데이터: {str(e)}"
+        )
+
+def enqueue_registration(speaker_id: str, waveform: np.ndarray, sample_rate: int,
+                         api_key: str, metadata: Optional[Dict[str, Any]]) -> JSONResponse:
+    """등록 작업을 디스크 큐에 넣고 202 Accepted 응답 반환"""
+    job_id = enrollment_queue.submit(
+        speaker_id, waveform, sample_rate,
+        client=API_KEYS.get(api_key, "unknown"),
+        metadata=metadata
+    )
+    logger.info(f"화자 등록 작업 접수: {speaker_id} (작업 ID: {job_id})")
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "status": "accepted",
+            "message": "화자 등록 작업이 접수되었습니다",
+            "anonymousId": speaker_id,
+            "jobId": job_id,
+            "statusUrl": f"/jobs/{job_id}",
+            "timestamp": datetime.now().isoformat()
+        }
+    )
+
+def identify_waveform(waveform: np.ndarray, threshold: float, include_text: bool):
+    """16kHz PCM 파형 화자 식별 (텍스트가 필요 없으면 음성 인식 없이 임베딩만 추출)"""
+    if include_text:
+        return speaker_model.identify_speaker_waveform_with_text(waveform, PCM_SAMPLE_RATE, threshold=threshold)
+    speaker_id, similarity = speaker_model.identify_speaker_waveform(waveform, PCM_SAMPLE_RATE, threshold=threshold)
+    return speaker_id, similarity, None
+
+def build_identify_result(speaker_id, similarity, recognized_text, threshold, processing_time) -> Dict[str, Any]:
+    """화자 식별 응답 생성 (알려진 화자면 메타데이터 포함)"""
+    is_known = speaker_id is not None
+    
+    result = {
+        "status": "success",
+        "anonymousId": speaker_id,
+        "confidence": float(similarity),
+        "isKnownSpeaker": is_known,
+        "threshold": threshold,
+        "processingTimeSeconds": round(processing_time, 3),
+        "recognizedText": recognized_text,  # 음성 인식 텍스트 추가
+        "timestamp": datetime.now().isoformat()
+    }
+    
+    # 알려진 화자인 경우 메타데이터 포함
+    speaker_info = metadata_store.get(speaker_id) if is_known else None
+    if speaker_info:
+        result["speakerInfo"] = {
+            "registered_at": speaker_info["registeredAt"],
+            "metadata": speaker_info["metadata"],
+            "client": speaker_info["client"]
+        }
+    return result
+
+def verify_claimed_speaker(speaker_id: str, waveform_source, threshold: float) -> Dict[str, Any]:
+    """
+    1:1 화자 검증 공통 처리
+    Args:
+        speaker_id: 주장한 화자 ID
+        waveform_source: () -> (파형, 샘플링 레이트) (등록 여부 확인 후에 호출)
+        threshold: 유사도 임계값
+    """
+    # 등록되지 않은 화자면 디코딩/추론 없이 바로 404
+    if not speaker_model.has_speaker(speaker_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"화자를 찾을 수 없습니다: {speaker_id}"
+        )
+    
+    waveform, sample_rate = waveform_source()
+    start_time_verify = time.time()
+    try:
+        verified, similarity = speaker_model.verify_speaker_waveform(
+            speaker_id, waveform, sample_rate, threshold=threshold
+        )
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"화자를 찾을 수 없습니다: {speaker_id}"
+        )
+    processing_time = time.time() - start_time_verify
+    
+    logger.info(f"화자 검증 결과: {speaker_id} {'일치' if verified else '불일치'} (유사도: {similarity:.4f})")
+    return {
+        "status": "success",
+        "anonymousId": speaker_id,
+        "verified": bool(verified),
+        "confidence": float(similarity),
+        "threshold": threshold,
+        "processingTimeSeconds": round(processing_time, 3),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.on_event("startup")
 async def startup_event():
     """서버 시작 시 화자 인식 모델 로드"""
-    global speaker_model
+    global speaker_model, metadata_store, enrollment_queue, enrollment_worker
     try:
+        tuned_profile = load_tuned_profile()
+        if tuned_profile:
+            logger.info(f"튜닝 프로파일 적용: {DEFAULT_PROFILE_FILE} "
+                        f"(intra-op {tuned_profile.get('intra_op_threads')}, inter-op {tuned_profile.get('inter_op_threads')})")
         logger.info("화자 인식 모델을 로딩 중입니다...")
-        speaker_model = SpeakerRecognition(DEFAULT_EMBEDDINGS_FILE)
-        logger.info(f"화자 인식 서버가 시작되었습니다. 등록된 화자 수: {len(speaker_model.speaker_embeddings)}")
+        speaker_model = SpeakerRecognition(
+            DEFAULT_EMBEDDINGS_FILE,
+            shard_addresses=GALLERY_SHARDS,
+            compactor_file=COMPACTOR_FILE or None,
+            num_threads=TORCH_NUM_THREADS or None,
+            interop_threads=TORCH_INTEROP_THREADS or None,
+            long_audio_policy=LongAudioPolicy(
+                max_single_seconds=LONG_AUDIO_MAX_SINGLE_SECONDS,
+                segment_seconds=LONG_AUDIO_SEGMENT_SECONDS,
+                num_segments=LONG_AUDIO_NUM_SEGMENTS
+            ),
+            model_tag=ASR_MODEL_TAG or None,
+            feature_store_dir=FEATURE_STORE_DIR or None,
+            speaker_model=SPEAKER_EMBEDDING_MODEL or None
+        )
+        
+        metadata_store = SpeakerMetadataStore(DEFAULT_METADATA_DB)
+        enrollment_queue = EnrollmentQueue(ENROLLMENT_DB)
+        enrollment_worker = EnrollmentWorker(
+            enrollment_queue, speaker_model, metadata_store,
+            batch_size=ENROLLMENT_BATCH_SIZE,
+            batch_wait=ENROLLMENT_BATCH_WAIT
+        )
+        # 갤러리에 저장된 뒤 중단된 등록은 다시 임베딩하지 않고 메타데이터만 마무리
+        enrollment_worker.recover()
+        
+        # 메타데이터 저장소를 임베딩 저장소와 동기화
+        metadata_store.sync_embedding_counts(speaker_model.get_embedding_counts())
+        
+        # 비동기 등록 워커 시작 (재시작 전에 접수된 작업부터 처리)
+        enrollment_worker.start()
+        logger.info(f"임베딩 추출기: {speaker_model.extractor_version} (ASR 모델 로드됨: {speaker_model.asr_loaded})")
+        logger.info(f"화자 인식 서버가 시작되었습니다. 등록된 화자 수: {speaker_model.get_speaker_count()}, "
+                    f"대기 중인 등록 작업: {enrollment_queue.count(JOB_QUEUED)}")
     except Exception as e:
         logger.error(f"모델 로딩 실패: {e}")
         raise e
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """진행 중인 등록 배치를 마치고 종료 (남은 작업은 다음 시작 때 처리)"""
+    if enrollment_worker is not None:
+        enrollment_worker.stop()
+
 @app.get("/health")
 async def health_check():
     """서버 상태 확인"""
@@ -209,7 +512,7 @@ async def health_check():
         "status": "ok",
         "uptime_seconds": round(uptime, 2),
         "requests_processed": request_count,
-        "registered_speakers": len(speaker_model.speaker_embeddings) if speaker_model else 0,
+        "registered_speakers": metadata_store.count() if metadata_store else 0,
         "timestamp": datetime.now().isoformat()
     }
 
@@ -217,42 +520,166 @@ async def health_check():
 async def register_speaker(
     request: SpeakerRegisterRequest,
     background_tasks: BackgroundTasks,
-    api_key: str = Depends(verify_api_key)
+    async_mode: bool = Query(default=False, alias="async", description="true면 작업 큐에 넣고 202와 작업 ID를 바로 반환"),
+    api_key: str = Depends(verify_api_key),
+    x_profile: Optional[str] = Depends(requested_profile)
 ):
     """화자 등록"""
     global request_count
     request_count += 1
     
-    try:
-        logger.info(f"화자 등록 요청: {request.anonymousId}")
-        
-        # 오디오 데이터 디코딩
-        temp_audio_path = decode_audio_data(request.audioData)
-        
+    # 프로파일링 대상 요청이면 단계별 구간과 프로파일 결과를 기록
+    with start_request_profile("register", x_profile) as trace:
         try:
-            # 화자 등록
-            speaker_model.register_speaker(request.anonymousId, temp_audio_path, save_immediately=True)
+            logger.info(f"화자 등록 요청: {request.anonymousId}")
             
-            # 메타데이터 저장
-            speaker_metadata[request.anonymousId] = {
-                "registered_at": datetime.now().isoformat(),
-                "metadata": request.metadata,
-                "client": API_KEYS.get(api_key, "unknown")
-            }
+            # 오디오 데이터 디코딩
+            with span("decode_audio"):
+                temp_audio_path = decode_audio_data(request.audioData)
+            
+            try:
+                # 비동기 등록: 디코딩된 음성만 큐에 넣고 바로 응답
+                if async_mode:
+                    waveform, sample_rate = sf.read(temp_audio_path, dtype="float32")
+                    return enqueue_registration(request.anonymousId, waveform, sample_rate, api_key, request.metadata)
+                
+                # 화자 등록
+                speaker_model.register_speaker(request.anonymousId, temp_audio_path, save_immediately=True)
+                
+                # 메타데이터 저장
+                metadata_store.record_registration(
+                    request.anonymousId,
+                    API_KEYS.get(api_key, "unknown"),
+                    request.metadata
+                )
+                
+                logger.info(f"화자 등록 완료: {request.anonymousId}")
+                
+                result = {
+                    "status": "success",
+                    "message": "화자가 성공적으로 등록되었습니다",
+                    "anonymousId": request.anonymousId,
+                    "timestamp": datetime.now().isoformat()
+                }
+                if trace is not None:
+                    result["profileId"] = trace.profile_id
+                
+                return result
+                
+            finally:
+                # 임시 파일 정리
+                background_tasks.add_task(os.unlink, temp_audio_path)
+                
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"화자 등록 실패: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"화자 등록 중 오류가 발생했습니다: {str(e)}"
+            )
+
+@app.post("/speakers/identify")
+async def identify_speaker(
+    request: SpeakerIdentifyRequest,
+    background_tasks: BackgroundTasks,
+    api_key: str = Depends(verify_api_key),
+    x_profile: Optional[str] = Depends(requested_profile)
+):
+    """화자 식별"""
+    global request_count
+    request_count += 1
+    
+    # 프로파일링 대상 요청이면 단계별 구간과 프로파일 결과를 기록
+    with start_request_profile("identify", x_profile) as trace:
+        try:
+            logger.info("화자 식별 요청")
             
-            logger.info(f"화자 등록 완료: {request.anonymousId}")
+            # 오디오 데이터 디코딩
+            with span("decode_audio"):
+                temp_audio_path = decode_audio_data(request.audioData)
+            
+            try:
+                # 화자 식별 (요청 시 음성 인식 텍스트 포함)
+                start_time_identify = time.time()
+                if request.includeText:
+                    speaker_id, similarity, recognized_text = speaker_model.identify_speaker_with_text(
+                        temp_audio_path, 
+                        threshold=request.threshold
+                    )
+                else:
+                    speaker_id, similarity = speaker_model.identify_speaker(temp_audio_path, threshold=request.threshold)
+                    recognized_text = None
+                processing_time = time.time() - start_time_identify
+                
+                result = build_identify_result(
+                    speaker_id, similarity, recognized_text, request.threshold, processing_time
+                )
+                
+                if trace is not None:
+                    result["profileId"] = trace.profile_id
+                
+                logger.info(f"화자 식별 결과: {speaker_id} (유사도: {similarity:.4f})")
+                
+                return result
+                
+            finally:
+                # 임시 파일 정리
+                background_tasks.add_task(os.unlink, temp_audio_path)
+                
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"화자 식별 실패: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"화자 식별 중 오류가 발생했습니다: {str(e)}"
+            )
+
+@app.post("/speakers/register/pcm")
+async def register_speaker_pcm(
+    request: Request,
+    anonymousId: str = Query(..., description="익명 화자 ID"),
+    metadata: Optional[str] = Query(default=None, description="추가 메타데이터 (JSON 문자열)"),
+    async_mode: bool = Query(default=False, alias="async", description="true면 작업 큐에 넣고 202와 작업 ID를 바로 반환"),
+    api_key: str = Depends(verify_api_key),
+    x_profile: Optional[str] = Depends(requested_profile)
+):
+    """화자 등록 (본문: 16kHz 모노 Int16 PCM, 서버 측 디코딩 없음)"""
+    global request_count
+    request_count += 1
+    
+    try:
+        speaker_metadata = json.loads(metadata) if metadata else {}
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"유효하지 않은 메타데이터: {str(e)}"
+        )
+    
+    try:
+        logger.info(f"화자 등록 요청 (PCM): {anonymousId}")
+        waveform = await read_pcm_body(request)
+        if async_mode:
+            return enqueue_registration(anonymousId, waveform, PCM_SAMPLE_RATE, api_key, speaker_metadata)
+        
+        with start_request_profile("register_pcm", x_profile) as trace:
+            speaker_model.register_speaker_waveform(anonymousId, waveform, PCM_SAMPLE_RATE, save_immediately=True)
+            metadata_store.record_registration(anonymousId, API_KEYS.get(api_key, "unknown"), speaker_metadata)
             
-            return {
+            logger.info(f"화자 등록 완료: {anonymousId} ({len(waveform) / PCM_SAMPLE_RATE:.1f}초)")
+            result = {
                 "status": "success",
                 "message": "화자가 성공적으로 등록되었습니다",
-                "anonymousId": request.anonymousId,
+                "anonymousId": anonymousId,
                 "timestamp": datetime.now().isoformat()
             }
-            
-        finally:
-            # 임시 파일 정리
-            background_tasks.add_task(os.unlink, temp_audio_path)
-            
+            if trace is not None:
+                result["profileId"] = trace.profile_id
+            return result
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"화자 등록 실패: {e}")
         raise HTTPException(
@@ -260,84 +687,194 @@ async def register_speaker(
             detail=f"화자 등록 중 오류가 발생했습니다: {str(e)}"
         )
 
-@app.post("/speakers/identify")
-async def identify_speaker(
-    request: SpeakerIdentifyRequest,
-    background_tasks: BackgroundTasks,
-    api_key: str = Depends(verify_api_key)
+@app.post("/speakers/identify/pcm")
+async def identify_speaker_pcm(
+    request: Request,
+    threshold: float = Query(default=0.7, ge=0.0, le=1.0, description="유사도 임계값"),
+    includeText: bool = Query(default=True, description="음성 인식 텍스트 포함 여부"),
+    api_key: str = Depends(verify_api_key),
+    x_profile: Optional[str] = Depends(requested_profile)
 ):
-    """화자 식별"""
+    """화자 식별 (본문: 16kHz 모노 Int16 PCM, 서버 측 디코딩 없음)"""
     global request_count
     request_count += 1
     
     try:
-        logger.info("화자 식별 요청")
-        
-        # 오디오 데이터 디코딩
-        temp_audio_path = decode_audio_data(request.audioData)
+        waveform = await read_pcm_body(request)
         
-        try:
-            # 화자 식별 (음성 인식 텍스트 포함)
+        with start_request_profile("identify_pcm", x_profile) as trace:
             start_time_identify = time.time()
-            speaker_id, similarity, recognized_text = speaker_model.identify_speaker_with_text(
-                temp_audio_path, 
-                threshold=request.threshold
+            speaker_id, similarity, recognized_text = identify_waveform(waveform, threshold, includeText)
+            result = build_identify_result(
+                speaker_id, similarity, recognized_text, threshold, time.time() - start_time_identify
             )
-            processing_time = time.time() - start_time_identify
-            
-            is_known = speaker_id is not None
-            
-            result = {
-                "status": "success",
-                "anonymousId": speaker_id,
-                "confidence": float(similarity),
-                "isKnownSpeaker": is_known,
-                "threshold": request.threshold,
-                "processingTimeSeconds": round(processing_time, 3),
-                "recognizedText": recognized_text,  # 음성 인식 텍스트 추가
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # 알려진 화자인 경우 메타데이터 포함
-            if is_known and speaker_id in speaker_metadata:
-                result["speakerInfo"] = speaker_metadata[speaker_id]
-            
-            logger.info(f"화자 식별 결과: {speaker_id} (유사도: {similarity:.4f})")
+            if trace is not None:
+                result["profileId"] = trace.profile_id
+        
+        logger.info(f"화자 식별 결과 (PCM): {speaker_id} (유사도: {similarity:.4f})")
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"화자 식별 실패: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"화자 식별 중 오류가 발생했습니다: {str(e)}"
+        )
+
+@app.post("/streams/{stream_id}/frames")
+async def append_stream_frames(
+    stream_id: str,
+    request: Request,
+    threshold: float = Query(default=0.7, ge=0.0, le=1.0, description="유사도 임계값"),
+    final: bool = Query(default=False, description="마지막 프레임 여부 (남은 음성을 식별하고 스트림 종료)"),
+    includeText: bool = Query(default=True, description="음성 인식 텍스트 포함 여부"),
+    api_key: str = Depends(verify_api_key),
+    x_profile: Optional[str] = Depends(requested_profile)
+):
+    """
+    실시간 PCM 프레임 수신 (녹음 중 주기적으로 전송)
+    새 음성이 PCM_STREAM_HOP_SECONDS 이상 쌓이면 최근 구간으로 식별한 결과를 반환하고,
+    아직 부족하면 마지막 식별 결과와 함께 status=buffering을 반환
+    """
+    try:
+        # 마지막 프레임은 남은 음성 없이 스트림 종료만 요청할 수 있음 (오류가 나도 finally에서 스트림 정리)
+        waveform = await read_pcm_body(request, allow_empty=final)
+        session = pcm_streams.get(stream_id)
+        
+        # 같은 스트림의 프레임은 순서대로 처리
+        with session.lock:
+            session.append(waveform)
+            if not session.ready(final):
+                return {
+                    "status": "buffering",
+                    "streamId": stream_id,
+                    "secondsReceived": round(session.seconds_received, 2),
+                    "lastResult": session.last_result,
+                    "timestamp": datetime.now().isoformat()
+                }
             
+            with start_request_profile("stream_frames", x_profile) as trace:
+                start_time_identify = time.time()
+                speaker_id, similarity, recognized_text = identify_waveform(session.take_window(), threshold, includeText)
+                result = build_identify_result(
+                    speaker_id, similarity, recognized_text, threshold, time.time() - start_time_identify
+                )
+            if trace is not None:
+                result["profileId"] = trace.profile_id
+            result["streamId"] = stream_id
+            result["secondsReceived"] = round(session.seconds_received, 2)
+            session.last_result = result
+            return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"스트림 식별 실패: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"스트림 식별 중 오류가 발생했습니다: {str(e)}"
+        )
+    finally:
+        if final:
+            pcm_streams.close(stream_id)
+
+@app.post("/speakers/{speaker_id}/verify")
+async def verify_speaker(
+    speaker_id: str,
+    request: SpeakerVerifyRequest,
+    background_tasks: BackgroundTasks,
+    api_key: str = Depends(verify_api_key),
+    x_profile: Optional[str] = Depends(requested_profile)
+):
+    """1:1 화자 검증 (해당 화자의 임베딩과만 비교, 음성 인식 텍스트 없음)"""
+    global request_count
+    request_count += 1
+    
+    def load_waveform():
+        with span("decode_audio"):
+            temp_audio_path = decode_audio_data(request.audioData)
+        background_tasks.add_task(os.unlink, temp_audio_path)
+        data, sample_rate = sf.read(temp_audio_path, dtype="float32")
+        return data, sample_rate
+    
+    with start_request_profile("verify", x_profile) as trace:
+        try:
+            result = verify_claimed_speaker(speaker_id, load_waveform, request.threshold)
+            if trace is not None:
+                result["profileId"] = trace.profile_id
             return result
             
-        finally:
-            # 임시 파일 정리
-            background_tasks.add_task(os.unlink, temp_audio_path)
-            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"화자 검증 실패: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"화자 검증 중 오류가 발생했습니다: {str(e)}"
+            )
+
+@app.post("/speakers/{speaker_id}/verify/pcm")
+async def verify_speaker_pcm(
+    speaker_id: str,
+    request: Request,
+    threshold: float = Query(default=0.7, ge=0.0, le=1.0, description="유사도 임계값"),
+    api_key: str = Depends(verify_api_key),
+    x_profile: Optional[str] = Depends(requested_profile)
+):
+    """1:1 화자 검증 (본문: 16kHz 모노 Int16 PCM, 서버 측 디코딩 없음)"""
+    global request_count
+    request_count += 1
+    
+    try:
+        waveform = await read_pcm_body(request)
+        with start_request_profile("verify_pcm", x_profile) as trace:
+            result = verify_claimed_speaker(speaker_id, lambda: (waveform, PCM_SAMPLE_RATE), threshold)
+            if trace is not None:
+                result["profileId"] = trace.profile_id
+            return result
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"화자 식별 실패: {e}")
+        logger.error(f"화자 검증 실패: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"화자 식별 중 오류가 발생했습니다: {str(e)}"
+            detail=f"화자 검증 중 오류가 발생했습니다: {str(e)}"
         )
 
 @app.get("/speakers")
-async def list_speakers(api_key: str = Depends(verify_api_key)):
-    """등록된 화자 목록 조회"""
+async def list_speakers(
+    limit: int = Query(default=100, ge=1, le=1000, description="페이지 크기"),
+    cursor: Optional[str] = Query(default=None, description="이전 응답의 nextCursor"),
+    client: Optional[str] = Query(default=None, description="등록 클라이언트 필터"),
+    registeredAfter: Optional[str] = Query(default=None, description="이 시각 이후 등록 (ISO 8601)"),
+    registeredBefore: Optional[str] = Query(default=None, description="이 시각 이전 등록 (ISO 8601)"),
+    api_key: str = Depends(verify_api_key)
+):
+    """등록된 화자 목록 조회 (등록 시각 순, 커서 기반 페이지네이션)"""
     try:
-        speakers = []
-        for speaker_id, embeddings in speaker_model.speaker_embeddings.items():
-            speaker_info = {
-                "anonymousId": speaker_id,
-                "embeddingCount": len(embeddings),
-                "registeredAt": speaker_metadata.get(speaker_id, {}).get("registered_at", "Unknown"),
-                "metadata": speaker_metadata.get(speaker_id, {}).get("metadata", {})
-            }
-            speakers.append(speaker_info)
+        filters = {
+            "client": client,
+            "registered_after": registeredAfter,
+            "registered_before": registeredBefore
+        }
+        speakers, next_cursor = metadata_store.list_speakers(limit=limit, cursor=cursor, **filters)
         
         return {
             "status": "success",
             "speakers": speakers,
-            "totalCount": len(speakers),
+            "totalCount": metadata_store.count(**filters),
+            "nextCursor": next_cursor,
             "timestamp": datetime.now().isoformat()
         }
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"화자 목록 조회 실패: {e}")
         raise HTTPException(
@@ -349,21 +886,15 @@ async def list_speakers(api_key: str = Depends(verify_api_key)):
 async def delete_speaker(speaker_id: str, api_key: str = Depends(verify_api_key)):
     """화자 삭제"""
     try:
-        if speaker_id not in speaker_model.speaker_embeddings:
+        # 화자 임베딩 삭제 및 저장 (샤딩 모드에서는 소유 샤드에서 삭제)
+        if not speaker_model.delete_speaker(speaker_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"화자를 찾을 수 없습니다: {speaker_id}"
             )
         
-        # 화자 임베딩 삭제
-        del speaker_model.speaker_embeddings[speaker_id]
-        
         # 메타데이터 삭제
-        if speaker_id in speaker_metadata:
-            del speaker_metadata[speaker_id]
-        
-        # 변경사항 저장
-        speaker_model.save_embeddings()
+        metadata_store.delete(speaker_id)
         
         logger.info(f"화자 삭제 완료: {speaker_id}")
         
@@ -382,6 +913,21 @@ async def delete_speaker(speaker_id: str, api_key: str = Depends(verify_api_key)
             detail=f"화자 삭제 중 오류가 발생했습니다: {str(e)}"
         )
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, api_key: str = Depends(verify_api_key)):
+    """비동기 등록 작업 상태 조회 (queued, running, done, failed)"""
+    job = enrollment_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"작업을 찾을 수 없습니다: {job_id}"
+        )
+    return {
+        "status": "success",
+        "job": job,
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.get("/stats")
 async def get_statistics(api_key: str = Depends(verify_api_key)):
     """서버 통계"""
@@ -393,14 +939,122 @@ async def get_statistics(api_key: str = Depends(verify_api_key)):
             "uptime_seconds": round(uptime, 2),
             "uptime_formatted": f"{int(uptime // 3600)}h {int((uptime % 3600) // 60)}m {int(uptime % 60)}s",
             "total_requests": request_count,
-            "registered_speakers": len(speaker_model.speaker_embeddings),
+            "registered_speakers": metadata_store.count(),
             "requests_per_minute": round(request_count / (uptime / 60), 2) if uptime > 0 else 0,
             "model_loaded": speaker_model is not None,
-            "embeddings_file": DEFAULT_EMBEDDINGS_FILE
+            "embeddings_file": DEFAULT_EMBEDDINGS_FILE,
+            "metadata_db": DEFAULT_METADATA_DB,
+            "gallery_shards": len(GALLERY_SHARDS),
+            "extractor_version": speaker_model.extractor_version if speaker_model else None,
+            "asr_loaded": speaker_model.asr_loaded if speaker_model else False,
+            "queued_enrollments": enrollment_queue.count(JOB_QUEUED) if enrollment_queue else 0,
+            "max_upload_bytes": MAX_UPLOAD_BYTES,
+            "max_audio_seconds": MAX_AUDIO_SECONDS,
+            "max_analyzed_seconds": speaker_model.long_audio_policy.max_analyzed_seconds if speaker_model else None
         },
         "timestamp": datetime.now().isoformat()
     }
 
+@app.post("/admin/migrations", status_code=status.HTTP_202_ACCEPTED)
+async def start_migration(request: MigrationRequest, admin_key: str = Depends(verify_admin_key)):
+    """저장된 특징으로 갤러리를 새 모델로 다시 임베딩 (완료되면 원자적으로 교체, 그동안 이전 모델이 서빙)"""
+    global gallery_migration
+    if gallery_migration is not None and gallery_migration.running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="이미 진행 중인 마이그레이션이 있습니다"
+        )
+    try:
+        migration = GalleryMigration(
+            speaker_model, request.target,
+            batch_size=request.batchSize,
+            drop_missing=request.dropMissing,
+            on_done=lambda: metadata_store.sync_embedding_counts(speaker_model.get_embedding_counts())
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    migration.start()
+    gallery_migration = migration
+    logger.info(f"마이그레이션 시작: {migration.source_version} -> {migration.target_version}")
+    return {
+        "status": "accepted",
+        "migration": migration.status(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/admin/migrations/current")
+async def get_migration(admin_key: str = Depends(verify_admin_key)):
+    """진행 중이거나 마지막 마이그레이션 상태"""
+    if gallery_migration is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="실행한 마이그레이션이 없습니다"
+        )
+    return {
+        "status": "success",
+        "migration": gallery_migration.status(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/admin/profiling")
+async def get_profiling_config(admin_key: str = Depends(verify_admin_key)):
+    """프로파일링 설정 조회"""
+    return {
+        "status": "success",
+        "sampleRate": request_profiler.sample_rate,
+        "modes": sorted(request_profiler.modes),
+        "maxArtifacts": request_profiler.max_artifacts,
+        "outputDir": request_profiler.output_dir,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.put("/admin/profiling")
+async def update_profiling_config(request: ProfilingConfigRequest, admin_key: str = Depends(verify_admin_key)):
+    """프로파일링 설정 변경 (서버 재시작 시 환경 변수 값으로 돌아감)"""
+    try:
+        if request.modes is not None:
+            request_profiler.modes = request_profiler.parse_modes(request.modes)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if request.sampleRate is not None:
+        request_profiler.sample_rate = request.sampleRate
+    if request.maxArtifacts is not None:
+        request_profiler.max_artifacts = request.maxArtifacts
+    
+    logger.info(f"프로파일링 설정 변경: 비율={request_profiler.sample_rate}, 방식={sorted(request_profiler.modes)}")
+    return await get_profiling_config(admin_key)
+
+@app.get("/admin/profiles")
+async def list_profiles(admin_key: str = Depends(verify_admin_key)):
+    """저장된 프로파일 목록 (최신 순)"""
+    profiles = []
+    for profile_id in reversed(request_profiler.list_profiles()):
+        profile_dir = os.path.join(request_profiler.output_dir, profile_id)
+        profiles.append({"profileId": profile_id, "artifacts": sorted(os.listdir(profile_dir))})
+    
+    return {
+        "status": "success",
+        "profiles": profiles,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/admin/profiles/{profile_id}/{filename}")
+async def download_profile_artifact(profile_id: str, filename: str, admin_key: str = Depends(verify_admin_key)):
+    """프로파일 결과 파일 다운로드 (spans.json, torch_trace.json, cprofile.pstats, summary.json)"""
+    path = request_profiler.artifact_path(profile_id, filename)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"프로파일 결과를 찾을 수 없습니다: {profile_id}/{filename}"
+        )
+    return FileResponse(path, filename=f"{profile_id}-{filename}")
+
 if __name__ == "__main__":
     uvicorn.run(
         "app:app",
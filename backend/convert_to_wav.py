@@ -1,78 +1,310 @@
 #!/usr/bin/env python3
 import os
+import re
+import json
+import shutil
+import hashlib
 import subprocess
 import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
 from tqdm import tqdm
 
-def convert_video_to_wav(input_dir, output_dir, sample_rate=16000):
+# 지원하는 비디오 확장자 (mp4, mkv, avi 등)
+VIDEO_EXTENSIONS = ['.mp4', '.mkv', '.avi', '.mov', '.flv', '.wmv']
+
+# 출력 디렉토리에 저장되는 변환 기록 (원본 파일 시그니처로 재변환 여부 판단)
+MANIFEST_NAME = ".convert_manifest.json"
+
+# 이전 버전이 만든 순번 출력 파일 (1.wav, 2.wav, ...)과 옮겨 둘 하위 디렉토리
+LEGACY_OUTPUT_PATTERN = re.compile(r"^\d+\.wav$")
+LEGACY_OUTPUT_DIR = "legacy_numbered"
+
+
+def default_workers():
+    """사용 가능한 CPU 코어 수 (CPU affinity가 제한된 경우 반영)"""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """파일 내용의 SHA-256 해시"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def output_names(video_files):
+    """
+    원본 파일명에서 안정적인 출력 파일명 생성 (예: clip01.mp4 -> clip01.wav)
+    확장자만 다른 원본이 여러 개면 확장자를 이름에 포함 (clip01.mkv -> clip01.mkv.wav)
+    """
+    stems = {}
+    for video_file in video_files:
+        stems.setdefault(video_file.stem, []).append(video_file)
+    names = {}
+    for stem, files in stems.items():
+        for video_file in files:
+            names[video_file] = f"{stem}.wav" if len(files) == 1 else f"{video_file.name}.wav"
+    return names
+
+
+def load_manifest(output_path):
+    manifest_file = output_path / MANIFEST_NAME
+    if manifest_file.exists():
+        try:
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"경고: 변환 기록을 읽을 수 없어 새로 만듭니다: {e}")
+    return {}
+
+
+def save_manifest(output_path, manifest):
+    """변환 기록 저장 (임시 파일에 쓴 뒤 교체)"""
+    manifest_file = output_path / MANIFEST_NAME
+    temp_file = manifest_file.with_suffix('.tmp')
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, manifest_file)
+
+
+def is_up_to_date(entry, video_file, output_file, sample_rate, use_hash, enroll_speaker):
+    """
+    이전 변환 결과가 최신인지 확인 (mtime/크기 비교, 필요 시 내용 해시 비교)
+    Returns:
+        tuple: (최신 여부, 갱신된 기록 또는 None)
+    """
+    if not entry or entry.get("error") or entry.get("sample_rate") != sample_rate:
+        return False, None
+    if output_file is not None and not output_file.exists():
+        return False, None
+    if enroll_speaker is not None and enroll_speaker not in entry.get("enrolled_as", []):
+        return False, None
+
+    stat = video_file.stat()
+    if entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+        return True, None
+    # mtime만 바뀐 경우 (복사/체크아웃 등) 내용이 같으면 재변환하지 않음
+    if use_hash and entry.get("sha256") and entry.get("size") == stat.st_size:
+        if file_sha256(video_file) == entry["sha256"]:
+            return True, dict(entry, mtime_ns=stat.st_mtime_ns)
+    return False, None
+
+
+def retire_legacy_outputs(output_path, names, manifest):
+    """
+    이전 버전의 순번 출력 파일(1.wav, 2.wav, ...)을 하위 디렉토리로 옮김
+    순번과 원본의 대응은 복구할 수 없으므로, 새 이름으로 다시 만든 출력과 함께 등록되지 않도록
+    출력 디렉토리 밖으로 치움 (변환 기록에 있거나 현재 원본의 출력 이름인 파일은 그대로 둠)
+    Returns:
+        int: 옮긴 파일 수
+    """
+    current = set(names.values()) | set(manifest)
+    legacy_files = [
+        wav_file for wav_file in output_path.glob("*.wav")
+        if LEGACY_OUTPUT_PATTERN.match(wav_file.name) and wav_file.name not in current
+    ]
+    if legacy_files:
+        legacy_path = output_path / LEGACY_OUTPUT_DIR
+        legacy_path.mkdir(exist_ok=True)
+        for wav_file in legacy_files:
+            shutil.move(str(wav_file), str(legacy_path / wav_file.name))
+        print(f"이전 버전의 순번 출력 {len(legacy_files)}개를 {legacy_path}로 옮겼습니다.")
+    return len(legacy_files)
+
+
+def convert_one(video_file, output_file, sample_rate, decode_to_memory):
+    """
+    ffmpeg로 비디오 하나를 변환 (프로세스 풀 작업 단위)
+    Args:
+        video_file (Path): 입력 비디오 파일
+        output_file (Path): 출력 WAV 파일 (None이면 파일로 저장하지 않음)
+        sample_rate (int): 출력 샘플링 레이트 (Hz)
+        decode_to_memory (bool): 16-bit PCM을 메모리로 받아 반환할지 여부
+    Returns:
+        numpy.ndarray: decode_to_memory이면 int16 PCM, 아니면 None
+    """
+    # ffmpeg 명령: 비디오에서 오디오 추출 및 16kHz 모노 변환 (파일/파이프 출력을 한 번에 처리)
+    cmd = ['ffmpeg', '-i', str(video_file), '-vn']
+    if output_file is not None:
+        cmd += [
+            '-acodec', 'pcm_s16le',           # 오디오 코덱: 16-bit PCM
+            '-ar', str(sample_rate),          # 샘플링 레이트
+            '-ac', '1',                       # 모노 채널
+            '-y',                             # 기존 파일 덮어쓰기
+            str(output_file)
+        ]
+    if decode_to_memory:
+        cmd += ['-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(sample_rate), '-ac', '1', '-']
+
+    # 출력 로그를 최소화하기 위해 stderr를 리디렉션
+    result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if decode_to_memory:
+        return np.frombuffer(result.stdout, dtype=np.int16)
+    return None
+
+
+def process_result(future, video_file, name, manifest, sample_rate, force, use_hash,
+                   speaker_recognition, enroll_speaker):
+    """
+    변환 작업 하나의 결과를 받아 (필요 시 화자 등록 후) 변환 기록 갱신
+    Raises:
+        Exception: 변환 또는 등록 실패 (변환 기록은 갱신하지 않음)
+    """
+    pcm = future.result()
+
+    stat = video_file.stat()
+    previous = manifest.get(name, {})
+    entry = {
+        "source": video_file.name,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sample_rate": sample_rate,
+        "enrolled_as": []
+    }
+    # 원본이 그대로면 이전 등록 기록 유지 (바뀌었으면 새로 등록해야 함)
+    if not force and previous.get("mtime_ns") == stat.st_mtime_ns and previous.get("size") == stat.st_size:
+        entry["enrolled_as"] = list(previous.get("enrolled_as", []))
+    if use_hash:
+        entry["sha256"] = file_sha256(video_file)
+
+    # 디코딩된 PCM을 바로 화자 등록 (모델은 메인 프로세스에서 한 번만 로드)
+    # 변환 기록과 갤러리 파일이 어긋나지 않도록 등록할 때마다 바로 저장
+    if speaker_recognition is not None:
+        waveform = pcm.astype(np.float32) / 32768.0
+        speaker_recognition.register_speaker_waveform(enroll_speaker, waveform, sample_rate, save_immediately=True)
+        if enroll_speaker not in entry["enrolled_as"]:
+            entry["enrolled_as"].append(enroll_speaker)
+
+    manifest[name] = entry
+
+
+def convert_video_to_wav(input_dir, output_dir, sample_rate=16000, workers=None, force=False,
+                         use_hash=False, enroll_speaker=None, write_wav=True,
+                         embeddings_file="speaker_embeddings.pkl"):
     """
     input_dir 내의 모든 비디오 파일을 WAV 오디오 파일로 변환합니다.
-    
+    변환은 CPU 코어 수만큼의 프로세스 풀에서 병렬로 실행되며, 이미 최신인 출력은 건너뜁니다.
+
     Args:
         input_dir (str): 입력 비디오 파일이 있는 디렉토리 경로
         output_dir (str): 출력 WAV 파일을 저장할 디렉토리 경로
         sample_rate (int): 출력 WAV 파일의 샘플링 레이트 (Hz)
+        workers (int): 병렬 ffmpeg 프로세스 수 (None이면 CPU 코어 수)
+        force (bool): 최신 여부와 관계없이 모두 다시 변환
+        use_hash (bool): mtime이 바뀐 파일은 내용 해시로 변경 여부 확인
+        enroll_speaker (str): 지정 시 디코딩된 오디오를 WAV 없이 바로 이 화자 ID로 등록
+        write_wav (bool): WAV 파일 저장 여부 (enroll_speaker와 함께 False로 두면 등록만 수행)
+        embeddings_file (str): 화자 등록 시 사용할 임베딩 파일
     """
     # 입력 디렉토리 확인
     input_path = Path(input_dir)
     if not input_path.exists() or not input_path.is_dir():
         print(f"오류: 입력 디렉토리가 존재하지 않습니다: {input_dir}")
         return False
-    
-    # 출력 디렉토리 생성
+    if not write_wav and enroll_speaker is None:
+        print("오류: WAV 저장도 화자 등록도 하지 않으면 할 일이 없습니다")
+        return False
+
+    # 출력 디렉토리 생성 (변환 기록도 여기에 저장)
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
-    
-    # 비디오 파일 찾기 (mp4, mkv, avi 등 다양한 형식 지원)
-    video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.flv', '.wmv']
+
     video_files = []
-    
-    for ext in video_extensions:
-        video_files.extend(list(input_path.glob(f'*{ext}')))
-    
+    for ext in VIDEO_EXTENSIONS:
+        video_files.extend(input_path.glob(f'*{ext}'))
+    video_files = sorted(video_files)
+
     if not video_files:
         print(f"오류: {input_dir}에 비디오 파일이 없습니다")
         return False
-    
+
     print(f"총 {len(video_files)}개의 비디오 파일을 발견했습니다.")
-    
-    # 각 비디오 파일을 WAV로 변환
-    for i, video_file in enumerate(tqdm(video_files, desc="비디오 변환", unit="파일")):
-        output_file = output_path / f"{i+1}.wav"
-        
-        # ffmpeg 명령 실행: 비디오에서 오디오 추출 및 16kHz로 변환
-        cmd = [
-            'ffmpeg',
-            '-i', str(video_file),            # 입력 파일
-            '-vn',                            # 비디오 스트림 제외
-            '-acodec', 'pcm_s16le',           # 오디오 코덱: 16-bit PCM
-            '-ar', str(sample_rate),          # 샘플링 레이트
-            '-ac', '1',                       # 모노 채널
-            '-y',                             # 기존 파일 덮어쓰기
-            str(output_file)                  # 출력 파일
-        ]
-        
-        try:
-            # 출력 로그를 최소화하기 위해 stderr를 리디렉션
-            subprocess.run(cmd, check=True, stderr=subprocess.PIPE)
-            print(f"처리 완료: {video_file.name} -> {output_file.name}")
-        except subprocess.CalledProcessError as e:
-            print(f"오류: {video_file.name} 처리 중 문제 발생: {e}")
-            continue
-    
-    print(f"변환 완료. {output_dir}에 WAV 파일이 저장되었습니다.")
-    return True
+
+    manifest = load_manifest(output_path)
+    names = output_names(video_files)
+    if write_wav:
+        retire_legacy_outputs(output_path, names, manifest)
+
+    # 최신 상태인 파일 제외
+    pending = []
+    for video_file in video_files:
+        output_file = output_path / names[video_file] if write_wav else None
+        entry = manifest.get(names[video_file])
+        if not force:
+            up_to_date, refreshed = is_up_to_date(entry, video_file, output_file, sample_rate, use_hash, enroll_speaker)
+            if up_to_date:
+                if refreshed is not None:
+                    manifest[names[video_file]] = refreshed
+                continue
+        pending.append((video_file, output_file))
+
+    print(f"변환 대상 {len(pending)}개 (최신 상태 {len(video_files) - len(pending)}개 건너뜀)")
+
+    speaker_recognition = None
+    if enroll_speaker is not None and pending:
+        from src.speaker_recognition import SpeakerRecognition
+        speaker_recognition = SpeakerRecognition(embeddings_file=embeddings_file)
+
+    workers = workers or default_workers()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(convert_one, video_file, output_file, sample_rate, enroll_speaker is not None): (video_file, output_file)
+            for video_file, output_file in pending
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="비디오 변환", unit="파일"):
+            video_file, output_file = futures[future]
+            name = names[video_file]
+            try:
+                process_result(future, video_file, name, manifest, sample_rate, force, use_hash,
+                               speaker_recognition, enroll_speaker)
+                print(f"처리 완료: {video_file.name} -> {output_file.name if output_file else enroll_speaker}")
+            except Exception as e:
+                # ffmpeg 없음/변환 실패/등록 실패 모두 파일 단위로 기록하고 다음 파일 계속 처리
+                print(f"오류: {video_file.name} 처리 중 문제 발생: {e}")
+                manifest[name] = dict(manifest.get(name, {}), source=video_file.name, error=str(e))
+                failed += 1
+            # 파일마다 기록을 저장해 중단(Ctrl-C 등)되어도 완료된 파일은 다시 변환하지 않음
+            save_manifest(output_path, manifest)
+
+    save_manifest(output_path, manifest)
+
+    print(f"변환 완료. {output_dir}에 WAV 파일이 저장되었습니다. (실패 {failed}개)")
+    return failed == 0
+
 
 def main():
     parser = argparse.ArgumentParser(description="비디오 파일을 WAV 오디오로 변환")
     parser.add_argument("--input", default="data/kazusa", help="입력 비디오 디렉토리")
     parser.add_argument("--output", default="data/kazusa_wav", help="출력 WAV 디렉토리")
     parser.add_argument("--sample-rate", type=int, default=16000, help="출력 샘플링 레이트(Hz)")
-    
+    parser.add_argument("--workers", type=int, default=None, help="병렬 변환 프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument("--force", action="store_true", help="최신 상태인 파일도 모두 다시 변환")
+    parser.add_argument("--hash", action="store_true", help="mtime이 바뀐 파일은 내용 해시로 변경 여부 확인")
+    parser.add_argument("--enroll", metavar="SPEAKER_ID", help="디코딩된 오디오를 WAV 없이 바로 이 화자로 등록")
+    parser.add_argument("--no-wav", action="store_true", help="WAV 파일을 저장하지 않음 (--enroll과 함께 사용)")
+    parser.add_argument("--embeddings_file", default="speaker_embeddings.pkl", help="화자 임베딩 저장 파일")
+
     args = parser.parse_args()
-    
-    convert_video_to_wav(args.input, args.output, args.sample_rate)
+
+    convert_video_to_wav(
+        args.input,
+        args.output,
+        args.sample_rate,
+        workers=args.workers,
+        force=args.force,
+        use_hash=args.hash,
+        enroll_speaker=args.enroll,
+        write_wav=not args.no_wav,
+        embeddings_file=args.embeddings_file
+    )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+스레드 수 / 워커 수 / 배치 크기 자동 튜닝
+
+현재 머신(컨테이너라면 cgroup CPU 할당량 기준)에서 동봉된 test/ 음성으로
+- 단일 요청 지연 시간: intra-op / inter-op 스레드 수 조합
+- 처리량: 프로세스 워커 수 x 배치 크기 조합
+을 측정하고, 가장 좋은 설정을 튜닝 프로파일(JSON)로 저장합니다.
+서버(app.py)와 CLI(demo.py, evaluate.py)는 시작할 때 이 프로파일을 읽습니다.
+
+inter-op 스레드 수는 프로세스마다 한 번만 설정할 수 있으므로
+각 설정은 별도 하위 프로세스에서 측정합니다.
+
+사용 예:
+    python src/autotune.py --test_dir test --output tuned_profile.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from tuned_profile import available_cpus, DEFAULT_PROFILE_FILE
+
+# 하위 프로세스가 측정 결과를 출력할 때 붙이는 접두어 (모델 로딩 로그와 구분)
+RESULT_PREFIX = "AUTOTUNE_RESULT "
+
+
+def collect_test_files(test_dir, max_files):
+    """
+    벤치마크용 음성 파일 수집 (짧게 잘린 *-cut*.wav 우선)
+    Returns:
+        list: 음성 파일 경로 리스트
+    """
+    test_path = Path(test_dir)
+    if not test_path.exists():
+        raise FileNotFoundError(f"폴더가 존재하지 않습니다: {test_dir}")
+    files = sorted(test_path.glob("*/*-cut*.wav")) or sorted(test_path.glob("*/*.wav"))
+    if not files:
+        raise FileNotFoundError(f"{test_dir}에 WAV 파일이 없습니다")
+    return [str(path) for path in files[:max_files]]
+
+
+def thread_candidates(cpus):
+    """시험할 intra-op 스레드 수 (1, 2, 4, ... 와 전체 CPU 수)"""
+    candidates = []
+    n = 1
+    while n < cpus:
+        candidates.append(n)
+        n *= 2
+    candidates.append(cpus)
+    return candidates
+
+
+def bench_latency(files, intra, inter, repeats):
+    """
+    현재 프로세스에서 파일 하나당 임베딩 추출 시간 측정
+    Returns:
+        dict: 측정 결과 (중앙값/평균 지연 시간, 초)
+    """
+    from speaker_recognition import SpeakerRecognition
+    model = SpeakerRecognition(num_threads=intra, interop_threads=inter)
+    # 첫 호출은 메모리 할당/커널 선택 비용이 커서 제외
+    model.extract_speaker_embedding(files[0])
+
+    latencies = []
+    for _ in range(repeats):
+        for path in files:
+            start = time.perf_counter()
+            model.extract_speaker_embedding(path)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "intra_op_threads": intra,
+        "inter_op_threads": inter,
+        "median_latency": latencies[len(latencies) // 2],
+        "mean_latency": sum(latencies) / len(latencies)
+    }
+
+
+def bench_throughput(files, workers, batch_size, repeats):
+    """
+    프로세스 풀(evaluate.py와 같은 방식)로 임베딩 추출 처리량 측정
+    워커마다 CPU를 나눠 intra-op 스레드 수로 사용
+    Returns:
+        dict: 측정 결과 (초당 파일 수)
+    """
+    from evaluate import _init_worker, _embed_batch
+    threads_per_worker = max(1, available_cpus() // workers)
+    paths = files * repeats
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(threads_per_worker,)) as executor:
+        # 워커마다 모델 로딩이 끝나도록 워밍업 (측정에서 제외)
+        list(executor.map(_embed_batch, [[files[0]]] * workers))
+        start = time.perf_counter()
+        list(executor.map(_embed_batch, batches))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "workers": workers,
+        "batch_size": batch_size,
+        "threads_per_worker": threads_per_worker,
+        "files_per_second": len(paths) / elapsed
+    }
+
+
+def run_benchmark(args):
+    """
+    설정 하나를 하위 프로세스에서 측정
+    Args:
+        args (list): 하위 프로세스 명령행 인자
+    Returns:
+        dict: 측정 결과 (실패하면 None)
+    """
+    cmd = [sys.executable, os.path.abspath(__file__)] + [str(arg) for arg in args]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    for line in result.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    print(f"  측정 실패: {' '.join(cmd[2:])}\n{result.stderr[-500:]}")
+    return None
+
+
+def autotune(test_dir="test", output=DEFAULT_PROFILE_FILE, max_files=6, repeats=2,
+             batch_sizes=(1, 4, 8), max_workers=None):
+    """
+    지연 시간/처리량 벤치마크를 실행하고 튜닝 프로파일 저장
+    Args:
+        test_dir (str): 벤치마크용 음성 폴더
+        output (str): 튜닝 프로파일 저장 경로
+        max_files (int): 사용할 최대 파일 수
+        repeats (int): 파일 목록 반복 횟수
+        batch_sizes (tuple): 시험할 배치 크기
+        max_workers (int): 시험할 최대 워커 수 (None이면 사용 가능 CPU 수)
+    Returns:
+        dict: 저장한 튜닝 프로파일
+    """
+    cpus = available_cpus()
+    files = collect_test_files(test_dir, max_files)
+    print(f"사용 가능 CPU: {cpus}개 (cgroup 할당량 반영), 벤치마크 파일 {len(files)}개")
+    common = ["--test_dir", test_dir, "--max_files", max_files, "--repeats", repeats]
+
+    # 1) 단일 요청 지연 시간: intra-op x inter-op
+    latency_results = []
+    for intra in thread_candidates(cpus):
+        for inter in sorted({1, min(2, cpus)}):
+            print(f"지연 시간 측정: intra-op {intra}, inter-op {inter}")
+            result = run_benchmark(["--bench", "latency", "--intra", intra, "--inter", inter] + common)
+            if result:
+                print(f"  중앙값 {result['median_latency']:.3f}초")
+                latency_results.append(result)
+    if not latency_results:
+        raise RuntimeError("지연 시간 측정에 모두 실패했습니다")
+    best_latency = min(latency_results, key=lambda r: r["median_latency"])
+
+    # 2) 처리량: 워커 수 x 배치 크기 (워커 1개는 배치 크기와 무관하므로 한 번만 측정)
+    throughput_results = []
+    for workers in thread_candidates(min(cpus, max_workers or cpus)):
+        for batch_size in (batch_sizes if workers > 1 else batch_sizes[:1]):
+            print(f"처리량 측정: 워커 {workers}, 배치 {batch_size}")
+            result = run_benchmark(["--bench", "throughput", "--workers", workers,
+                                    "--batch_size", batch_size] + common)
+            if result:
+                print(f"  {result['files_per_second']:.2f} 파일/초")
+                throughput_results.append(result)
+    best_throughput = max(throughput_results, key=lambda r: r["files_per_second"]) if throughput_results else None
+
+    profile = {
+        "cpu_count": cpus,
+        "intra_op_threads": best_latency["intra_op_threads"],
+        "inter_op_threads": best_latency["inter_op_threads"],
+        "workers": best_throughput["workers"] if best_throughput else 1,
+        "batch_size": best_throughput["batch_size"] if best_throughput else batch_sizes[0],
+        "created_at": datetime.now().isoformat(),
+        "measurements": {
+            "latency": latency_results,
+            "throughput": throughput_results
+        }
+    }
+
+    output_dir = os.path.dirname(os.path.abspath(output))
+    os.makedirs(output_dir, exist_ok=True)
+    temp_file = f"{output}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, output)
+
+    print(f"\n튜닝 프로파일 저장: {output}")
+    print(f"  intra-op {profile['intra_op_threads']}, inter-op {profile['inter_op_threads']} "
+          f"(지연 시간 {best_latency['median_latency']:.3f}초)")
+    print(f"  워커 {profile['workers']}, 배치 {profile['batch_size']}")
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="스레드 수 / 워커 수 / 배치 크기 자동 튜닝")
+    parser.add_argument("--test_dir", default="test", help="벤치마크용 음성 폴더 (하위 폴더별 WAV)")
+    parser.add_argument("--output", default=DEFAULT_PROFILE_FILE, help="튜닝 프로파일 저장 경로")
+    parser.add_argument("--max_files", type=int, default=6, help="사용할 최대 파일 수")
+    parser.add_argument("--repeats", type=int, default=2, help="파일 목록 반복 횟수")
+    parser.add_argument("--batch_sizes", default="1,4,8", help="시험할 배치 크기 (쉼표로 구분)")
+    parser.add_argument("--max_workers", type=int, default=None, help="시험할 최대 워커 수")
+    # 하위 프로세스용 (설정 하나 측정)
+    parser.add_argument("--bench", choices=["latency", "throughput"], help=argparse.SUPPRESS)
+    parser.add_argument("--intra", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--inter", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--workers", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--batch_size", type=int, default=1, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.bench:
+        files = collect_test_files(args.test_dir, args.max_files)
+        if args.bench == "latency":
+            result = bench_latency(files, args.intra, args.inter, args.repeats)
+        else:
+            result = bench_throughput(files, args.workers, args.batch_size, args.repeats)
+        print(RESULT_PREFIX + json.dumps(result))
+        return
+
+    batch_sizes = tuple(int(size) for size in args.batch_sizes.split(",") if size.strip())
+    autotune(args.test_dir, args.output, args.max_files, args.repeats, batch_sizes, args.max_workers)
+
+
+if __name__ == "__main__":
+    main()
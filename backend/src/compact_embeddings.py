@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+화자 임베딩 PCA 식별 인덱스 (PCA/화이트닝 투영 + float16/int8 코드)
+
+등록된 갤러리로 투영 행렬을 학습하고, 투영된 임베딩을 float16 또는
+벡터별 스케일을 갖는 int8 코드로 보관합니다. 유사도는 코드를 블록 단위로
+float32로 변환해 계산합니다. (요청마다 코드 전체 크기의 임시 배열을 만들지 않음)
+
+갤러리 압축이 아닙니다. 저장/마이그레이션/투영 재학습에 원본 임베딩이 필요하므로
+서버는 float32 갤러리를 그대로 메모리에 유지하고, 코드는 그 옆에 추가로 올라갑니다.
+즉 메모리 사용량은 코드 크기만큼 늘어나며, 줄어드는 것은 식별 한 번에 읽는 데이터 양입니다.
+
+오프라인 평가 예시:
+    python src/compact_embeddings.py --dim 128 --dtype int8 --test_dir test --output speaker_compactor.npz
+"""
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+# 유사도 계산 시 한 번에 float32로 변환하는 코드 행 수
+SCORE_BLOCK_ROWS = 8192
+
+
+def _as_matrix(vectors, dim=None):
+    """
+    임베딩 리스트를 (N, dim) float32 행렬로 변환
+    (dim이 없으면 가장 작은 차원으로 맞추고, dim보다 짧은 벡터는 0으로 채움)
+    """
+    vectors = [np.asarray(v, dtype=np.float32).reshape(-1) for v in vectors]
+    if dim is None:
+        dim = min(v.shape[0] for v in vectors)
+    matrix = np.zeros((len(vectors), dim), dtype=np.float32)
+    for i, v in enumerate(vectors):
+        length = min(dim, v.shape[0])
+        matrix[i, :length] = v[:length]
+    return matrix
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EmbeddingCompactor:
+    def __init__(self, dim=None, whiten=False, dtype="int8"):
+        """
+        임베딩 압축기 초기화
+        Args:
+            dim (int): 투영 후 차원 (None이면 가능한 최대 차원)
+            whiten (bool): 화이트닝 적용 여부
+            dtype (str): 저장 형식 (float32, float16, int8)
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"지원하지 않는 형식입니다: {dtype} (가능: {', '.join(SUPPORTED_DTYPES)})")
+        self.dim = dim
+        self.whiten = whiten
+        self.dtype = dtype
+        self.input_dim = None
+        self.mean = None
+        self.components = None
+        # 학습에 사용한 갤러리의 추출기 버전 (다른 모델의 임베딩에는 사용할 수 없음)
+        self.extractor_version = None
+
+    @property
+    def is_fitted(self):
+        return self.components is not None
+
+    def fit(self, vectors):
+        """
+        갤러리 임베딩으로 PCA 투영 학습
+        Args:
+            vectors (list): 임베딩 벡터 리스트
+        """
+        matrix = _as_matrix(vectors)
+        self.input_dim = matrix.shape[1]
+        self.mean = matrix.mean(axis=0)
+
+        # 공분산 고유벡터 = 중심화된 행렬의 우특이벡터
+        _, singular_values, vt = np.linalg.svd(matrix - self.mean, full_matrices=False)
+        max_dim = max(1, min(vt.shape[0], matrix.shape[0] - 1))
+        dim = min(self.dim or max_dim, max_dim)
+
+        components = vt[:dim]
+        if self.whiten:
+            std = singular_values[:dim] / np.sqrt(max(matrix.shape[0] - 1, 1))
+            components = components / np.maximum(std, 1e-8)[:, None]
+        self.components = components.astype(np.float32)
+        self.dim = dim
+        return self
+
+    def project(self, vectors):
+        """투영 후 L2 정규화된 float32 행렬 반환"""
+        if not self.is_fitted:
+            raise RuntimeError("압축기가 학습되지 않았습니다. fit()을 먼저 호출하세요.")
+        matrix = _as_matrix(vectors, self.input_dim)
+        return _normalize((matrix - self.mean) @ self.components.T)
+
+    def encode(self, vectors):
+        """
+        임베딩을 압축 코드로 변환
+        Returns:
+            tuple: (코드 행렬, 벡터별 스케일 또는 None)
+        """
+        projected = self.project(vectors)
+        if self.dtype == "int8":
+            scales = np.abs(projected).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.round(projected / scales[:, None]).astype(np.int8)
+            return codes, scales.astype(np.float32)
+        return projected.astype(self.dtype), None
+
+    def score(self, query, codes, scales=None):
+        """
+        질의 임베딩과 압축 코드 사이의 코사인 유사도
+        (질의는 양자화하지 않고, 코드는 SCORE_BLOCK_ROWS 행씩 float32로 변환해 내적)
+        Args:
+            query: 질의 임베딩
+            codes (numpy.ndarray): encode()로 만든 코드 행렬
+            scales (numpy.ndarray): int8 벡터별 스케일
+        Returns:
+            numpy.ndarray: 코드별 유사도
+        """
+        query_vector = self.project([query])[0]
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = np.asarray(block, dtype=np.float32) @ query_vector
+        if scales is not None:
+            scores *= scales
+        return scores
+
+    def save(self, path):
+        """압축기 파라미터 저장 (.npz)"""
+        with open(path, "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components, dim=self.dim,
+                     whiten=self.whiten, dtype=self.dtype, input_dim=self.input_dim,
+                     extractor_version=self.extractor_version or "")
+
+    @classmethod
+    def load(cls, path):
+        """압축기 파라미터 로드"""
+        data = np.load(path)
+        compactor = cls(dim=int(data["dim"]), whiten=bool(data["whiten"]), dtype=str(data["dtype"]))
+        compactor.input_dim = int(data["input_dim"])
+        compactor.mean = data["mean"]
+        compactor.components = data["components"]
+        if "extractor_version" in data.files:
+            compactor.extractor_version = str(data["extractor_version"]) or None
+        return compactor
+
+
+class CompactGallery:
+    def __init__(self, compactor, speaker_embeddings):
+        """
+        압축 코드로 구성된 갤러리 (화자별 최대 유사도로 식별)
+        Args:
+            compactor (EmbeddingCompactor): 학습된 압축기
+            speaker_embeddings (dict): {화자 ID: 임베딩 리스트}
+        """
+        self.compactor = compactor
+        self.speaker_ids = list(speaker_embeddings)
+        self.index = {speaker_id: index for index, speaker_id in enumerate(self.speaker_ids)}
+        vectors = [embedding for speaker_id in self.speaker_ids for embedding in speaker_embeddings[speaker_id]]
+        counts = np.asarray([len(speaker_embeddings[speaker_id]) for speaker_id in self.speaker_ids], dtype=np.int64)
+        self._set_rows(counts)
+        self.codes, self.scales = self._encode(vectors)
+
+    def _set_rows(self, counts):
+        """화자별 코드 행 수로 행 범위와 행별 화자 인덱스 계산 (화자별로 연속 배치)"""
+        self.ends = np.cumsum(counts)
+        self.starts = self.ends - counts
+        self.owners = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+
+    def _rows(self, speaker_id):
+        """화자의 코드 행 범위 (없으면 (0, 0))"""
+        index = self.index.get(speaker_id)
+        if index is None:
+            return 0, 0
+        return int(self.starts[index]), int(self.ends[index])
+
+    def _encode(self, vectors):
+        """식별용 코드 생성 (압축기 형식 그대로 보관하고 유사도 계산 때 블록 단위로 float32 변환)"""
+        if not vectors:
+            scales = np.zeros(0, dtype=np.float32) if self.compactor.dtype == "int8" else None
+            return np.zeros((0, self.compactor.dim), dtype=self.compactor.dtype), scales
+        return self.compactor.encode(vectors)
+
+    def updated(self, speaker_embeddings, changed):
+        """
+        일부 화자만 바뀐 새 압축 갤러리 (이 갤러리는 변경하지 않음)
+        바뀌지 않은 화자의 코드는 그대로 복사하고, 바뀐 화자는 기존 코드 뒤에 추가된 임베딩만 인코딩해
+        끝으로 옮깁니다. (등록은 임베딩을 뒤에 추가만 하므로 기존 코드를 재사용할 수 있음)
+        Args:
+            speaker_embeddings (dict): 새 {화자 ID: 임베딩 시퀀스}
+            changed (iterable): 임베딩이 추가되거나 삭제된 화자 ID
+        Returns:
+            CompactGallery: 새 압축 갤러리
+        """
+        changed = list(dict.fromkeys(changed))
+        moved = [self.index[speaker_id] for speaker_id in changed if speaker_id in self.index]
+
+        # 바뀌지 않은 화자의 코드와 행 수 (화자 수만큼 반복하는 계산은 numpy로 처리)
+        counts = self.ends - self.starts
+        if moved:
+            kept = np.ones(len(self.speaker_ids), dtype=bool)
+            kept[moved] = False
+            moved = set(moved)
+            speaker_ids = [speaker_id for index, speaker_id in enumerate(self.speaker_ids) if index not in moved]
+            keep_rows = kept[self.owners]
+            codes = [self.codes[keep_rows]]
+            scales = [self.scales[keep_rows]] if self.scales is not None else None
+            counts = [counts[kept]]
+        else:
+            # 새 화자만 추가된 경우 (가장 흔한 경우): 기존 배열 뒤에 붙이기만 함
+            speaker_ids = list(self.speaker_ids)
+            codes = [self.codes]
+            scales = [self.scales] if self.scales is not None else None
+            counts = [counts]
+
+        for speaker_id in changed:
+            embeddings = speaker_embeddings.get(speaker_id)
+            if not embeddings:
+                continue  # 삭제된 화자
+            start, end = self._rows(speaker_id)
+            new_codes, new_scales = self._encode(list(embeddings[end - start:]))
+            codes.extend([self.codes[start:end], new_codes])
+            if scales is not None:
+                scales.extend([self.scales[start:end], new_scales])
+            counts.append(np.asarray([len(embeddings)], dtype=np.int64))
+            speaker_ids.append(speaker_id)
+
+        gallery = CompactGallery.__new__(CompactGallery)
+        gallery.compactor = self.compactor
+        gallery.speaker_ids = speaker_ids
+        if moved:
+            gallery.index = {speaker_id: index for index, speaker_id in enumerate(speaker_ids)}
+        else:
+            gallery.index = dict(self.index)
+            gallery.index.update((speaker_id, index) for index, speaker_id in
+                                 enumerate(speaker_ids[len(self.speaker_ids):], len(self.speaker_ids)))
+        gallery._set_rows(np.concatenate(counts))
+        gallery.codes = np.concatenate(codes)
+        gallery.scales = np.concatenate(scales) if scales is not None else None
+        return gallery
+
+    @property
+    def nbytes(self):
+        """코드와 스케일이 차지하는 메모리 (바이트, float32 갤러리에 더해 추가로 사용)"""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def speaker_scores(self, query):
+        """
+        화자별 최대 유사도
+        Returns:
+            numpy.ndarray: speaker_ids 순서의 유사도 배열
+        """
+        best = np.full(len(self.speaker_ids), -1.0, dtype=np.float32)
+        if len(self.owners):
+            np.maximum.at(best, self.owners, self.compactor.score(query, self.codes, self.scales))
+        return best
+
+    def speaker_score(self, query, speaker_id):
+        """
+        한 화자의 코드들과의 최대 유사도 (1:1 검증용, 해당 화자의 행만 계산)
+        Returns:
+            float: 유사도 (등록되지 않았거나 임베딩이 없으면 None)
+        """
+        start, end = self._rows(speaker_id)
+        if start == end:
+            return None
+        scales = self.scales[start:end] if self.scales is not None else None
+        return float(np.max(self.compactor.score(query, self.codes[start:end], scales)))
+
+    def identify(self, query, threshold=0.7):
+        """
+        Returns:
+            tuple: (가장 유사한 화자 ID 또는 None, 유사도)
+        """
+        if not self.speaker_ids:
+            return None, -1
+        scores = self.speaker_scores(query)
+        best_index = int(np.argmax(scores))
+        if scores[best_index] < threshold:
+            return None, float(scores[best_index])
+        return self.speaker_ids[best_index], float(scores[best_index])
+
+
+def float_gallery_nbytes(speaker_embeddings):
+    """압축 전 갤러리 임베딩이 float32 기준으로 차지하는 메모리 (바이트)"""
+    return sum(np.asarray(e, dtype=np.float32).nbytes for embeddings in speaker_embeddings.values() for e in embeddings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="화자 임베딩 PCA 식별 인덱스 학습 및 평가")
+    parser.add_argument("--embeddings_file", default="speaker_embeddings.pkl", help="화자 임베딩 파일")
+    parser.add_argument("--test_dir", default="test", help="평가용 음성 폴더 (하위 폴더명이 화자 ID)")
+    parser.add_argument("--dim", type=int, default=None, help="투영 차원 (생략 시 최대)")
+    parser.add_argument("--whiten", action="store_true", help="화이트닝 적용")
+    parser.add_argument("--dtype", default="int8", choices=SUPPORTED_DTYPES, help="인덱스 코드 형식")
+    parser.add_argument("--threshold", type=float, default=0.7, help="유사도 임계값")
+    parser.add_argument("--output", default="speaker_compactor.npz", help="투영(압축기) 파라미터 저장 경로")
+
+    args = parser.parse_args()
+
+    from gallery_snapshot import load_gallery_file
+    speaker_embeddings, extractor_version = load_gallery_file(args.embeddings_file)
+
+    start_time = time.time()
+    compactor = EmbeddingCompactor(dim=args.dim, whiten=args.whiten, dtype=args.dtype)
+    compactor.fit([e for embeddings in speaker_embeddings.values() for e in embeddings])
+    compactor.extractor_version = extractor_version
+    gallery = CompactGallery(compactor, speaker_embeddings)
+    compactor.save(args.output)
+    print(f"투영 학습 완료 ({time.time() - start_time:.2f}초): 입력 {compactor.input_dim}차원 -> {compactor.dim}차원, {args.dtype}")
+
+    # 서버는 float32 갤러리도 유지하므로 메모리는 인덱스 크기만큼 늘어남 (줄어드는 것은 식별 시 읽는 양)
+    original_bytes = float_gallery_nbytes(speaker_embeddings)
+    print(f"식별 시 읽는 데이터: float32 갤러리 {original_bytes / 1024:.1f}KB -> 인덱스 {gallery.nbytes / 1024:.1f}KB "
+          f"({original_bytes / max(gallery.nbytes, 1):.1f}배 작음)")
+    print(f"서버 메모리: {original_bytes / 1024:.1f}KB -> {(original_bytes + gallery.nbytes) / 1024:.1f}KB "
+          f"(float32 갤러리 + 인덱스)")
+
+    # 평가용 음성의 식별 정확도 비교 (등록되지 않은 화자는 None이 정답)
+    test_files = sorted(Path(args.test_dir).glob("*/*.wav"))
+    if not test_files:
+        print(f"평가용 음성이 없습니다: {args.test_dir}")
+        return
+
+    from speaker_recognition import SpeakerRecognition
+    speaker_recognition = SpeakerRecognition(embeddings_file=args.embeddings_file)
+
+    baseline_correct = compact_correct = 0
+    for test_file in test_files:
+        expected = test_file.parent.name if test_file.parent.name in speaker_embeddings else None
+        embedding = speaker_recognition.extract_speaker_embedding(str(test_file))
+        baseline_id, _ = speaker_recognition._identify_speaker_with_embedding(embedding, args.threshold)
+        compact_id, compact_similarity = gallery.identify(embedding, args.threshold)
+        baseline_correct += baseline_id == expected
+        compact_correct += compact_id == expected
+        print(f"  {test_file}: 정답={expected}, 원본={baseline_id}, 인덱스={compact_id} ({compact_similarity:.4f})")
+
+    total = len(test_files)
+    print(f"식별 정확도: 원본 {baseline_correct / total:.2%} -> 인덱스 {compact_correct / total:.2%} "
+          f"({(compact_correct - baseline_correct) / total:+.2%}, {total}개 파일)")
+
+
+if __name__ == "__main__":
+    main()
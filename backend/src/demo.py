@@ -1,4 +1,5 @@
 from speaker_recognition import SpeakerRecognition
+from tuned_profile import load_tuned_profile
 import argparse
 from pathlib import Path
 import os
@@ -6,13 +7,16 @@ import time
 from tqdm import tqdm
 
 def main():
+    # 튜닝 프로파일(autotune.py 결과)이 있으면 배치 크기 기본값으로 사용
+    profile = load_tuned_profile()
+
     parser = argparse.ArgumentParser(description="화자 인식 시스템 데모")
     parser.add_argument("--register_audio", help="등록할 화자의 음성 파일 경로")
     parser.add_argument("--speaker_id", help="등록할 화자 ID")
     parser.add_argument("--test_audio", help="테스트할 음성 파일 경로")
     parser.add_argument("--register_dir", help="폴더 내 모든 화자 음성을 등록 (폴더명이 화자 ID로 사용됨)")
     parser.add_argument("--embeddings_file", default="speaker_embeddings.pkl", help="화자 임베딩 저장 파일")
-    parser.add_argument("--batch_size", type=int, default=10, help="배치 처리 크기")
+    parser.add_argument("--batch_size", type=int, default=profile.get("batch_size", 10), help="배치 처리 크기")
     
     args = parser.parse_args()
     
@@ -35,7 +39,7 @@ def main():
     if args.test_audio:
         print(f"음성 파일 분석 중: {args.test_audio}")
         
-        if not speaker_recognition.speaker_embeddings:
+        if not speaker_recognition.get_speaker_count():
             print("경고: 등록된 화자가 없습니다. 먼저 화자를 등록해주세요.")
             print("사용법: python src/demo.py --register_audio [오디오 파일] --speaker_id [화자 ID]")
             print("또는: python src/demo.py --register_dir [폴더 경로]")
@@ -96,4 +100,4 @@ def register_directory(speaker_recognition, directory_path, batch_size=10):
     print(f"등록 총 소요 시간: {time.time() - start_time:.2f}초")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
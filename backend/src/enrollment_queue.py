@@ -0,0 +1,383 @@
+"""
+비동기 화자 등록 작업 큐 (SQLite, WAL 모드)
+
+등록 요청은 디코딩된 16kHz PCM과 함께 디스크의 작업 큐에 기록된 뒤 바로 작업 ID를 반환하고,
+백그라운드 워커가 쌓인 작업을 배치로 묶어 임베딩 추출 -> 갤러리 추가 -> 한 번 저장합니다.
+큐가 디스크에 있으므로 접수된 등록은 서버가 재시작되어도 유지되며,
+처리 중에 중단된 작업은 다음 시작 때 다시 대기 상태로 돌아갑니다.
+갤러리에 게시한 작업은 published로 기록한 뒤 저장하고, 저장이 끝나면 committed로 기록합니다.
+저장이 실패해도 게시된 작업은 실패 처리하지 않고 다음에 다시 저장합니다. (이미 식별 대상이므로
+클라이언트가 다시 등록하면 중복됨) 저장 전에 중단된 published 작업은 메모리에만 있던 것이므로 다시
+대기 상태로 돌아가고, committed 작업은 다시 임베딩하지 않고 남은 단계(메타데이터 기록, 완료 표시)만 마칩니다.
+"""
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+
+# 작업 상태
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_PUBLISHED = "published"  # 갤러리에 게시됨 (파일 저장 전, 재시작하면 다시 등록)
+JOB_COMMITTED = "committed"  # 갤러리 파일에 저장됨 (메타데이터 기록/완료 표시 전)
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS enrollment_jobs (
+    job_id TEXT PRIMARY KEY,
+    speaker_id TEXT NOT NULL,
+    client TEXT NOT NULL DEFAULT 'unknown',
+    metadata TEXT NOT NULL DEFAULT '{}',
+    sample_rate INTEGER NOT NULL,
+    audio BLOB,
+    status TEXT NOT NULL,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_enrollment_jobs_status ON enrollment_jobs (status, created_at);
+"""
+
+
+class EnrollmentQueue:
+    def __init__(self, db_path="enrollment_jobs.db"):
+        """
+        디스크 기반 등록 작업 큐 초기화 (중단된 작업은 대기 상태로 복구)
+        Args:
+            db_path (str): SQLite 데이터베이스 파일 경로
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # 새 작업이 들어오면 워커를 깨우는 이벤트
+        self.wakeup = threading.Event()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        with conn:
+            recovered = conn.execute(
+                "UPDATE enrollment_jobs SET status = ?, updated_at = ? WHERE status IN (?, ?)",
+                (JOB_QUEUED, datetime.now().isoformat(), JOB_RUNNING, JOB_PUBLISHED)
+            ).rowcount
+        if recovered:
+            print(f"중단된 등록 작업 {recovered}개를 다시 대기열에 넣었습니다.")
+
+    def _connection(self):
+        """스레드별 연결 반환"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            # 접수된 작업이 전원 장애에도 남도록 커밋마다 동기화
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_dict(row):
+        return {
+            "jobId": row["job_id"],
+            "anonymousId": row["speaker_id"],
+            "status": row["status"],
+            "error": row["error"],
+            "createdAt": row["created_at"],
+            "updatedAt": row["updated_at"],
+        }
+
+    def submit(self, speaker_id, waveform, sample_rate=16000, client="unknown", metadata=None):
+        """
+        등록 작업 추가 (커밋된 뒤에 반환하므로 반환된 작업은 재시작 후에도 유지됨)
+        Args:
+            speaker_id (str): 화자 ID
+            waveform (numpy.ndarray): [-1, 1] 범위의 float 파형
+            sample_rate (int): 파형의 샘플링 레이트
+            client (str): 등록 요청 클라이언트
+            metadata (dict): 추가 메타데이터
+        Returns:
+            str: 작업 ID
+        """
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        # 16-bit PCM으로 저장 (float32 대비 절반 크기)
+        pcm = (np.clip(np.asarray(waveform, dtype=np.float32), -1.0, 1.0) * 32767).astype("<i2")
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    """
+                    INSERT INTO enrollment_jobs
+                        (job_id, speaker_id, client, metadata, sample_rate, audio, status, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (job_id, speaker_id, client, json.dumps(metadata or {}, ensure_ascii=False),
+                     int(sample_rate), sqlite3.Binary(pcm.tobytes()), JOB_QUEUED, now, now)
+                )
+        self.wakeup.set()
+        return job_id
+
+    def claim_batch(self, max_jobs=8):
+        """
+        대기 중인 작업을 접수 순서대로 가져와 처리 중 상태로 변경
+        Returns:
+            list: 작업 dict 리스트 (job_id, speaker_id, client, metadata, sample_rate, waveform)
+        """
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                rows = conn.execute(
+                    "SELECT * FROM enrollment_jobs WHERE status = ? ORDER BY created_at, job_id LIMIT ?",
+                    (JOB_QUEUED, max_jobs)
+                ).fetchall()
+                if rows:
+                    conn.executemany(
+                        "UPDATE enrollment_jobs SET status = ?, updated_at = ? WHERE job_id = ?",
+                        [(JOB_RUNNING, datetime.now().isoformat(), row["job_id"]) for row in rows]
+                    )
+        return [{
+            "job_id": row["job_id"],
+            "speaker_id": row["speaker_id"],
+            "client": row["client"],
+            "metadata": json.loads(row["metadata"]),
+            "sample_rate": row["sample_rate"],
+            "waveform": np.frombuffer(row["audio"], dtype="<i2").astype(np.float32) / 32768.0
+        } for row in rows]
+
+    def _finish(self, job_ids, job_status, error=None):
+        now = datetime.now().isoformat()
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                # 완료/실패한 작업의 음성은 더 이상 필요 없으므로 삭제
+                conn.executemany(
+                    "UPDATE enrollment_jobs SET status = ?, error = ?, audio = NULL, updated_at = ? WHERE job_id = ?",
+                    [(job_status, error, now, job_id) for job_id in job_ids]
+                )
+
+    def mark_published(self, job_ids):
+        """
+        갤러리에 게시한 작업 기록 (저장 전에 중단되면 다시 등록해야 하므로 음성은 유지)
+        Args:
+            job_ids (list): 작업 ID 리스트
+        """
+        now = datetime.now().isoformat()
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "UPDATE enrollment_jobs SET status = ?, updated_at = ? WHERE job_id = ?",
+                    [(JOB_PUBLISHED, now, job_id) for job_id in job_ids]
+                )
+
+    def mark_committed(self, job_ids):
+        """
+        갤러리 저장이 끝난 작업 기록 (재시작 후 다시 등록하지 않도록 음성도 삭제)
+        Args:
+            job_ids (list): 작업 ID 리스트
+        """
+        now = datetime.now().isoformat()
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "UPDATE enrollment_jobs SET status = ?, audio = NULL, updated_at = ? WHERE job_id = ?",
+                    [(JOB_COMMITTED, now, job_id) for job_id in job_ids]
+                )
+
+    def committed_jobs(self):
+        """
+        갤러리에는 저장되었지만 완료 표시 전에 중단된 작업
+        Returns:
+            list: 작업 dict 리스트 (job_id, speaker_id, client, metadata)
+        """
+        rows = self._connection().execute(
+            "SELECT job_id, speaker_id, client, metadata FROM enrollment_jobs WHERE status = ? "
+            "ORDER BY created_at, job_id",
+            (JOB_COMMITTED,)
+        ).fetchall()
+        return [{
+            "job_id": row["job_id"],
+            "speaker_id": row["speaker_id"],
+            "client": row["client"],
+            "metadata": json.loads(row["metadata"]),
+        } for row in rows]
+
+    def fail_running(self, job_ids, error):
+        """
+        처리 중 상태로 남은 작업만 실패 표시 (갤러리에 저장된 작업은 그대로 둠)
+        Args:
+            job_ids (list): 작업 ID 리스트
+            error: 실패 원인
+        """
+        now = datetime.now().isoformat()
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "UPDATE enrollment_jobs SET status = ?, error = ?, audio = NULL, updated_at = ? "
+                    "WHERE job_id = ? AND status = ?",
+                    [(JOB_FAILED, str(error), now, job_id, JOB_RUNNING) for job_id in job_ids]
+                )
+
+    def complete(self, job_ids):
+        """작업 완료 표시"""
+        self._finish(job_ids, JOB_DONE)
+
+    def fail(self, job_id, error):
+        """작업 실패 표시"""
+        self._finish([job_id], JOB_FAILED, str(error))
+
+    def get(self, job_id):
+        """작업 상태 조회 (없으면 None)"""
+        row = self._connection().execute(
+            "SELECT job_id, speaker_id, status, error, created_at, updated_at FROM enrollment_jobs WHERE job_id = ?",
+            (job_id,)
+        ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def count(self, job_status=None):
+        """작업 수 (상태 지정 시 해당 상태만)"""
+        if job_status is None:
+            return self._connection().execute("SELECT COUNT(*) FROM enrollment_jobs").fetchone()[0]
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM enrollment_jobs WHERE status = ?", (job_status,)
+        ).fetchone()[0]
+
+
+class EnrollmentWorker:
+    def __init__(self, queue, speaker_model, metadata_store=None, batch_size=8, batch_wait=0.2, poll_interval=1.0):
+        """
+        등록 작업 백그라운드 워커
+        Args:
+            queue (EnrollmentQueue): 작업 큐
+            speaker_model (SpeakerRecognition): 화자 인식 모델
+            metadata_store (SpeakerMetadataStore): 메타데이터 저장소 (없으면 기록하지 않음)
+            batch_size (int): 한 번에 처리할 최대 작업 수
+            batch_wait (float): 첫 작업을 받은 뒤 배치를 채우기 위해 기다리는 시간 (초)
+            poll_interval (float): 작업이 없을 때 큐를 다시 확인하는 간격 (초)
+        """
+        self.queue = queue
+        self.speaker_model = speaker_model
+        self.metadata_store = metadata_store
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+        # 갤러리에 게시했지만 아직 저장하지 못한 작업 (워커 스레드에서만 사용)
+        self._unsaved = []
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="enrollment-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=30.0):
+        """현재 배치를 마친 뒤 종료 (처리하지 못한 작업은 큐에 남음)"""
+        self._stop.set()
+        self.queue.wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def recover(self):
+        """
+        갤러리 저장 후 중단된 작업의 남은 단계(메타데이터 기록, 완료 표시)만 수행
+        (워커 시작 전에 호출, 다시 임베딩하지 않음)
+        Returns:
+            int: 마무리한 작업 수
+        """
+        jobs = self.queue.committed_jobs()
+        if jobs:
+            self._finish_committed(jobs)
+            print(f"갤러리에 저장된 뒤 중단된 등록 작업 {len(jobs)}개를 마무리했습니다.")
+        return len(jobs)
+
+    def _run(self):
+        while not self._stop.is_set():
+            jobs = []
+            try:
+                # 저장하지 못한 게시 작업이 있으면 새 배치보다 저장을 먼저 다시 시도
+                if self._unsaved and not self._save_unsaved():
+                    self._stop.wait(self.poll_interval)
+                    continue
+                self.queue.wakeup.clear()
+                if self.queue.count(JOB_QUEUED) == 0:
+                    self.queue.wakeup.wait(self.poll_interval)
+                    continue
+                # 몰려오는 요청을 한 배치로 묶기 위해 잠시 대기
+                time.sleep(self.batch_wait)
+                jobs = self.queue.claim_batch(self.batch_size)
+                if jobs:
+                    self.process_batch(jobs)
+            except Exception as e:
+                # 배치 하나의 오류로 워커 스레드가 멈추지 않도록 함 (갤러리에 저장되지 않은 작업만 실패 처리)
+                print(f"등록 배치 처리 실패: {e}")
+                try:
+                    self.queue.fail_running([job["job_id"] for job in jobs], e)
+                except Exception as fail_error:
+                    print(f"등록 작업 실패 기록 실패: {fail_error}")
+                self._stop.wait(self.poll_interval)
+        # 종료 전에 게시된 작업을 한 번 더 저장 시도 (실패하면 다음 시작 때 다시 등록됨)
+        try:
+            self._save_unsaved()
+        except Exception as e:
+            print(f"종료 중 등록 작업 저장 실패: {e}")
+
+    def process_batch(self, jobs):
+        """
+        작업 배치 처리: 임베딩 추출 후 한 번에 갤러리에 게시하고 한 번만 저장
+        (게시된 작업부터 식별 대상이 되며, 저장이 끝나면 committed로 기록한 뒤 메타데이터 기록과 완료 표시)
+        """
+        try:
+            errors = self.speaker_model.register_speakers_waveforms(
+                [(job["speaker_id"], job["waveform"], job["sample_rate"]) for job in jobs], save=False
+            )
+        except Exception as e:
+            print(f"등록 배치 처리 실패: {e}")
+            for job in jobs:
+                self.queue.fail(job["job_id"], e)
+            return
+
+        published = []
+        for job, error in zip(jobs, errors):
+            if error is not None:
+                print(f"등록 작업 실패: {job['job_id']} ({job['speaker_id']}): {error}")
+                self.queue.fail(job["job_id"], error)
+                continue
+            published.append(job)
+        if published:
+            # 게시된 작업은 저장이 실패해도 실패 처리하지 않음 (다시 등록하면 중복됨)
+            self.queue.mark_published([job["job_id"] for job in published])
+            self._unsaved.extend(published)
+        self._save_unsaved()
+
+    def _save_unsaved(self):
+        """
+        게시된 작업을 저장하고 committed로 기록한 뒤 마무리
+        Returns:
+            bool: 저장 여부 (실패하면 작업은 그대로 두고 다음에 다시 저장)
+        """
+        if not self._unsaved:
+            return True
+        try:
+            self.speaker_model.save_embeddings()
+        except Exception as e:
+            print(f"등록 작업 {len(self._unsaved)}개 저장 실패 (다시 시도합니다): {e}")
+            return False
+        jobs, self._unsaved = self._unsaved, []
+        # 이후 단계가 실패하거나 중단되어도 다시 임베딩하지 않도록 먼저 기록
+        self.queue.mark_committed([job["job_id"] for job in jobs])
+        self._finish_committed(jobs)
+        print(f"등록 작업 {len(jobs)}개 완료")
+        return True
+
+    def _finish_committed(self, jobs):
+        """갤러리에 저장된 작업의 메타데이터 기록 후 완료 표시"""
+        if self.metadata_store is not None:
+            for job in jobs:
+                self.metadata_store.record_registration(job["speaker_id"], job["client"], job["metadata"])
+        self.queue.complete([job["job_id"] for job in jobs])
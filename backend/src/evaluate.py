@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+오프라인 화자 식별 평가
+
+등록 폴더와 평가 폴더의 모든 음성을 병렬 배치로 임베딩하고(결과는 캐시),
+전체 trial 점수 행렬을 한 번의 행렬 연산으로 계산하여
+식별 정확도, EER, DET 곡선, 추천 임계값을 출력합니다.
+
+사용 예:
+    python src/evaluate.py --enroll_dir data --test_dir test --workers 2 --report logs/eval_report.json
+    # 화자 임베딩 전용 모델과 비교
+    python src/evaluate.py --speaker_model exp/spk_ecapa --report logs/eval_report_spk.json
+"""
+import os
+import json
+import time
+import pickle
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from tqdm import tqdm
+
+from tuned_profile import load_tuned_profile, available_cpus
+
+# 프로세스 풀 워커마다 한 번만 로드하는 모델
+_worker_model = None
+
+
+def collect_labeled_files(base_dir):
+    """
+    화자별 하위 폴더의 WAV 파일 수집 (폴더명이 화자 ID)
+    Returns:
+        list: (화자 ID, 파일 경로) 튜플 리스트
+    """
+    base_path = Path(base_dir)
+    if not base_path.exists():
+        raise FileNotFoundError(f"폴더가 존재하지 않습니다: {base_dir}")
+    return [(audio_file.parent.name, str(audio_file))
+            for audio_file in sorted(base_path.glob("*/*.wav"))]
+
+
+def _cache_key(audio_path, extractor_version):
+    """파일 경로/수정 시각/크기/추출기로 만든 캐시 키 (파일이나 모델이 바뀌면 다시 임베딩)"""
+    stat = os.stat(audio_path)
+    return (os.path.abspath(audio_path), stat.st_mtime_ns, stat.st_size, extractor_version)
+
+
+def _init_worker(num_threads, speaker_model=None):
+    global _worker_model
+    from speaker_recognition import SpeakerRecognition
+    # 갤러리 파일 없이 지정한 추출기만 로드
+    _worker_model = SpeakerRecognition(embeddings_file=None, num_threads=num_threads, interop_threads=1,
+                                       speaker_model=speaker_model)
+
+
+def _embed_batch(audio_paths):
+    return [np.asarray(_worker_model.extract_speaker_embedding(path), dtype=np.float32) for path in audio_paths]
+
+
+def embed_files(audio_paths, cache_file=None, batch_size=8, workers=1, speaker_recognition=None, speaker_model=None):
+    """
+    음성 파일 임베딩 (캐시에 없는 파일만 병렬 배치로 추출)
+    Args:
+        audio_paths (list): 음성 파일 경로 리스트
+        cache_file (str): 임베딩 캐시 파일 (None이면 캐시하지 않음)
+        batch_size (int): 워커에 한 번에 보내는 파일 수
+        workers (int): 프로세스 수 (1이면 현재 프로세스에서 추출)
+        speaker_recognition (SpeakerRecognition): workers=1일 때 사용할 모델 (없으면 새로 로드)
+        speaker_model (str): 화자 임베딩 전용 모델 체크포인트 (None이면 ASR 토큰 임베딩)
+    Returns:
+        list: audio_paths 순서의 임베딩 리스트
+    """
+    # 모델 의존성은 임베딩할 때만 임포트 (점수 계산 함수는 numpy만으로 사용/테스트 가능)
+    from speaker_recognition import SpeakerRecognition
+    from extractors import ASR_MODEL_TAG, SPEAKER_EMBEDDING_METHOD, resolve_extractor_version
+
+    cache = {}
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, "rb") as f:
+            cache = pickle.load(f)
+
+    if speaker_recognition is not None:
+        extractor_version = speaker_recognition.extractor_version
+    else:
+        extractor_version = resolve_extractor_version(
+            f"{SPEAKER_EMBEDDING_METHOD}@{speaker_model}" if speaker_model else ASR_MODEL_TAG
+        )
+    keys = [_cache_key(path, extractor_version) for path in audio_paths]
+    missing = list(dict.fromkeys(path for path, key in zip(audio_paths, keys) if key not in cache))
+    print(f"임베딩: 총 {len(audio_paths)}개 파일 중 캐시 {len(audio_paths) - len(missing)}개, 추출 {len(missing)}개")
+
+    if missing:
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        if workers > 1:
+            threads_per_worker = max(1, available_cpus() // workers)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(threads_per_worker, speaker_model)) as executor:
+                results = list(tqdm(executor.map(_embed_batch, batches), total=len(batches), desc="임베딩 배치", unit="배치"))
+        else:
+            model = speaker_recognition or SpeakerRecognition(embeddings_file=None, speaker_model=speaker_model)
+            results = [[np.asarray(model.extract_speaker_embedding(path), dtype=np.float32) for path in batch]
+                       for batch in tqdm(batches, desc="임베딩 배치", unit="배치")]
+        for batch, embeddings in zip(batches, results):
+            for path, embedding in zip(batch, embeddings):
+                cache[_cache_key(path, extractor_version)] = embedding
+
+        if cache_file:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+            with open(cache_file, "wb") as f:
+                pickle.dump(cache, f)
+
+    return [cache[key] for key in keys]
+
+
+def _padded_matrix(embeddings):
+    """임베딩 리스트를 (N, 최대 차원) 0 채움 행렬과 벡터별 차원으로 변환"""
+    vectors = [np.asarray(e, dtype=np.float32).reshape(-1) for e in embeddings]
+    dims = np.asarray([len(v) for v in vectors])
+    matrix = np.zeros((len(vectors), int(dims.max())), dtype=np.float32)
+    for i, v in enumerate(vectors):
+        matrix[i, :len(v)] = v
+    return matrix, dims
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def score_matrix(test_embeddings, enroll_embeddings, enroll_labels):
+    """
+    trial 점수 행렬 (평가 파일 x 등록 화자, 화자별 등록 임베딩 중 최대 코사인 유사도)
+    서빙(SpeakerRecognition._max_similarity)과 같이 임베딩 쌍마다 두 차원 중 작은 차원으로 잘라
+    코사인 유사도를 계산하므로, 여기서 구한 EER 임계값을 서빙에 그대로 쓸 수 있음
+    (차원 조합별로 묶어서 행렬곱으로 계산)
+    Returns:
+        tuple: (점수 행렬, 화자 ID 리스트)
+    """
+    # 화자별로 열이 연속되도록 정렬한 뒤 reduceat으로 화자별 최대값 계산
+    order = np.argsort(np.asarray(enroll_labels), kind="stable")
+    sorted_labels = [enroll_labels[i] for i in order]
+    speakers, starts = np.unique(sorted_labels, return_index=True)
+
+    test_matrix, test_dims = _padded_matrix(test_embeddings)
+    enroll_matrix, enroll_dims = _padded_matrix([enroll_embeddings[i] for i in order])
+    if len(np.unique(np.concatenate([test_dims, enroll_dims]))) > 1:
+        print("경고: 임베딩 차원이 서로 달라 서빙과 같이 쌍마다 더 작은 차원으로 맞춰 계산합니다.")
+
+    file_scores = np.empty((len(test_dims), len(enroll_dims)), dtype=np.float32)
+    for test_dim in np.unique(test_dims):
+        rows = np.flatnonzero(test_dims == test_dim)
+        for enroll_dim in np.unique(enroll_dims):
+            columns = np.flatnonzero(enroll_dims == enroll_dim)
+            dim = min(test_dim, enroll_dim)
+            file_scores[np.ix_(rows, columns)] = (
+                _normalize_rows(test_matrix[rows, :dim]) @ _normalize_rows(enroll_matrix[columns, :dim]).T
+            )
+    return np.maximum.reduceat(file_scores, starts, axis=1), list(speakers)
+
+
+def compute_eer(target_scores, nontarget_scores, num_points=100):
+    """
+    EER과 DET 곡선 계산
+    Returns:
+        tuple: (EER, EER 임계값, DET 점 리스트)
+    """
+    thresholds = np.unique(np.concatenate([target_scores, nontarget_scores]))
+    sorted_targets = np.sort(target_scores)
+    sorted_nontargets = np.sort(nontarget_scores)
+    # 임계값 이상이면 수락: FRR = 임계값 미만 target 비율, FAR = 임계값 이상 nontarget 비율
+    frr = np.searchsorted(sorted_targets, thresholds, side="left") / max(len(sorted_targets), 1)
+    far = 1.0 - np.searchsorted(sorted_nontargets, thresholds, side="left") / max(len(sorted_nontargets), 1)
+
+    index = int(np.argmin(np.abs(far - frr)))
+    eer = float((far[index] + frr[index]) / 2)
+
+    step = max(1, len(thresholds) // num_points)
+    det = [{"threshold": float(t), "far": float(a), "frr": float(r)}
+           for t, a, r in zip(thresholds[::step], far[::step], frr[::step])]
+    return eer, float(thresholds[index]), det
+
+
+def identification_accuracy(scores, speakers, test_labels, threshold):
+    """
+    개방형 식별 정확도 (등록되지 않은 화자는 거부해야 정답)
+    Returns:
+        float: 정확도
+    """
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(best)), best]
+    predicted = np.where(best_scores >= threshold, np.asarray(speakers, dtype=object)[best], None)
+    expected = np.asarray([label if label in speakers else None for label in test_labels], dtype=object)
+    return float(np.mean(predicted == expected))
+
+
+def best_accuracy_threshold(scores, speakers, test_labels):
+    """
+    식별 정확도가 최대인 임계값 (모든 후보 임계값을 누적합으로 한 번에 평가)
+    Returns:
+        tuple: (임계값, 정확도)
+    """
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(best)), best]
+    speaker_array = np.asarray(speakers, dtype=object)
+    known = np.asarray([label in speakers for label in test_labels])
+    correct_if_accept = known & (speaker_array[best] == np.asarray(test_labels, dtype=object))
+    correct_if_reject = ~known
+
+    # 점수 오름차순 정렬 후, 임계값 = i번째 점수일 때 앞의 i개는 거부, 나머지는 수락
+    order = np.argsort(best_scores)
+    sorted_scores = best_scores[order]
+    reject_correct = np.concatenate([[0], np.cumsum(correct_if_reject[order])])
+    accept_correct = np.concatenate([np.cumsum(correct_if_accept[order][::-1])[::-1], [0]])
+    accuracy = (reject_correct + accept_correct) / len(best_scores)
+    # 같은 점수 사이에서는 나눌 수 없으므로 (같은 점수는 모두 수락되거나 모두 거부됨) 점수가 바뀌는 위치만 후보
+    valid = np.concatenate([[True], sorted_scores[1:] > sorted_scores[:-1], [True]])
+    accuracy = np.where(valid, accuracy, -1.0)
+
+    index = int(np.argmax(accuracy))
+    candidates = np.concatenate([sorted_scores, [sorted_scores[-1] + 1e-6]])
+    return float(candidates[index]), float(accuracy[index])
+
+
+def evaluate(enroll_files, test_files, enroll_embeddings, test_embeddings, threshold=0.7):
+    """
+    평가 지표 계산
+    Returns:
+        dict: 평가 결과
+    """
+    enroll_labels = [label for label, _ in enroll_files]
+    test_labels = [label for label, _ in test_files]
+
+    start_time = time.time()
+    scores, speakers = score_matrix(test_embeddings, enroll_embeddings, enroll_labels)
+    target_mask = np.asarray(test_labels, dtype=object)[:, None] == np.asarray(speakers, dtype=object)[None, :]
+    target_scores = scores[target_mask]
+    nontarget_scores = scores[~target_mask]
+
+    result = {
+        "numEnrollFiles": len(enroll_files),
+        "numTestFiles": len(test_files),
+        "numSpeakers": len(speakers),
+        "numTargetTrials": int(target_scores.size),
+        "numNontargetTrials": int(nontarget_scores.size),
+        "threshold": threshold,
+        "accuracy": identification_accuracy(scores, speakers, test_labels, threshold),
+    }
+    if target_scores.size and nontarget_scores.size:
+        eer, eer_threshold, det = compute_eer(target_scores, nontarget_scores)
+        result.update({"eer": eer, "eerThreshold": eer_threshold, "det": det})
+    recommended, recommended_accuracy = best_accuracy_threshold(scores, speakers, test_labels)
+    result.update({
+        "recommendedThreshold": recommended,
+        "recommendedAccuracy": recommended_accuracy,
+        "scoringSeconds": round(time.time() - start_time, 4)
+    })
+    return result
+
+
+def main():
+    # 튜닝 프로파일(autotune.py 결과)이 있으면 워커 수/배치 크기 기본값으로 사용
+    profile = load_tuned_profile()
+
+    parser = argparse.ArgumentParser(description="오프라인 화자 식별 평가")
+    parser.add_argument("--enroll_dir", default="data", help="등록용 음성 폴더 (하위 폴더명이 화자 ID)")
+    parser.add_argument("--test_dir", default="test", help="평가용 음성 폴더 (하위 폴더명이 화자 ID)")
+    parser.add_argument("--cache_file", default="logs/eval_embeddings_cache.pkl", help="임베딩 캐시 파일")
+    parser.add_argument("--batch_size", type=int, default=profile.get("batch_size", 8), help="워커에 한 번에 보내는 파일 수")
+    parser.add_argument("--workers", type=int, default=profile.get("workers", 1), help="임베딩 추출 프로세스 수")
+    parser.add_argument("--threshold", type=float, default=0.7, help="현재 유사도 임계값")
+    parser.add_argument("--report", help="평가 결과 JSON 저장 경로")
+    parser.add_argument("--speaker_model", help="화자 임베딩 전용 모델 체크포인트 (생략 시 ASR 토큰 임베딩)")
+
+    args = parser.parse_args()
+
+    total_start_time = time.time()
+    enroll_files = collect_labeled_files(args.enroll_dir)
+    test_files = collect_labeled_files(args.test_dir)
+    print(f"등록 파일 {len(enroll_files)}개, 평가 파일 {len(test_files)}개")
+
+    embeddings = embed_files(
+        [path for _, path in enroll_files] + [path for _, path in test_files],
+        cache_file=args.cache_file,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        speaker_model=args.speaker_model
+    )
+    result = evaluate(enroll_files, test_files, embeddings[:len(enroll_files)], embeddings[len(enroll_files):], args.threshold)
+
+    print(f"trial 수: target {result['numTargetTrials']}, non-target {result['numNontargetTrials']} "
+          f"(점수 계산 {result['scoringSeconds']:.4f}초)")
+    print(f"식별 정확도 (임계값 {args.threshold}): {result['accuracy']:.2%}")
+    if "eer" in result:
+        print(f"EER: {result['eer']:.2%} (임계값 {result['eerThreshold']:.4f})")
+    print(f"추천 임계값: {result['recommendedThreshold']:.4f} (식별 정확도 {result['recommendedAccuracy']:.2%})")
+
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"평가 결과 저장됨: {args.report}")
+    print(f"총 실행 시간: {time.time() - total_start_time:.2f}초")
+
+
+if __name__ == "__main__":
+    main()
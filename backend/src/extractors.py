@@ -0,0 +1,247 @@
+"""
+화자 임베딩 추출기
+
+갤러리 임베딩을 만드는 모델을 추출기 인터페이스 뒤로 분리합니다.
+- AsrTokenExtractor ("asr-tokens-v1"): ESPnet Speech2Text의 인식 토큰열을 임베딩으로 사용 (인식 텍스트도 함께 얻음)
+- SpeakerEmbeddingExtractor ("spk-v1"): ESPnet2 spk 태스크의 화자 임베딩 모델 (ECAPA-TDNN, x-vector, RawNet3 등)
+  빔 서치 없이 인코더 한 번으로 고정 길이 임베딩을 만들어 ASR 모델보다 작고 빠름
+
+추출기 버전 "<방식>@<모델 태그 또는 체크포인트 경로>"는 갤러리 파일과 스냅샷에 기록됩니다.
+"""
+from pathlib import Path
+
+import numpy as np
+import torch
+from espnet2.bin.asr_inference import Speech2Text
+
+try:
+    from .profiling import install_model_hooks
+except ImportError:
+    from profiling import install_model_hooks
+
+# 기본 ESPnet ASR 모델 (인식 텍스트와 asr-tokens 임베딩)
+ASR_MODEL_TAG = "espnet/kan-bayashi_csj_asr_train_asr_transformer_raw_char_sp_valid.acc.ave"
+
+# 임베딩 추출 방식 (방식이 바뀌면 올려서 이전 임베딩과 섞이지 않도록 함)
+ASR_TOKENS_METHOD = "asr-tokens-v1"
+SPEAKER_EMBEDDING_METHOD = "spk-v1"
+
+
+def parse_extractor_version(extractor_version):
+    """
+    추출기 버전을 (방식, 모델)로 분리
+    Returns:
+        tuple: (방식, 모델 태그 또는 경로) (알 수 없는 방식이면 (None, None))
+    """
+    method, _, model = (extractor_version or "").partition("@")
+    if method not in EXTRACTORS or not model:
+        return None, None
+    return method, model
+
+
+def resolve_extractor_version(spec):
+    """
+    추출기 지정 문자열을 추출기 버전으로 변환
+    Args:
+        spec (str): 추출기 버전("spk-v1@<체크포인트>") 또는 ASR 모델 태그
+    Returns:
+        str: 추출기 버전
+    """
+    method, model = parse_extractor_version(spec)
+    if method is None:
+        return f"{ASR_TOKENS_METHOD}@{spec}"
+    # 로컬 체크포인트는 절대 경로로 기록 (작업 디렉터리와 무관하게 같은 버전)
+    if method == SPEAKER_EMBEDDING_METHOD and Path(model).exists():
+        return f"{method}@{Path(model).resolve()}"
+    return spec
+
+
+class EmbeddingExtractor:
+    """추출기 공통 인터페이스 (입력은 16kHz 모노 numpy 파형 한 구간)"""
+    method = None
+    supports_text = False  # 임베딩과 함께 인식 텍스트를 만드는지 여부
+    fixed_size = True  # 구간마다 같은 차원의 임베딩을 만드는지 여부 (구간 임베딩을 평균할 수 있음)
+    span_name = "embedding_inference"  # 프로파일링 구간 이름
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    @property
+    def version(self):
+        return f"{self.method}@{self.model}"
+
+    @property
+    def frontend(self):
+        """특징 추출 프론트엔드 (특징 저장소 보관/재임베딩용, 없으면 None)"""
+        return None
+
+    @property
+    def frame_rate(self):
+        """프론트엔드 특징의 초당 프레임 수"""
+        hop_length = getattr(self.frontend, "hop_length", None) or 160
+        return 16000 / hop_length
+
+    def embed(self, speech):
+        """
+        음성 한 구간의 화자 임베딩
+        Args:
+            speech (numpy.ndarray): 16kHz 모노 파형
+        Returns:
+            numpy.ndarray: 화자 임베딩
+        """
+        raise NotImplementedError
+
+    def extract_features(self, speech):
+        """
+        프론트엔드 특징 추출 (정규화 이전)
+        Returns:
+            numpy.ndarray: (프레임 수, 특징 차원) 특징 (프론트엔드가 없으면 None)
+        """
+        frontend = self.frontend
+        if frontend is None:
+            return None
+        with torch.no_grad():
+            speech_tensor = torch.from_numpy(np.ascontiguousarray(speech, dtype=np.float32)).unsqueeze(0).to(self.device)
+            lengths = torch.tensor([speech_tensor.shape[1]], dtype=torch.long)
+            feats, _ = frontend(speech_tensor, lengths)
+        return feats[0].cpu().numpy()
+
+    def embed_features(self, features):
+        """
+        저장된 프론트엔드 특징 한 구간의 화자 임베딩 (프론트엔드 이후 단계만 수행)
+        Args:
+            features (numpy.ndarray): (프레임 수, 특징 차원) 특징
+        Returns:
+            numpy.ndarray: 화자 임베딩
+        """
+        raise NotImplementedError
+
+    def _features_tensor(self, features):
+        feats = torch.from_numpy(np.ascontiguousarray(features, dtype=np.float32)).unsqueeze(0).to(self.device)
+        return feats, torch.tensor([feats.shape[1]], dtype=torch.long)
+
+
+class AsrTokenExtractor(EmbeddingExtractor):
+    """ESPnet ASR 인식 토큰열을 임베딩으로 사용 (기존 방식)"""
+    method = ASR_TOKENS_METHOD
+    supports_text = True
+    fixed_size = False  # 임베딩이 구간마다 길이가 다른 토큰 ID열이라 평균하면 의미가 없음
+    span_name = "asr_inference"
+
+    def __init__(self, model_tag, device):
+        super().__init__(model_tag, device)
+        self.speech2text = Speech2Text.from_pretrained(model_tag, device=device)
+        # 프로파일링 중인 요청에서 인코더/빔 서치 구간을 기록
+        install_model_hooks(self.speech2text)
+
+    @property
+    def frontend(self):
+        return getattr(self.speech2text.asr_model, "frontend", None)
+
+    def recognize(self, speech):
+        """
+        음성 인식 수행
+        Returns:
+            tuple: (인식된 텍스트, 화자 임베딩)
+        """
+        nbests = self.speech2text(speech)
+        return nbests[0][0], nbests[0][2]
+
+    def embed(self, speech):
+        return self.recognize(speech)[1]
+
+    def embed_features(self, features):
+        asr_model = self.speech2text.asr_model
+        feats, lengths = self._features_tensor(features)
+        if asr_model.normalize is not None:
+            feats, lengths = asr_model.normalize(feats, lengths)
+        if getattr(asr_model, "preencoder", None) is not None:
+            feats, lengths = asr_model.preencoder(feats, lengths)
+        enc, enc_lengths = asr_model.encoder(feats, lengths)[:2]
+        if getattr(asr_model, "postencoder", None) is not None:
+            enc, enc_lengths = asr_model.postencoder(enc, enc_lengths)
+        nbests = self.speech2text._decode_single_sample(enc[0])
+        return nbests[0][2]
+
+
+class SpeakerEmbeddingExtractor(EmbeddingExtractor):
+    """ESPnet2 spk 태스크 화자 임베딩 모델 (로컬 체크포인트 또는 모델 태그)"""
+    method = SPEAKER_EMBEDDING_METHOD
+    span_name = "speaker_inference"
+
+    def __init__(self, checkpoint, device):
+        """
+        Args:
+            checkpoint (str): 학습 디렉터리(config.yaml + *.pth), .pth 파일 경로 또는 모델 태그
+            device (str): 추론 디바이스
+        """
+        # spk 태스크가 없는 ESPnet에서도 기본 ASR 추출기는 쓸 수 있도록 이 추출기를 만들 때만 임포트
+        from espnet2.bin.spk_inference import Speech2Embedding
+
+        path = Path(checkpoint)
+        if path.exists():
+            train_config, model_file = self._resolve_checkpoint(path)
+            checkpoint = str(path.resolve())
+            self.speech2embedding = Speech2Embedding(
+                train_config=str(train_config), model_file=str(model_file), device=device
+            )
+        else:
+            self.speech2embedding = Speech2Embedding.from_pretrained(model_tag=checkpoint, device=device)
+        super().__init__(checkpoint, device)
+        install_model_hooks(self.speech2embedding)
+
+    @staticmethod
+    def _resolve_checkpoint(path):
+        """체크포인트 경로에서 (config.yaml, 모델 파일) 찾기 (평균 모델 > 최고 성능 모델 > 마지막 파일 순)"""
+        model_dir = path if path.is_dir() else path.parent
+        train_config = model_dir / "config.yaml"
+        if not train_config.exists():
+            raise FileNotFoundError(f"config.yaml이 없습니다: {model_dir}")
+        if path.is_file():
+            return train_config, path
+        candidates = sorted(model_dir.glob("*.pth"))
+        for pattern in ("ave", "best"):
+            preferred = [candidate for candidate in candidates if pattern in candidate.name]
+            if preferred:
+                return train_config, preferred[-1]
+        if not candidates:
+            raise FileNotFoundError(f"모델 파일(*.pth)이 없습니다: {model_dir}")
+        return train_config, candidates[-1]
+
+    @property
+    def frontend(self):
+        return getattr(self.speech2embedding.spk_model, "frontend", None)
+
+    def embed(self, speech):
+        embedding = self.speech2embedding(np.ascontiguousarray(speech, dtype=np.float32))
+        return embedding.detach().cpu().numpy().reshape(-1)
+
+    def embed_features(self, features):
+        spk_model = self.speech2embedding.spk_model
+        feats, lengths = self._features_tensor(features)
+        if spk_model.normalize is not None:
+            feats, lengths = spk_model.normalize(feats, lengths)
+        frame_level_feats = spk_model.encode_frame(feats)
+        utt_level_feat = spk_model.aggregate(frame_level_feats)
+        embedding = spk_model.project_spk_embd(utt_level_feat)
+        return embedding.detach().cpu().numpy().reshape(-1)
+
+
+EXTRACTORS = {
+    ASR_TOKENS_METHOD: AsrTokenExtractor,
+    SPEAKER_EMBEDDING_METHOD: SpeakerEmbeddingExtractor,
+}
+
+
+def load_extractor(extractor_version, device="cpu"):
+    """
+    추출기 버전에 맞는 추출기 로드
+    Args:
+        extractor_version (str): 추출기 버전 (또는 ASR 모델 태그)
+        device (str): 추론 디바이스
+    Returns:
+        EmbeddingExtractor: 추출기
+    """
+    method, model = parse_extractor_version(resolve_extractor_version(extractor_version))
+    return EXTRACTORS[method](model, device)
@@ -0,0 +1,130 @@
+"""
+등록 음성 특징(fbank) 저장소
+
+등록할 때 모델 프론트엔드가 만든 log-mel fbank 특징을 float16으로 등록 건마다 하나의
+.npz 파일로 보관합니다. 임베딩 모델을 바꿀 때 원본 음성 없이 이 특징에서 갤러리 전체를
+다시 임베딩할 수 있습니다. (같은 프론트엔드 설정을 쓰는 모델 사이에서만 사용 가능)
+긴 음성은 긴 음성 정책이 임베딩에 사용한 구간의 특징만 구간별로 저장합니다.
+(구간 특징을 이어 붙인 features와 구간별 프레임 수 lengths, lengths가 없는 이전 파일은 전체 음성 한 구간)
+
+디렉터리 구조:
+    <root>/<화자 ID의 md5>/speaker_id.txt
+    <root>/<화자 ID의 md5>/<등록 시각(ns)>-<임의 값>.npz
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+
+import numpy as np
+
+SPEAKER_ID_FILE = "speaker_id.txt"
+
+
+def frontend_signature(frontend):
+    """
+    특징 호환성 확인용 프론트엔드 설정 (STFT/멜 설정)
+    Args:
+        frontend: ESPnet 프론트엔드 모듈 (추출기의 frontend)
+    Returns:
+        dict: 프론트엔드 설정 (프론트엔드가 없으면 None)
+    """
+    if frontend is None:
+        return None
+    stft = getattr(frontend, "stft", None)
+    logmel = getattr(frontend, "logmel", None)
+    signature = {
+        "frontend": type(frontend).__name__,
+        "hop_length": getattr(frontend, "hop_length", None),
+        "n_fft": getattr(stft, "n_fft", None),
+        "win_length": getattr(stft, "win_length", None),
+        "mel": getattr(logmel, "mel_options", None),
+    }
+    # JSON으로 저장/비교할 수 있도록 기본 타입으로 변환
+    return json.loads(json.dumps(signature, default=str, sort_keys=True))
+
+
+class FeatureStore:
+    def __init__(self, root="features"):
+        """
+        등록 음성 특징 저장소
+        Args:
+            root (str): 저장 디렉터리
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _speaker_dir(self, speaker_id):
+        return self.root / hashlib.md5(speaker_id.encode("utf-8")).hexdigest()
+
+    def add(self, speaker_id, segments, signature):
+        """
+        등록 한 건의 특징 저장
+        Args:
+            speaker_id (str): 화자 ID
+            segments (list): 임베딩에 사용한 구간별 (프레임 수, 특징 차원) fbank 특징 리스트
+            signature (dict): 특징을 만든 프론트엔드 설정
+        Returns:
+            str: 특징 ID (등록 순서대로 정렬됨)
+        """
+        speaker_dir = self._speaker_dir(speaker_id)
+        feature_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        with self._lock:
+            speaker_dir.mkdir(exist_ok=True)
+            id_file = speaker_dir / SPEAKER_ID_FILE
+            if not id_file.exists():
+                id_file.write_text(speaker_id, encoding="utf-8")
+            # 임시 파일에 쓴 뒤 교체 (저장 중 중단되어도 깨진 특징이 남지 않음)
+            temp_file = speaker_dir / f"{feature_id}.tmp"
+            with open(temp_file, "wb") as f:
+                np.savez(f, features=np.concatenate(segments).astype(np.float16),
+                         lengths=np.array([len(segment) for segment in segments], dtype=np.int64),
+                         signature=json.dumps(signature, sort_keys=True))
+            os.replace(temp_file, speaker_dir / f"{feature_id}.npz")
+        return feature_id
+
+    def load(self, speaker_id, feature_id):
+        """
+        특징 로드
+        Returns:
+            tuple: (구간별 float32 특징 행렬 리스트, 프론트엔드 설정 dict)
+        """
+        with np.load(self._speaker_dir(speaker_id) / f"{feature_id}.npz") as data:
+            features = data["features"].astype(np.float32)
+            lengths = data["lengths"] if "lengths" in data.files else [len(features)]
+            signature = json.loads(str(data["signature"]))
+        return np.split(features, np.cumsum(lengths)[:-1]), signature
+
+    def entries(self):
+        """
+        저장된 모든 특징
+        Returns:
+            list: 등록 순서로 정렬된 (speaker_id, feature_id) 튜플 리스트
+        """
+        entries = []
+        with self._lock:
+            for speaker_dir in self.root.iterdir():
+                id_file = speaker_dir / SPEAKER_ID_FILE
+                if not id_file.exists():
+                    continue
+                speaker_id = id_file.read_text(encoding="utf-8")
+                entries.extend((speaker_id, path.stem) for path in speaker_dir.glob("*.npz"))
+        return sorted(entries, key=lambda entry: entry[1])
+
+    def speakers(self):
+        """특징이 저장된 화자 ID 집합"""
+        return {speaker_id for speaker_id, _ in self.entries()}
+
+    def delete_speaker(self, speaker_id):
+        """화자의 특징 전체 삭제"""
+        with self._lock:
+            shutil.rmtree(self._speaker_dir(speaker_id), ignore_errors=True)
+
+    def nbytes(self):
+        """저장소 전체 크기 (바이트)"""
+        return sum(path.stat().st_size for path in self.root.glob("*/*.npz"))
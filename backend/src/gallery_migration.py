@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+갤러리 모델 교체 마이그레이션
+
+특징 저장소에 보관된 등록 음성 특징(fbank)으로 갤러리 전체를 새 모델로 다시 임베딩합니다.
+재임베딩은 백그라운드 스레드에서 배치 단위로 진행되고 그동안 이전 모델과 갤러리가 계속 서빙합니다.
+끝나면 등록만 잠시 막고 그 사이에 들어온 등록을 마저 임베딩한 뒤, 새 모델과 새 갤러리를
+한 스냅샷으로 게시해 원자적으로 교체합니다.
+
+사용 예시 (서버 없이 실행):
+    python src/gallery_migration.py --target <새 ASR 모델 태그 또는 spk-v1@<체크포인트>> --feature_store features
+"""
+import time
+import argparse
+import threading
+from datetime import datetime
+
+try:
+    from .feature_store import frontend_signature
+    from .extractors import resolve_extractor_version
+    from .speaker_recognition import SpeakerRecognition
+except ImportError:
+    from feature_store import frontend_signature
+    from extractors import resolve_extractor_version
+    from speaker_recognition import SpeakerRecognition
+
+# 마이그레이션 상태
+MIGRATION_PENDING = "pending"
+MIGRATION_LOADING = "loading"
+MIGRATION_EMBEDDING = "embedding"
+MIGRATION_CUTOVER = "cutover"
+MIGRATION_DONE = "done"
+MIGRATION_FAILED = "failed"
+
+
+class GalleryMigration:
+    def __init__(self, speaker_recognition, target, batch_size=16, drop_missing=False, on_done=None):
+        """
+        모델 교체 작업
+        Args:
+            speaker_recognition (SpeakerRecognition): 서빙 중인 화자 인식 모델 (특징 저장소 필요)
+            target (str): 새 추출기 ("spk-v1@<체크포인트>" 형식의 추출기 버전 또는 ASR 모델 태그)
+            batch_size (int): 진행 상황을 갱신하는 재임베딩 단위
+            drop_missing (bool): 특징이 없는 화자(특징 저장 이전 등록)를 새 갤러리에서 제외할지 여부
+            on_done (callable): 교체 후 호출할 함수 (메타데이터 동기화 등)
+        """
+        if speaker_recognition.feature_store is None:
+            raise ValueError("특징 저장소가 없어 마이그레이션할 수 없습니다")
+        if speaker_recognition.gallery is not None:
+            raise ValueError("샤딩 모드에서는 마이그레이션을 지원하지 않습니다")
+        self.speaker_recognition = speaker_recognition
+        self.target_version = resolve_extractor_version(target)
+        self.batch_size = max(1, int(batch_size))
+        self.drop_missing = drop_missing
+        self.on_done = on_done
+
+        self.state = MIGRATION_PENDING
+        self.source_version = speaker_recognition.extractor_version
+        self.total = 0
+        self.done = 0
+        self.dropped = []
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._thread = None
+
+    def start(self):
+        self.started_at = datetime.now().isoformat()
+        self._thread = threading.Thread(target=self._run, name="gallery-migration", daemon=True)
+        self._thread.start()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self.state not in (MIGRATION_DONE, MIGRATION_FAILED)
+
+    def status(self):
+        return {
+            "state": self.state,
+            "sourceVersion": self.source_version,
+            "targetVersion": self.target_version,
+            "total": self.total,
+            "done": self.done,
+            "dropped": len(self.dropped),
+            "error": self.error,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+        }
+
+    def _run(self):
+        start_time = time.time()
+        try:
+            if self.source_version == self.target_version:
+                raise ValueError(f"이미 {self.target_version} 모델을 사용 중입니다")
+            # 다시 임베딩할 수 없는 화자는 무거운 작업 전에 확인
+            self.dropped = self.speaker_recognition.speakers_without_features()
+            if self.dropped and not self.drop_missing:
+                raise ValueError(f"특징이 없는 화자가 {len(self.dropped)}명 있습니다 "
+                                 f"(제외하고 진행하려면 drop_missing 사용)")
+
+            self.state = MIGRATION_LOADING
+            extractor = self.speaker_recognition.load_extractor(self.target_version)
+            signature = frontend_signature(extractor.frontend)
+
+            # 이전 모델이 서빙하는 동안 저장된 특징 전체를 새 모델로 임베딩
+            self.state = MIGRATION_EMBEDDING
+            migrated = {}
+            self._embed_pending(extractor, signature, migrated)
+
+            # 등록 잠금 안에서 그 사이 등록된 특징만 마저 임베딩한 뒤 교체
+            self.state = MIGRATION_CUTOVER
+            self.speaker_recognition.switch_extractor(
+                extractor,
+                catch_up=lambda: self._embed_pending(extractor, signature, migrated),
+                drop_missing=self.drop_missing
+            )
+            self.state = MIGRATION_DONE
+            if self.on_done is not None:
+                self.on_done()
+            print(f"마이그레이션 완료: {self.done}개 특징 ({time.time() - start_time:.2f}초)")
+        except Exception as e:
+            self.error = str(e)
+            self.state = MIGRATION_FAILED
+            print(f"마이그레이션 실패: {e}")
+        finally:
+            self.finished_at = datetime.now().isoformat()
+
+    def _embed_pending(self, extractor, signature, migrated):
+        """
+        아직 임베딩하지 않은 특징을 새 모델로 임베딩 (삭제된 특징은 결과에서 제거)
+        Args:
+            extractor (EmbeddingExtractor): 새 추출기
+            signature (dict): 새 모델의 프론트엔드 설정
+            migrated (dict): {(speaker_id, feature_id): 임베딩} (갱신됨)
+        Returns:
+            dict: migrated
+        """
+        store = self.speaker_recognition.feature_store
+        entries = store.entries()
+        live = set(entries)
+        for key in [key for key in migrated if key not in live]:
+            del migrated[key]
+        pending = [entry for entry in entries if entry not in migrated]
+        self.total = len(entries)
+        self.done = self.total - len(pending)
+
+        for start in range(0, len(pending), self.batch_size):
+            for speaker_id, feature_id in pending[start:start + self.batch_size]:
+                try:
+                    segments, stored_signature = store.load(speaker_id, feature_id)
+                except FileNotFoundError:
+                    continue  # 재임베딩 중에 삭제된 화자
+                if stored_signature != signature:
+                    raise ValueError(f"프론트엔드 설정이 다른 특징입니다: {speaker_id}/{feature_id} "
+                                     f"(새 모델은 원본 음성으로 다시 등록해야 합니다)")
+                migrated[(speaker_id, feature_id)] = self.speaker_recognition.embed_features(segments, extractor)
+            self.done = min(self.total, self.done + len(pending[start:start + self.batch_size]))
+        return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="저장된 특징으로 갤러리를 새 모델로 다시 임베딩")
+    parser.add_argument("--target", required=True, help="새 추출기 (ASR 모델 태그 또는 spk-v1@<체크포인트 경로>)")
+    parser.add_argument("--embeddings_file", default="speaker_embeddings.pkl", help="화자 임베딩 파일")
+    parser.add_argument("--feature_store", default="features", help="등록 음성 특징 디렉터리")
+    parser.add_argument("--batch_size", type=int, default=16, help="진행 상황 갱신 단위")
+    parser.add_argument("--drop_missing", action="store_true", help="특징이 없는 화자를 제외하고 진행")
+
+    args = parser.parse_args()
+
+    speaker_recognition = SpeakerRecognition(embeddings_file=args.embeddings_file,
+                                             feature_store_dir=args.feature_store)
+    migration = GalleryMigration(speaker_recognition, args.target, args.batch_size, args.drop_missing)
+    migration.start()
+    while migration.running:
+        migration.join(5.0)
+        status = migration.status()
+        print(f"  {status['state']}: {status['done']}/{status['total']}")
+    if migration.state == MIGRATION_FAILED:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+화자 갤러리 copy-on-write 스냅샷
+
+갤러리는 불변 스냅샷으로 게시됩니다. 등록/삭제는 쓰기 잠금 안에서 다음 버전을
+만들어 참조를 원자적으로 교체하고, 식별(읽기)은 잠금 없이 시작 시점의 스냅샷
+참조를 잡고 끝까지 그 버전만 사용합니다.
+
+스냅샷은 임베딩을 만든 추출기(모델)와 그 버전도 함께 가지고 있어서, 요청은 시작 시점
+스냅샷의 모델로 임베딩을 추출해 같은 버전의 임베딩과만 비교합니다. 모델 교체(마이그레이션)는
+새 모델의 임베딩과 모델을 담은 스냅샷 하나를 게시하는 것으로 원자적으로 이루어집니다.
+"""
+import os
+import pickle
+import threading
+from types import MappingProxyType
+
+try:
+    from .compact_embeddings import CompactGallery
+except ImportError:
+    from compact_embeddings import CompactGallery
+
+# 갤러리 파일 형식 버전 (1: 추출기 버전이 없는 {화자 ID: 임베딩 리스트})
+GALLERY_FORMAT = 2
+
+
+class ExtractorVersionMismatch(ValueError):
+    """다른 추출기 버전의 임베딩을 갤러리에 추가하려 할 때 (모델 교체 중 등록)"""
+
+
+def load_gallery_file(path):
+    """
+    갤러리 파일 로드
+    Args:
+        path (str): 갤러리 파일 경로
+    Returns:
+        tuple: ({화자 ID: 임베딩 리스트}, 추출기 버전 또는 None(이전 형식))
+    """
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    if isinstance(data, dict) and data.get("format") == GALLERY_FORMAT:
+        speaker_embeddings, extractor_version = data["speakers"], data["extractor_version"]
+    else:
+        speaker_embeddings, extractor_version = data, None
+    # 이전 포맷과의 호환성 유지: 단일 임베딩을 리스트로 변환
+    speaker_embeddings = {
+        speaker_id: embeddings if isinstance(embeddings, list) else [embeddings]
+        for speaker_id, embeddings in speaker_embeddings.items()
+    }
+    return speaker_embeddings, extractor_version
+
+
+def save_gallery_file(path, speaker_embeddings, extractor_version):
+    """
+    갤러리를 추출기 버전과 함께 저장 (임시 파일에 쓴 뒤 교체)
+    Args:
+        path (str): 갤러리 파일 경로
+        speaker_embeddings (dict): {화자 ID: 임베딩 리스트}
+        extractor_version (str): 임베딩을 만든 추출기 버전
+    """
+    temp_file = f"{path}.tmp"
+    with open(temp_file, "wb") as f:
+        pickle.dump({
+            "format": GALLERY_FORMAT,
+            "extractor_version": extractor_version,
+            "speakers": speaker_embeddings,
+        }, f)
+    os.replace(temp_file, path)
+
+
+class GallerySnapshot:
+    def __init__(self, version, speaker_embeddings, compactor=None, extractor=None, extractor_version=None,
+                 compact_gallery=None):
+        """
+        불변 갤러리 스냅샷
+        Args:
+            version (int): 스냅샷 버전 (게시할 때마다 1씩 증가)
+            speaker_embeddings (dict): {화자 ID: 임베딩 시퀀스}
+            compactor (EmbeddingCompactor): 압축 갤러리 생성에 사용할 압축기
+            extractor: 이 스냅샷의 임베딩을 만든 추출기 (모델)
+            extractor_version (str): 추출기 버전
+            compact_gallery (CompactGallery): 게시자가 만든 압축 갤러리 (없으면 처음 사용할 때 생성)
+        """
+        self.version = version
+        self.extractor = extractor
+        self.extractor_version = extractor_version
+        self.speaker_embeddings = MappingProxyType(
+            {speaker_id: tuple(embeddings) for speaker_id, embeddings in speaker_embeddings.items()}
+        )
+        self.compactor = compactor
+        self._compact_gallery = compact_gallery
+
+    def __len__(self):
+        return len(self.speaker_embeddings)
+
+    @property
+    def compact_gallery(self):
+        """
+        이 스냅샷의 압축 갤러리
+        게시자가 스냅샷과 함께 만들어 두므로 보통은 바로 반환하고, 직접 만든 스냅샷만 처음 사용할 때 생성
+        (여러 스레드가 동시에 생성해도 결과가 같으므로 잠금이 필요 없음)
+        """
+        if self._compact_gallery is None and self.compactor is not None:
+            self._compact_gallery = CompactGallery(self.compactor, self.speaker_embeddings)
+        return self._compact_gallery
+
+    def to_dict(self):
+        """저장용 {화자 ID: 임베딩 리스트} 복사본"""
+        return {speaker_id: list(embeddings) for speaker_id, embeddings in self.speaker_embeddings.items()}
+
+
+class VersionedGallery:
+    def __init__(self, speaker_embeddings=None, compactor=None, extractor=None, extractor_version=None):
+        """
+        스냅샷 게시자
+        Args:
+            speaker_embeddings (dict): 초기 {화자 ID: 임베딩 리스트}
+            compactor (EmbeddingCompactor): 압축기 (없으면 None)
+            extractor: 임베딩 추출기 (모델)
+            extractor_version (str): 추출기 버전
+        """
+        self.compactor = compactor
+        self.extractor = extractor
+        self.extractor_version = extractor_version
+        self._write_lock = threading.Lock()
+        speaker_embeddings = speaker_embeddings or {}
+        compact_gallery = CompactGallery(compactor, speaker_embeddings) if compactor is not None else None
+        self._snapshot = GallerySnapshot(0, speaker_embeddings, compactor, extractor, extractor_version,
+                                         compact_gallery)
+
+    def current(self):
+        """현재 스냅샷 (참조 읽기는 원자적이므로 잠금 없음)"""
+        return self._snapshot
+
+    def _publish(self, speaker_embeddings, changed=None):
+        """
+        다음 스냅샷 게시 (호출자가 _write_lock을 잡고 있어야 함)
+        압축 갤러리도 쓰기 잠금 안에서 미리 만들어, 게시 직후 읽기 요청들이 각자 다시 인코딩하지 않도록 함
+        Args:
+            speaker_embeddings (dict): 새 {화자 ID: 임베딩 시퀀스}
+            changed (iterable): 바뀐 화자 ID (지정 시 이전 압축 갤러리에서 해당 화자만 갱신, 없으면 전체 생성)
+        """
+        compact_gallery = None
+        if self.compactor is not None:
+            previous = self._snapshot._compact_gallery
+            if changed is not None and previous is not None and previous.compactor is self.compactor:
+                compact_gallery = previous.updated(speaker_embeddings, changed)
+            else:
+                compact_gallery = CompactGallery(self.compactor, speaker_embeddings)
+        self._snapshot = GallerySnapshot(self._snapshot.version + 1, speaker_embeddings, self.compactor,
+                                         self.extractor, self.extractor_version, compact_gallery)
+        return self._snapshot
+
+    def _check_version(self, extractor_version):
+        # 호출자가 _write_lock을 잡고 있어야 함
+        if extractor_version is not None and extractor_version != self.extractor_version:
+            raise ExtractorVersionMismatch(
+                f"추출기 버전이 다릅니다: {extractor_version} (현재 갤러리: {self.extractor_version})"
+            )
+
+    def replace(self, speaker_embeddings):
+        """갤러리 전체 교체 (파일에서 다시 로드할 때)"""
+        with self._write_lock:
+            return self._publish(speaker_embeddings)
+
+    def switch_extractor(self, speaker_embeddings, extractor, extractor_version, compactor=None):
+        """
+        새 추출기로 만든 갤러리와 추출기를 한 스냅샷으로 게시 (모델 교체)
+        이후 시작하는 요청은 새 모델과 새 임베딩만 사용하고, 진행 중인 요청은 이전 스냅샷을 계속 사용
+        Args:
+            speaker_embeddings (dict): 새 추출기로 만든 {화자 ID: 임베딩 리스트}
+            extractor: 새 추출기
+            extractor_version (str): 새 추출기 버전
+            compactor (EmbeddingCompactor): 새 임베딩용 압축기 (이전 압축기는 사용할 수 없음)
+        """
+        with self._write_lock:
+            self.extractor = extractor
+            self.extractor_version = extractor_version
+            self.compactor = compactor
+            return self._publish(speaker_embeddings)
+
+    def add(self, speaker_id, embeddings, extractor_version=None):
+        """
+        화자 임베딩 추가 후 새 버전 게시
+        Args:
+            speaker_id (str): 화자 ID
+            embeddings (list): 추가할 임베딩 리스트
+            extractor_version (str): 임베딩을 만든 추출기 버전 (지정 시 현재 버전과 다르면 거부)
+        Raises:
+            ExtractorVersionMismatch: 추출기 버전이 다름
+        """
+        with self._write_lock:
+            self._check_version(extractor_version)
+            next_embeddings = dict(self._snapshot.speaker_embeddings)
+            next_embeddings[speaker_id] = next_embeddings.get(speaker_id, ()) + tuple(embeddings)
+            return self._publish(next_embeddings, changed=[speaker_id])
+
+    def add_many(self, items, extractor_version=None):
+        """
+        여러 (화자 ID, 임베딩) 쌍을 한 버전으로 게시
+        Args:
+            items (list): (speaker_id, embedding) 튜플 리스트
+            extractor_version (str): 임베딩을 만든 추출기 버전 (지정 시 현재 버전과 다르면 거부)
+        Raises:
+            ExtractorVersionMismatch: 추출기 버전이 다름
+        """
+        with self._write_lock:
+            self._check_version(extractor_version)
+            next_embeddings = dict(self._snapshot.speaker_embeddings)
+            for speaker_id, embedding in items:
+                next_embeddings[speaker_id] = next_embeddings.get(speaker_id, ()) + (embedding,)
+            return self._publish(next_embeddings, changed=[speaker_id for speaker_id, _ in items])
+
+    def remove(self, speaker_id):
+        """
+        화자 삭제 후 새 버전 게시
+        Returns:
+            bool: 삭제 여부 (없는 화자면 False, 새 버전도 만들지 않음)
+        """
+        with self._write_lock:
+            if speaker_id not in self._snapshot.speaker_embeddings:
+                return False
+            next_embeddings = dict(self._snapshot.speaker_embeddings)
+            del next_embeddings[speaker_id]
+            self._publish(next_embeddings, changed=[speaker_id])
+            return True
@@ -0,0 +1,84 @@
+"""
+긴 음성 처리 정책
+
+긴 음성을 통째로 모델에 넣으면 길이에 비례해 인코더/디코더 연산과 메모리가 늘어납니다.
+일정 길이를 넘는 음성은 전체 구간에 고르게 퍼진 고정 길이 구간 K개만 골라
+임베딩하고 하나의 임베딩으로 합쳐, 요청 하나의 비용이 입력 길이와 무관하도록 제한합니다.
+고정 차원 임베딩(spk-v1)은 설정한 방식으로 결합하고, 구간마다 길이가 다른 토큰 ID열(asr-tokens-v1)은
+평균하면 의미 없는 값이 되므로 항상 medoid 구간 하나를 사용합니다.
+"""
+import numpy as np
+
+
+class LongAudioPolicy:
+    def __init__(self, max_single_seconds=20.0, segment_seconds=4.0, num_segments=5, aggregate="mean"):
+        """
+        긴 음성 처리 정책
+        Args:
+            max_single_seconds (float): 이 길이 이하의 음성은 구간을 나누지 않고 그대로 처리
+            segment_seconds (float): 샘플링할 구간 하나의 길이 (초)
+            num_segments (int): 샘플링할 구간 수 K (분석 길이 상한 = K x segment_seconds)
+            aggregate (str): 고정 차원 임베딩의 구간 결합 방식 ("mean" 또는 "medoid")
+        Raises:
+            ValueError: 잘못된 설정 (구간 길이가 0 이하이거나 max_single_seconds보다 긴 경우 등)
+        """
+        if aggregate not in ("mean", "medoid"):
+            raise ValueError(f"알 수 없는 결합 방식입니다: {aggregate}")
+        if segment_seconds <= 0:
+            raise ValueError(f"구간 길이는 0보다 커야 합니다: {segment_seconds}")
+        # 샘플링 대상 음성은 max_single_seconds보다 길어야 구간이 음성 안에 들어감
+        if segment_seconds > max_single_seconds:
+            raise ValueError(f"구간 길이({segment_seconds}초)는 max_single_seconds({max_single_seconds}초) "
+                             f"이하여야 합니다")
+        self.max_single_seconds = max_single_seconds
+        self.segment_seconds = segment_seconds
+        self.num_segments = max(1, int(num_segments))
+        self.aggregate_method = aggregate
+
+    @property
+    def max_analyzed_seconds(self):
+        """요청 하나에서 모델이 처리하는 최대 음성 길이 (초)"""
+        return max(self.max_single_seconds, self.segment_seconds * self.num_segments)
+
+    def needs_sampling(self, num_samples, sample_rate=16000):
+        return num_samples > self.max_single_seconds * sample_rate
+
+    def select_segments(self, speech, sample_rate=16000):
+        """
+        음성을 처리할 구간으로 나눔
+        Args:
+            speech (numpy.ndarray): 1차원 모노 파형
+            sample_rate (int): 샘플링 레이트
+        Returns:
+            list: 구간 파형 리스트 (짧은 음성이면 원본 하나)
+        """
+        if not self.needs_sampling(len(speech), sample_rate):
+            return [speech]
+
+        segment_length = int(self.segment_seconds * sample_rate)
+        # 첫 구간은 처음, 마지막 구간은 끝에 붙도록 시작 위치를 고르게 배치
+        starts = np.linspace(0, max(0, len(speech) - segment_length), self.num_segments).astype(np.int64)
+        return [speech[start:start + segment_length] for start in np.unique(starts)]
+
+    def aggregate(self, embeddings, fixed_size=True):
+        """
+        구간 임베딩을 하나로 결합
+        Args:
+            embeddings (list): 구간별 임베딩 리스트
+            fixed_size (bool): 추출기가 고정 차원 임베딩을 만드는지 여부 (False면 항상 medoid)
+        Returns:
+            numpy.ndarray: 결합된 임베딩 (medoid는 고른 구간의 원래 임베딩)
+        """
+        if len(embeddings) == 1:
+            return embeddings[0]
+        # 구간 비교는 유사도 계산과 같이 최소 길이로 맞춤
+        min_dim = min(len(embedding) for embedding in embeddings)
+        matrix = np.stack([np.asarray(embedding, dtype=np.float32)[:min_dim] for embedding in embeddings])
+        if fixed_size and self.aggregate_method == "mean":
+            return matrix.mean(axis=0)
+
+        # medoid: 다른 구간들과 평균 코사인 유사도가 가장 높은 구간 (잡음 구간에 강함)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        normalized = matrix / np.maximum(norms, 1e-12)
+        similarities = normalized @ normalized.T
+        return embeddings[int(np.argmax(similarities.sum(axis=1)))]
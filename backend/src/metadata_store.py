@@ -0,0 +1,216 @@
+"""
+화자 메타데이터 저장소 (SQLite, WAL 모드)
+
+화자 ID, 클라이언트, 등록 시각으로 인덱싱되어 있어
+임베딩 배열을 건드리지 않고 목록 조회/통계를 처리할 수 있습니다.
+"""
+import json
+import base64
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS speakers (
+    speaker_id TEXT PRIMARY KEY,
+    client TEXT NOT NULL DEFAULT 'unknown',
+    registered_at TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL DEFAULT '',
+    updated_by TEXT NOT NULL DEFAULT '',
+    embedding_count INTEGER NOT NULL DEFAULT 0,
+    metadata TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_speakers_registered_at ON speakers (registered_at, speaker_id);
+CREATE INDEX IF NOT EXISTS idx_speakers_client ON speakers (client, registered_at, speaker_id);
+"""
+
+# 이전 스키마 데이터베이스에 추가할 컬럼 {컬럼 이름: 정의}
+MIGRATED_COLUMNS = {
+    "updated_by": "TEXT NOT NULL DEFAULT ''",
+}
+
+
+def encode_cursor(registered_at, speaker_id):
+    """페이지 커서 생성 (마지막 행의 정렬 키)"""
+    raw = json.dumps([registered_at, speaker_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    페이지 커서 해석
+    Raises:
+        ValueError: 유효하지 않은 커서
+    """
+    try:
+        registered_at, speaker_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError(f"유효하지 않은 커서입니다: {cursor}")
+    return str(registered_at), str(speaker_id)
+
+
+class SpeakerMetadataStore:
+    def __init__(self, db_path="speaker_metadata.db"):
+        """
+        화자 메타데이터 저장소 초기화
+        Args:
+            db_path (str): SQLite 데이터베이스 파일 경로
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+        conn.commit()
+
+    @staticmethod
+    def _migrate(conn):
+        """이전 스키마에 없던 컬럼 추가 (기존 행의 마지막 갱신 클라이언트는 등록 클라이언트로 채움)"""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(speakers)")}
+        for name, definition in MIGRATED_COLUMNS.items():
+            if name not in columns:
+                conn.execute(f"ALTER TABLE speakers ADD COLUMN {name} {definition}")
+                if name == "updated_by":
+                    conn.execute("UPDATE speakers SET updated_by = client WHERE updated_at != ''")
+
+    def _connection(self):
+        """스레드별 연결 반환 (WAL 모드에서 읽기는 서로 막지 않음)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_dict(row):
+        return {
+            "anonymousId": row["speaker_id"],
+            "client": row["client"],
+            "registeredAt": row["registered_at"] or "Unknown",
+            "updatedAt": row["updated_at"] or None,
+            "updatedBy": row["updated_by"] or None,
+            "embeddingCount": row["embedding_count"],
+            "metadata": json.loads(row["metadata"]),
+        }
+
+    def record_registration(self, speaker_id, client, metadata=None):
+        """
+        화자 등록 기록 (기존 화자면 임베딩 개수 증가 및 메타데이터 갱신)
+        처음 등록한 클라이언트는 유지하고 마지막으로 갱신한 클라이언트는 updated_by에 기록합니다.
+        Args:
+            speaker_id (str): 화자 ID
+            client (str): 등록 요청 클라이언트
+            metadata (dict): 추가 메타데이터
+        """
+        now = datetime.now().isoformat()
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    """
+                    INSERT INTO speakers (speaker_id, client, registered_at, updated_at, updated_by,
+                                          embedding_count, metadata)
+                    VALUES (?, ?, ?, ?, ?, 1, ?)
+                    ON CONFLICT (speaker_id) DO UPDATE SET
+                        client = CASE WHEN speakers.registered_at = '' THEN excluded.client
+                                      ELSE speakers.client END,
+                        registered_at = CASE WHEN speakers.registered_at = '' THEN excluded.registered_at
+                                             ELSE speakers.registered_at END,
+                        updated_at = excluded.updated_at,
+                        updated_by = excluded.updated_by,
+                        embedding_count = speakers.embedding_count + 1,
+                        metadata = excluded.metadata
+                    """,
+                    (speaker_id, client, now, now, client, json.dumps(metadata or {}, ensure_ascii=False))
+                )
+
+    def get(self, speaker_id):
+        """화자 메타데이터 조회 (없으면 None)"""
+        row = self._connection().execute(
+            "SELECT * FROM speakers WHERE speaker_id = ?", (speaker_id,)
+        ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def delete(self, speaker_id):
+        """화자 메타데이터 삭제"""
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute("DELETE FROM speakers WHERE speaker_id = ?", (speaker_id,))
+        return cursor.rowcount > 0
+
+    def _filters(self, client=None, registered_after=None, registered_before=None):
+        clauses, params = [], []
+        if client:
+            clauses.append("client = ?")
+            params.append(client)
+        if registered_after:
+            clauses.append("registered_at >= ?")
+            params.append(registered_after)
+        if registered_before:
+            clauses.append("registered_at < ?")
+            params.append(registered_before)
+        return clauses, params
+
+    def count(self, client=None, registered_after=None, registered_before=None):
+        """조건에 맞는 화자 수"""
+        clauses, params = self._filters(client, registered_after, registered_before)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._connection().execute(f"SELECT COUNT(*) FROM speakers {where}", params).fetchone()[0]
+
+    def list_speakers(self, limit=100, cursor=None, client=None, registered_after=None, registered_before=None):
+        """
+        등록 시각 순 커서 기반 페이지 조회
+        Args:
+            limit (int): 페이지 크기
+            cursor (str): 이전 페이지의 nextCursor
+            client (str): 클라이언트 필터
+            registered_after (str): 이 시각 이후 등록된 화자만 (ISO 8601)
+            registered_before (str): 이 시각 이전 등록된 화자만 (ISO 8601)
+        Returns:
+            tuple: (화자 정보 리스트, 다음 페이지 커서 또는 None)
+        """
+        clauses, params = self._filters(client, registered_after, registered_before)
+        if cursor:
+            last_registered_at, last_speaker_id = decode_cursor(cursor)
+            clauses.append("(registered_at, speaker_id) > (?, ?)")
+            params.extend([last_registered_at, last_speaker_id])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        rows = self._connection().execute(
+            f"SELECT * FROM speakers {where} ORDER BY registered_at, speaker_id LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["registered_at"], rows[-1]["speaker_id"])
+        return [self._row_to_dict(row) for row in rows], next_cursor
+
+    def sync_embedding_counts(self, embedding_counts):
+        """
+        임베딩 저장소와 메타데이터 동기화 (서버 시작 시 1회)
+        - 메타데이터가 없는 화자는 등록 시각 없이 추가
+        - 임베딩이 없는 화자의 메타데이터는 삭제
+        Args:
+            embedding_counts (dict): {화자 ID: 임베딩 개수}
+        """
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                known = {row[0] for row in conn.execute("SELECT speaker_id FROM speakers")}
+                conn.executemany(
+                    """
+                    INSERT INTO speakers (speaker_id, embedding_count) VALUES (?, ?)
+                    ON CONFLICT (speaker_id) DO UPDATE SET embedding_count = excluded.embedding_count
+                    """,
+                    list(embedding_counts.items())
+                )
+                stale = known - set(embedding_counts)
+                conn.executemany("DELETE FROM speakers WHERE speaker_id = ?", [(s,) for s in stale])
@@ -0,0 +1,114 @@
+"""
+클라이언트가 보낸 16kHz 모노 16-bit PCM 처리
+
+프론트엔드(AudioWorklet)가 녹음 중에 16kHz 모노 Int16으로 변환한 원시 PCM을
+서버에서 ffmpeg 변환 없이 바로 파형으로 사용합니다.
+실시간 스트리밍 모드에서는 스트림별로 최근 구간만 보관하고
+일정 길이(hop)의 새 음성이 쌓일 때마다 최근 분석 구간(window)으로 식별합니다.
+"""
+import time
+import threading
+
+import numpy as np
+
+# 클라이언트 PCM 형식: 16kHz, 모노, little-endian signed 16-bit
+PCM_SAMPLE_RATE = 16000
+PCM_DTYPE = np.dtype("<i2")
+
+
+def decode_pcm_bytes(data, max_seconds=None):
+    """
+    원시 PCM 바이트를 [-1, 1] 범위의 float32 파형으로 변환
+    Args:
+        data (bytes): 16kHz 모노 Int16 PCM
+        max_seconds (float): 최대 길이 (초과분은 버림, None이면 제한 없음)
+    Returns:
+        numpy.ndarray: float32 파형
+    Raises:
+        ValueError: 샘플 경계가 맞지 않거나 비어 있는 데이터
+    """
+    if len(data) % PCM_DTYPE.itemsize != 0:
+        raise ValueError("PCM 데이터 길이가 16-bit 샘플 단위가 아닙니다")
+    pcm = np.frombuffer(data, dtype=PCM_DTYPE)
+    if len(pcm) == 0:
+        raise ValueError("PCM 데이터가 비어 있습니다")
+    if max_seconds is not None:
+        pcm = pcm[:int(max_seconds * PCM_SAMPLE_RATE)]
+    return pcm.astype(np.float32) / 32768.0
+
+
+class PcmStreamSession:
+    def __init__(self, window_seconds=3.0, hop_seconds=1.0):
+        """
+        스트림 하나의 수신 버퍼
+        Args:
+            window_seconds (float): 식별에 사용할 최근 구간 길이 (초)
+            hop_seconds (float): 이 길이만큼 새 음성이 쌓일 때마다 식별 (초)
+        """
+        self.window = int(window_seconds * PCM_SAMPLE_RATE)
+        self.hop = int(hop_seconds * PCM_SAMPLE_RATE)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self.total_samples = 0
+        self.last_identified = 0  # 마지막 식별 시점의 total_samples
+        self.last_result = None
+        self.updated_at = time.time()
+        self.lock = threading.Lock()
+
+    def append(self, samples):
+        """프레임 추가 (분석 구간보다 오래된 샘플은 버림)"""
+        self._buffer = np.concatenate([self._buffer, samples])[-self.window:]
+        self.total_samples += len(samples)
+        self.updated_at = time.time()
+
+    def ready(self, final=False):
+        """식별할 만큼 새 음성이 쌓였는지 (마지막 프레임이면 남은 음성이 있을 때)"""
+        pending = self.total_samples - self.last_identified
+        if final:
+            return pending > 0
+        return pending >= self.hop and len(self._buffer) >= min(self.window, self.hop)
+
+    def take_window(self):
+        """식별할 최근 구간 (식별 시점을 기록)"""
+        self.last_identified = self.total_samples
+        return self._buffer.copy()
+
+    @property
+    def seconds_received(self):
+        return self.total_samples / PCM_SAMPLE_RATE
+
+
+class PcmStreamRegistry:
+    def __init__(self, window_seconds=3.0, hop_seconds=1.0, idle_timeout=60.0):
+        """
+        진행 중인 PCM 스트림 목록
+        Args:
+            window_seconds (float): 식별 구간 길이 (초)
+            hop_seconds (float): 식별 간격 (초)
+            idle_timeout (float): 이 시간 동안 프레임이 없으면 스트림 폐기 (초)
+        """
+        self.window_seconds = window_seconds
+        self.hop_seconds = hop_seconds
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, stream_id):
+        """스트림 세션 조회 (없으면 생성, 오래된 세션은 정리)"""
+        now = time.time()
+        with self._lock:
+            for expired in [key for key, session in self._sessions.items()
+                            if now - session.updated_at > self.idle_timeout]:
+                del self._sessions[expired]
+            session = self._sessions.get(stream_id)
+            if session is None:
+                session = PcmStreamSession(self.window_seconds, self.hop_seconds)
+                self._sessions[stream_id] = session
+            return session
+
+    def close(self, stream_id):
+        with self._lock:
+            self._sessions.pop(stream_id, None)
+
+    def count(self):
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,281 @@
+"""
+요청 단위 프로파일링 (옵트인)
+
+헤더나 관리자 설정으로 선택된 요청만 단계별 구간(span)을 기록하고,
+필요하면 torch.profiler / cProfile 결과를 logs/ 아래 크기 제한이 있는
+링 디렉토리에 Chrome trace / pstats 파일로 저장합니다.
+프로파일링 중인 요청이 없으면 span()은 ContextVar 조회 한 번 외에 아무 일도 하지 않습니다.
+"""
+import os
+import json
+import time
+import uuid
+import random
+import shutil
+import cProfile
+import threading
+import functools
+import contextlib
+from datetime import datetime
+from contextvars import ContextVar
+
+# 지원하는 프로파일링 방식 (spans는 항상 포함)
+PROFILE_MODES = ("spans", "torch", "cprofile")
+
+# 현재 요청의 트레이스 (프로파일링 중이 아니면 None)
+_active_trace = ContextVar("active_trace", default=None)
+
+
+class _NullSpan:
+    """프로파일링 비활성 시 사용하는 빈 컨텍스트"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+        self._record_function = None
+
+    def __enter__(self):
+        if self.trace.torch_enabled:
+            import torch
+            self._record_function = torch.profiler.record_function(self.name)
+            self._record_function.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        if self._record_function is not None:
+            self._record_function.__exit__(*exc)
+        self.trace.add_span(self.name, self.start, end)
+        return False
+
+
+def span(name):
+    """
+    단계 구간 기록 (프로파일링 중인 요청에서만 동작)
+    사용 예:
+        with span("decode_audio"):
+            ...
+    """
+    trace = _active_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name)
+
+
+def traced(name):
+    """함수 호출 전체를 span으로 기록하는 데코레이터"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def install_model_hooks(model):
+    """
+    ESPnet 추론 객체 내부 단계에 span 설치
+    (Speech2Text: 인코더, 빔 서치 / Speech2Embedding: 화자 인코더)
+    인스턴스 속성으로 감싸므로 모델 코드는 수정하지 않음
+    """
+    asr_model = getattr(model, "asr_model", None)
+    if asr_model is not None and hasattr(asr_model, "encode"):
+        asr_model.encode = traced("encoder")(asr_model.encode)
+    beam_search = getattr(model, "beam_search", None)
+    if beam_search is not None and hasattr(beam_search, "forward"):
+        beam_search.forward = traced("beam_search")(beam_search.forward)
+    spk_model = getattr(model, "spk_model", None)
+    if spk_model is not None and hasattr(spk_model, "encode_frame"):
+        spk_model.encode_frame = traced("speaker_encoder")(spk_model.encode_frame)
+
+
+class RequestTrace:
+    def __init__(self, name, modes):
+        """
+        요청 하나의 트레이스
+        Args:
+            name (str): 요청 이름 (예: identify)
+            modes (set): 사용할 프로파일링 방식
+        """
+        self.profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.name = name
+        self.modes = set(modes) | {"spans"}
+        self.torch_enabled = "torch" in self.modes
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, end):
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "start_ms": round((start - self.origin) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3),
+                "thread": threading.get_ident()
+            })
+
+    def chrome_trace(self):
+        """chrome://tracing / Perfetto에서 열 수 있는 형식"""
+        events = [{
+            "name": s["name"],
+            "ph": "X",
+            "ts": s["start_ms"] * 1000,
+            "dur": s["duration_ms"] * 1000,
+            "pid": os.getpid(),
+            "tid": s["thread"]
+        } for s in self.spans]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class RequestProfiler:
+    def __init__(self, output_dir="logs/profiles", max_artifacts=50, sample_rate=0.0, modes=("spans",)):
+        """
+        요청 프로파일러
+        Args:
+            output_dir (str): 프로파일 결과 저장 디렉토리
+            max_artifacts (int): 보관할 최대 프로파일 수 (초과 시 오래된 것부터 삭제)
+            sample_rate (float): 헤더 없이도 프로파일링할 요청 비율 (0이면 비활성)
+            modes (tuple): 샘플링된 요청에 사용할 프로파일링 방식
+        """
+        self.output_dir = output_dir
+        self.max_artifacts = max_artifacts
+        self.sample_rate = sample_rate
+        self.modes = self.parse_modes(modes)
+        self._lock = threading.Lock()
+        # torch.profiler는 프로세스 전역이므로 한 번에 한 요청만 사용
+        self._torch_lock = threading.Lock()
+
+    @staticmethod
+    def parse_modes(value):
+        """
+        "torch,cprofile" 또는 리스트를 프로파일링 방식 집합으로 변환
+        Raises:
+            ValueError: 알 수 없는 방식
+        """
+        if isinstance(value, str):
+            value = [v.strip() for v in value.split(",") if v.strip()]
+        modes = set(value)
+        if "all" in modes:
+            modes = set(PROFILE_MODES)
+        unknown = modes - set(PROFILE_MODES)
+        if unknown:
+            raise ValueError(f"알 수 없는 프로파일링 방식입니다: {', '.join(sorted(unknown))}")
+        return modes | {"spans"}
+
+    def select(self, header_value=None):
+        """
+        이 요청을 프로파일링할지 결정
+        Args:
+            header_value (str): X-Profile 헤더 값 ("1" 또는 "torch,cprofile" 등)
+        Returns:
+            set: 사용할 프로파일링 방식 (프로파일링하지 않으면 None)
+        """
+        if header_value:
+            if header_value.lower() in ("1", "true", "yes"):
+                return set(self.modes)
+            return self.parse_modes(header_value)
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return set(self.modes)
+        return None
+
+    @contextlib.contextmanager
+    def profile(self, name, modes):
+        """
+        요청 하나를 프로파일링하고 결과를 저장
+        Yields:
+            RequestTrace: 현재 트레이스 (profile_id로 결과 조회)
+        """
+        trace = RequestTrace(name, modes)
+        torch_locked = False
+        if trace.torch_enabled:
+            torch_locked = self._torch_lock.acquire(blocking=False)
+            if not torch_locked:
+                # 다른 요청이 torch 프로파일링 중이면 이 요청은 span만 기록
+                trace.torch_enabled = False
+                trace.modes.discard("torch")
+        token = _active_trace.set(trace)
+        torch_profiler = None
+        c_profiler = None
+        try:
+            if trace.torch_enabled:
+                import torch
+                torch_profiler = torch.profiler.profile(
+                    activities=[torch.profiler.ProfilerActivity.CPU],
+                    record_shapes=False
+                )
+                torch_profiler.__enter__()
+            if "cprofile" in trace.modes:
+                c_profiler = cProfile.Profile()
+                c_profiler.enable()
+            with span(name):
+                yield trace
+        finally:
+            if c_profiler is not None:
+                c_profiler.disable()
+            if torch_profiler is not None:
+                torch_profiler.__exit__(None, None, None)
+            if torch_locked:
+                self._torch_lock.release()
+            _active_trace.reset(token)
+            self._write_artifacts(trace, torch_profiler, c_profiler)
+
+    def _write_artifacts(self, trace, torch_profiler, c_profiler):
+        profile_dir = os.path.join(self.output_dir, trace.profile_id)
+        os.makedirs(profile_dir, exist_ok=True)
+
+        with open(os.path.join(profile_dir, "spans.json"), "w") as f:
+            json.dump(trace.chrome_trace(), f)
+        if torch_profiler is not None:
+            torch_profiler.export_chrome_trace(os.path.join(profile_dir, "torch_trace.json"))
+        if c_profiler is not None:
+            c_profiler.dump_stats(os.path.join(profile_dir, "cprofile.pstats"))
+        with open(os.path.join(profile_dir, "summary.json"), "w") as f:
+            json.dump({
+                "profileId": trace.profile_id,
+                "name": trace.name,
+                "modes": sorted(trace.modes),
+                "createdAt": datetime.now().isoformat(),
+                "spans": trace.spans
+            }, f, ensure_ascii=False, indent=2)
+
+        self._enforce_limit()
+
+    def _enforce_limit(self):
+        """보관 개수를 넘으면 오래된 프로파일부터 삭제"""
+        with self._lock:
+            profiles = self.list_profiles()
+            for profile_id in profiles[:max(0, len(profiles) - self.max_artifacts)]:
+                shutil.rmtree(os.path.join(self.output_dir, profile_id), ignore_errors=True)
+
+    def list_profiles(self):
+        """저장된 프로파일 ID 목록 (오래된 순)"""
+        if not os.path.isdir(self.output_dir):
+            return []
+        return sorted(
+            entry for entry in os.listdir(self.output_dir)
+            if os.path.isdir(os.path.join(self.output_dir, entry))
+        )
+
+    def artifact_path(self, profile_id, filename):
+        """
+        다운로드할 결과 파일 경로 (경로 조작 방지)
+        Returns:
+            str: 파일 경로 (없으면 None)
+        """
+        if profile_id not in self.list_profiles() or os.path.basename(filename) != filename:
+            return None
+        path = os.path.join(self.output_dir, profile_id, filename)
+        return path if os.path.isfile(path) else None
@@ -1,12 +1,145 @@
 import os
 import time
 import wave
+import argparse
+import threading
 import numpy as np
-import sounddevice as sd
 from tempfile import NamedTemporaryFile
 from pathlib import Path
 from speaker_recognition import SpeakerRecognition
 
+try:
+    import sounddevice as sd
+except OSError:
+    # PortAudio가 없는 환경 (파일 기반 입력 스트림으로만 실행 가능)
+    sd = None
+
+
+class AudioRingBuffer:
+    def __init__(self, capacity):
+        """
+        단일 생산자/단일 소비자 링 버퍼 (잠금 없음)
+        생산자(오디오 콜백)는 샘플을 쓴 뒤 누적 쓰기 위치를 갱신하고,
+        소비자(추론 워커)는 쓰기 위치를 기준으로 최근 구간을 복사합니다.
+        
+        Args:
+            capacity (int): 버퍼 크기 (샘플 수, 분석 구간보다 충분히 커야 함)
+        """
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=np.float32)
+        self._write_pos = 0  # 지금까지 쓴 전체 샘플 수 (생산자만 갱신)
+
+    @property
+    def total_written(self):
+        return self._write_pos
+
+    def write(self, samples):
+        """샘플 추가 (오디오 콜백 스레드에서 호출)"""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if len(samples) > self.capacity:
+            samples = samples[-self.capacity:]
+        start = self._write_pos % self.capacity
+        end = start + len(samples)
+        if end <= self.capacity:
+            self._buffer[start:end] = samples
+        else:
+            split = self.capacity - start
+            self._buffer[start:] = samples[:split]
+            self._buffer[:end - self.capacity] = samples[split:]
+        # 데이터를 쓴 뒤에 위치를 게시 (정수 대입은 원자적)
+        self._write_pos += len(samples)
+
+    def latest(self, num_samples):
+        """
+        가장 최근 num_samples개 샘플 복사본
+        Returns:
+            tuple: (샘플 배열 또는 아직 부족하면 None, 구간 끝 위치)
+        """
+        while True:
+            end_pos = self._write_pos
+            if end_pos < num_samples:
+                return None, end_pos
+            start = (end_pos - num_samples) % self.capacity
+            if start + num_samples <= self.capacity:
+                window = self._buffer[start:start + num_samples].copy()
+            else:
+                window = np.concatenate([self._buffer[start:], self._buffer[:num_samples - (self.capacity - start)]])
+            # 복사하는 동안 생산자가 구간을 덮어썼으면 다시 읽음
+            if self._write_pos - end_pos <= self.capacity - num_samples:
+                return window, end_pos
+
+
+class FileInputStream:
+    def __init__(self, file_path, samplerate=16000, channels=1, dtype='float32',
+                 blocksize=1600, callback=None, loop=False, realtime=True):
+        """
+        sounddevice.InputStream과 같은 방식으로 동작하는 파일 기반 입력 스트림
+        (마이크가 없는 환경에서 연속 모드 테스트용)
+        
+        Args:
+            file_path (str): WAV 파일 경로 (16-bit PCM)
+            samplerate (int): 기대하는 샘플링 레이트 (파일과 다르면 오류)
+            channels (int): 채널 수 (1만 지원)
+            dtype (str): 콜백에 전달할 데이터 형식
+            blocksize (int): 콜백 한 번에 전달할 프레임 수
+            callback: callback(indata, frames, time_info, status)
+            loop (bool): 파일 끝에서 처음으로 되돌아갈지 여부
+            realtime (bool): 실제 녹음 속도에 맞춰 전달할지 여부
+        """
+        with wave.open(str(file_path), 'rb') as wf:
+            if wf.getframerate() != samplerate:
+                raise ValueError(f"샘플링 레이트가 다릅니다: {wf.getframerate()} != {samplerate}")
+            pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+            if wf.getnchannels() > 1:
+                pcm = pcm.reshape(-1, wf.getnchannels()).mean(axis=1)
+        self._samples = (pcm.astype(np.float32) / 32768.0).reshape(-1, 1).astype(dtype)
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.callback = callback
+        self.loop = loop
+        self.realtime = realtime
+        self.active = False
+        self._thread = None
+
+    def _run(self):
+        position = 0
+        block_duration = self.blocksize / self.samplerate
+        next_time = time.time()
+        while self.active:
+            block = self._samples[position:position + self.blocksize]
+            position += len(block)
+            if len(block):
+                self.callback(block, len(block), None, None)
+            if position >= len(self._samples):
+                if not self.loop:
+                    break
+                position = 0
+            if self.realtime:
+                next_time += block_duration
+                time.sleep(max(0.0, next_time - time.time()))
+        self.active = False
+
+    def start(self):
+        self.active = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.active = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 class RealtimeSpeakerRecognition:
     def __init__(self, 
                  embeddings_file="speaker_embeddings.pkl", 
@@ -86,6 +219,83 @@ class RealtimeSpeakerRecognition:
             # 임시 파일 삭제
             os.remove(temp_audio_path)
     
+    def run_continuous(self, window=None, hop=1.0, input_file=None, loop=False, max_results=None):
+        """
+        연속 모드: 콜백 기반 입력 스트림이 링 버퍼를 채우는 동안
+        별도 워커가 메모리에서 최근 구간을 바로 추론 (녹음과 인식이 겹쳐 진행)
+        
+        Args:
+            window (float): 분석 구간 길이 (초, 기본값은 녹음 시간)
+            hop (float): 추론 간격 (초)
+            input_file (str): 지정 시 마이크 대신 WAV 파일을 입력 스트림으로 사용
+            loop (bool): 파일 입력을 반복 재생할지 여부
+            max_results (int): 지정 시 이 횟수만큼 식별 후 종료
+        """
+        window_samples = int((window or self.duration) * self.sample_rate)
+        ring = AudioRingBuffer(window_samples * 4)
+        stop_event = threading.Event()
+        blocksize = int(self.sample_rate * 0.1)
+
+        def audio_callback(indata, frames, time_info, status):
+            if status:
+                print(f"입력 스트림 상태: {status}")
+            ring.write(indata[:, 0])
+
+        # 워커가 마지막으로 분석한 구간 끝 위치 (파일 입력 종료 시 남은 구간 처리 확인용)
+        progress = {"last_end": 0}
+        input_finished = threading.Event()
+
+        def inference_worker():
+            count = 0
+            while not stop_event.is_set():
+                window_audio, end_pos = ring.latest(window_samples)
+                # 새로 들어온 샘플이 hop보다 적으면 대기 (입력이 끝났으면 남은 구간까지 처리)
+                new_samples = end_pos - progress["last_end"]
+                if window_audio is None or new_samples == 0 or (
+                        new_samples < hop * self.sample_rate and not input_finished.is_set()):
+                    stop_event.wait(0.05)
+                    continue
+                progress["last_end"] = end_pos
+                start_time = time.time()
+                speaker_id, similarity = self.speaker_recognition.identify_speaker_waveform(
+                    window_audio, self.sample_rate, threshold=self.threshold
+                )
+                position = end_pos / self.sample_rate
+                if speaker_id:
+                    print(f"[{position:7.1f}s] 화자: {speaker_id} (유사도: {similarity:.4f}, {time.time() - start_time:.2f}초)")
+                else:
+                    print(f"[{position:7.1f}s] 알 수 없는 화자 (최대 유사도: {similarity:.4f}, {time.time() - start_time:.2f}초)")
+                count += 1
+                if max_results is not None and count >= max_results:
+                    stop_event.set()
+
+        if input_file:
+            stream = FileInputStream(input_file, samplerate=self.sample_rate, blocksize=blocksize,
+                                     callback=audio_callback, loop=loop)
+        else:
+            if sd is None:
+                raise RuntimeError("sounddevice를 사용할 수 없습니다. --input-file로 파일 입력을 사용하세요.")
+            stream = sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='float32',
+                                    blocksize=blocksize, callback=audio_callback)
+
+        worker = threading.Thread(target=inference_worker, daemon=True)
+        print(f"\n연속 식별을 시작합니다 (구간 {window_samples / self.sample_rate:.1f}초, 간격 {hop:.1f}초). Ctrl+C로 종료합니다.")
+        with stream:
+            worker.start()
+            try:
+                while not stop_event.is_set():
+                    # 파일 입력이 끝나면 남은 구간을 분석한 뒤 종료
+                    if input_file and not stream.active:
+                        input_finished.set()
+                        if ring.total_written < window_samples or progress["last_end"] == ring.total_written:
+                            break
+                    stop_event.wait(0.1)
+            except KeyboardInterrupt:
+                print("\n연속 식별을 종료합니다.")
+            finally:
+                stop_event.set()
+                worker.join()
+
     def register_speaker_realtime(self, speaker_id):
         """
         실시간 녹음을 통해 새 화자 등록
@@ -113,11 +323,12 @@ class RealtimeSpeakerRecognition:
         print("\n===== 실시간 화자 인식 시스템 =====")
         print("1: 화자 식별")
         print("2: 새 화자 등록")
-        print("3: 종료")
+        print("3: 연속 식별")
+        print("4: 종료")
         
         while True:
             try:
-                choice = input("\n원하는 작업을 선택하세요 (1-3): ").strip()
+                choice = input("\n원하는 작업을 선택하세요 (1-4): ").strip()
                 
                 if choice == '1':
                     self.identify_speaker_realtime()
@@ -128,10 +339,12 @@ class RealtimeSpeakerRecognition:
                     else:
                         print("유효한 화자 ID를 입력해주세요.")
                 elif choice == '3':
+                    self.run_continuous()
+                elif choice == '4':
                     print("프로그램을 종료합니다.")
                     break
                 else:
-                    print("잘못된 입력입니다. 1, 2, 3 중에서 선택해주세요.")
+                    print("잘못된 입력입니다. 1, 2, 3, 4 중에서 선택해주세요.")
             except KeyboardInterrupt:
                 print("\n프로그램을 종료합니다.")
                 break
@@ -140,6 +353,13 @@ class RealtimeSpeakerRecognition:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="실시간 화자 인식")
+    parser.add_argument("--continuous", action="store_true", help="연속 식별 모드로 바로 실행")
+    parser.add_argument("--input-file", help="마이크 대신 사용할 WAV 파일 (연속 모드)")
+    parser.add_argument("--loop", action="store_true", help="파일 입력 반복 재생")
+    parser.add_argument("--hop", type=float, default=1.0, help="연속 모드 추론 간격 (초)")
+    args = parser.parse_args()
+    
     # 실시간 화자 인식 시스템 초기화 및 실행
     realtime_sr = RealtimeSpeakerRecognition(
         embeddings_file="speaker_embeddings.pkl",
@@ -147,5 +367,8 @@ if __name__ == "__main__":
         threshold=0.7  # 유사도 임계값
     )
     
-    # 대화형 모드 실행
-    realtime_sr.interactive_mode()
\ No newline at end of file
+    if args.continuous or args.input_file:
+        realtime_sr.run_continuous(hop=args.hop, input_file=args.input_file, loop=args.loop)
+    else:
+        # 대화형 모드 실행
+        realtime_sr.interactive_mode()
\ No newline at end of file
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+화자 임베딩 갤러리 샤딩
+
+화자 ID를 해시 파티셔닝하여 N개의 샤드 프로세스에 분산 저장하고,
+식별 요청은 모든 샤드에 질의 임베딩을 보내 각 샤드의 top-k 결과를 병합합니다.
+등록/삭제는 해당 화자를 소유한 샤드로만 전달되고, 저장도 변경된 샤드만 자신의 파일에 기록합니다.
+샤드 파일에는 임베딩을 만든 추출기 버전이 함께 저장되며, 서버의 추출기와 버전이 다른 샤드에는 연결하지 않습니다.
+(샤딩된 갤러리는 모델 교체 마이그레이션을 지원하지 않음)
+
+샤드 간 통신은 pickle을 사용하므로 GALLERY_SHARD_AUTHKEY 환경 변수(추측할 수 없는 값)가
+없으면 샤드 서버와 클라이언트 모두 시작하지 않습니다.
+
+로컬 테스트 예시:
+    export GALLERY_SHARD_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(32))")
+    # 기존 단일 임베딩 파일을 샤드 파일로 분할
+    python src/sharded_gallery.py --num-shards 2 --partition
+    # 샤드 2개를 한 머신에서 실행
+    python src/sharded_gallery.py --num-shards 2 --base-port 6100
+"""
+import os
+import time
+import heapq
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+try:
+    from .gallery_snapshot import load_gallery_file, save_gallery_file
+except ImportError:
+    from gallery_snapshot import load_gallery_file, save_gallery_file
+
+# 샤드 간 통신 인증 키 환경 변수
+AUTHKEY_ENV = "GALLERY_SHARD_AUTHKEY"
+
+
+def load_authkey():
+    """
+    환경 변수에서 샤드 간 통신 인증 키 읽기
+    (연결을 받은 쪽은 pickle을 역직렬화하므로 키가 알려지면 임의 코드 실행이 가능함)
+    Returns:
+        bytes: 인증 키
+    Raises:
+        RuntimeError: 환경 변수가 설정되지 않은 경우
+    """
+    authkey = os.environ.get(AUTHKEY_ENV, "")
+    if not authkey:
+        raise RuntimeError(f"{AUTHKEY_ENV} 환경 변수에 샤드 간 통신 인증 키를 설정해야 합니다")
+    return authkey.encode()
+
+
+def shard_for(speaker_id, num_shards):
+    """
+    화자 ID를 소유한 샤드 인덱스 계산
+    (Python 내장 hash는 프로세스마다 달라지므로 md5 사용)
+    Args:
+        speaker_id (str): 화자 ID
+        num_shards (int): 전체 샤드 수
+    Returns:
+        int: 샤드 인덱스
+    """
+    digest = hashlib.md5(str(speaker_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def shard_embeddings_file(embeddings_file, index, num_shards):
+    """샤드별 임베딩 저장 파일 경로 (예: speaker_embeddings.shard0of4.pkl)"""
+    root, ext = os.path.splitext(embeddings_file)
+    return f"{root}.shard{index}of{num_shards}{ext or '.pkl'}"
+
+
+def parse_addresses(spec):
+    """
+    "host:port,host:port" 형식의 문자열을 주소 리스트로 변환
+    Args:
+        spec (str): 샤드 주소 목록 문자열
+    Returns:
+        list: (host, port) 튜플 리스트
+    """
+    addresses = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, port = item.rsplit(":", 1)
+        addresses.append((host, int(port)))
+    return addresses
+
+
+def _max_cosine_similarity(query, embeddings):
+    """
+    질의 임베딩과 한 화자의 임베딩들 사이의 최대 코사인 유사도
+    (차원이 다르면 기존 방식대로 더 작은 차원으로 맞춤)
+    """
+    best = -1.0
+    query_norm = np.linalg.norm(query)
+    for stored in embeddings:
+        min_dim = min(query.shape[0], stored.shape[0])
+        q = query[:min_dim]
+        s = stored[:min_dim]
+        denom = (np.linalg.norm(q) if min_dim != query.shape[0] else query_norm) * np.linalg.norm(s)
+        similarity = float(np.dot(q, s) / denom) if denom > 0 else 0.0
+        if similarity > best:
+            best = similarity
+    return best
+
+
+class GalleryShard:
+    def __init__(self, index, num_shards, embeddings_file):
+        """
+        갤러리 샤드 (자신이 소유한 화자의 임베딩과 저장 파일을 관리)
+        Args:
+            index (int): 샤드 인덱스
+            num_shards (int): 전체 샤드 수
+            embeddings_file (str): 이 샤드의 임베딩 저장 파일 경로
+        """
+        self.index = index
+        self.num_shards = num_shards
+        self.embeddings_file = embeddings_file
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.speaker_embeddings = {}
+        # 임베딩을 만든 추출기 버전 (빈 샤드는 첫 등록 때 정해짐, 이전 형식 파일은 None)
+        self.extractor_version = None
+
+        if os.path.exists(embeddings_file):
+            stored, self.extractor_version = load_gallery_file(embeddings_file)
+            for speaker_id, embeddings in stored.items():
+                self.speaker_embeddings[speaker_id] = [np.asarray(e, dtype=np.float32) for e in embeddings]
+
+    def _check_owner(self, speaker_id):
+        owner = shard_for(speaker_id, self.num_shards)
+        if owner != self.index:
+            raise ValueError(f"화자 {speaker_id}는 샤드 {owner}의 소유입니다 (현재 샤드: {self.index})")
+
+    def _check_version(self, extractor_version):
+        """다른 추출기의 임베딩이 섞이지 않도록 확인 (빈 샤드는 처음 받은 버전을 사용, 잠금 안에서 호출)"""
+        if extractor_version is None:
+            return
+        if self.extractor_version is None:
+            self.extractor_version = extractor_version
+        elif self.extractor_version != extractor_version:
+            raise ValueError(f"샤드 {self.index}는 {self.extractor_version} 임베딩입니다 (요청: {extractor_version})")
+
+    def register(self, speaker_id, embedding, save=False, extractor_version=None):
+        """화자 임베딩 추가"""
+        self._check_owner(speaker_id)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._check_version(extractor_version)
+            embeddings = self.speaker_embeddings.setdefault(speaker_id, [])
+            embeddings.append(embedding)
+            embedding_count = len(embeddings)
+        if save:
+            self.save()
+        return embedding_count
+
+    def register_many(self, entries, save=False, extractor_version=None):
+        """
+        여러 화자 임베딩을 추가하고 저장은 한 번만 수행
+        Args:
+            entries (list): (speaker_id, embedding) 튜플 리스트 (모두 이 샤드 소유)
+            save (bool): 추가 후 저장할지 여부
+            extractor_version (str): 임베딩을 만든 추출기 버전 (샤드의 버전과 다르면 거부)
+        Returns:
+            list: 항목별 추가 후 임베딩 개수
+        """
+        for speaker_id, _ in entries:
+            self._check_owner(speaker_id)
+        counts = []
+        with self._lock:
+            self._check_version(extractor_version)
+            for speaker_id, embedding in entries:
+                embeddings = self.speaker_embeddings.setdefault(speaker_id, [])
+                embeddings.append(np.asarray(embedding, dtype=np.float32))
+                counts.append(len(embeddings))
+        if save:
+            self.save()
+        return counts
+
+    def delete(self, speaker_id, save=True):
+        """화자 삭제 (존재하지 않으면 False)"""
+        self._check_owner(speaker_id)
+        with self._lock:
+            if speaker_id not in self.speaker_embeddings:
+                return False
+            del self.speaker_embeddings[speaker_id]
+        if save:
+            self.save()
+        return True
+
+    def search(self, embedding, top_k=1):
+        """
+        질의 임베딩과 가장 유사한 화자 top-k 반환
+        Returns:
+            list: (유사도, 화자 ID) 튜플 리스트 (유사도 내림차순)
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            items = list(self.speaker_embeddings.items())
+        scores = ((_max_cosine_similarity(query, embeddings), speaker_id) for speaker_id, embeddings in items)
+        return heapq.nlargest(top_k, scores)
+
+    def score(self, speaker_id, embedding):
+        """
+        한 화자의 임베딩들과의 최대 유사도 (1:1 검증용)
+        Returns:
+            float: 유사도 (등록되지 않은 화자면 None)
+        """
+        self._check_owner(speaker_id)
+        with self._lock:
+            embeddings = list(self.speaker_embeddings.get(speaker_id, ()))
+        if not embeddings:
+            return None
+        return _max_cosine_similarity(np.asarray(embedding, dtype=np.float32), embeddings)
+
+    def contains(self, speaker_id):
+        return speaker_id in self.speaker_embeddings
+
+    def count(self):
+        return len(self.speaker_embeddings)
+
+    def list(self):
+        """화자 ID별 임베딩 개수"""
+        with self._lock:
+            return {speaker_id: len(embeddings) for speaker_id, embeddings in self.speaker_embeddings.items()}
+
+    def save(self):
+        """샤드 임베딩을 추출기 버전과 함께 파일에 저장 (임시 파일에 쓴 뒤 교체)"""
+        with self._lock:
+            snapshot = {speaker_id: list(embeddings) for speaker_id, embeddings in self.speaker_embeddings.items()}
+            extractor_version = self.extractor_version
+        with self._save_lock:
+            save_gallery_file(self.embeddings_file, snapshot, extractor_version)
+        return True
+
+    def handle(self, op, kwargs):
+        """원격 요청 처리"""
+        if op == "ping":
+            return {"index": self.index, "num_shards": self.num_shards,
+                    "extractor_version": self.extractor_version, "count": self.count()}
+        if op not in ("register", "register_many", "delete", "search", "score", "contains", "count", "list", "save"):
+            raise ValueError(f"알 수 없는 작업: {op}")
+        return getattr(self, op)(**kwargs)
+
+
+def _serve_connection(shard, conn):
+    """클라이언트 연결 하나를 처리하는 루프"""
+    try:
+        while True:
+            try:
+                op, kwargs = conn.recv()
+            except (EOFError, OSError):
+                break
+            try:
+                conn.send(("ok", shard.handle(op, kwargs)))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+def serve_shard(index, num_shards, address, embeddings_file, authkey=None):
+    """
+    샤드 프로세스 실행 (연결마다 스레드 하나로 요청 처리)
+    Args:
+        index (int): 샤드 인덱스
+        num_shards (int): 전체 샤드 수
+        address (tuple): (host, port)
+        embeddings_file (str): 기본 임베딩 파일 경로 (샤드 파일명은 자동 생성)
+        authkey (bytes): 인증 키 (생략 시 GALLERY_SHARD_AUTHKEY)
+    """
+    authkey = authkey or load_authkey()
+    shard = GalleryShard(index, num_shards, shard_embeddings_file(embeddings_file, index, num_shards))
+    print(f"갤러리 샤드 {index}/{num_shards} 시작: {address[0]}:{address[1]} "
+          f"({shard.count()}명의 화자, {shard.extractor_version or '추출기 버전 없음'})")
+    with Listener(address, authkey=authkey) as listener:
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_serve_connection, args=(shard, conn), daemon=True).start()
+
+
+def launch_local_shards(num_shards, base_port=6100, embeddings_file="speaker_embeddings.pkl",
+                        host="127.0.0.1", authkey=None):
+    """
+    한 머신에서 여러 샤드 프로세스를 실행 (로컬 테스트용)
+    Returns:
+        tuple: (프로세스 리스트, (host, port) 주소 리스트)
+    """
+    authkey = authkey or load_authkey()
+    processes = []
+    addresses = []
+    for index in range(num_shards):
+        address = (host, base_port + index)
+        process = multiprocessing.Process(
+            target=serve_shard,
+            args=(index, num_shards, address, embeddings_file, authkey),
+            daemon=True
+        )
+        process.start()
+        processes.append(process)
+        addresses.append(address)
+    return processes, addresses
+
+
+class _ShardClient:
+    """샤드 하나에 대한 영속 연결 (연결당 요청은 직렬화)"""
+
+    def __init__(self, address, authkey, connect_timeout=10.0):
+        self.address = address
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        deadline = time.time() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.address, authkey=self.authkey)
+            except ConnectionRefusedError:
+                # 샤드 프로세스가 아직 시작 중일 수 있음
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.1)
+
+    def call(self, op, **kwargs):
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                self._conn.send((op, kwargs))
+                status, result = self._conn.recv()
+            except (EOFError, OSError):
+                self._conn = None
+                raise
+        if status != "ok":
+            raise RuntimeError(f"샤드 {self.address[0]}:{self.address[1]} 오류: {result}")
+        return result
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ShardedGallery:
+    def __init__(self, addresses, authkey=None, extractor_version=None, untagged_version=None):
+        """
+        샤딩된 갤러리 클라이언트
+        Args:
+            addresses (list): 샤드 인덱스 순서의 (host, port) 리스트
+            authkey (bytes): 인증 키 (생략 시 GALLERY_SHARD_AUTHKEY)
+            extractor_version (str): 서버의 추출기 버전 (샤드의 버전과 다르면 연결하지 않음)
+            untagged_version (str): 추출기 버전이 기록되지 않은 이전 형식 샤드 파일의 버전으로 간주할 값
+        Raises:
+            RuntimeError: 샤드 구성이나 추출기 버전이 일치하지 않는 경우
+        """
+        if not addresses:
+            raise ValueError("샤드 주소가 하나 이상 필요합니다")
+        authkey = authkey or load_authkey()
+        self.shards = [_ShardClient(tuple(address), authkey) for address in addresses]
+        self.num_shards = len(self.shards)
+        self.extractor_version = extractor_version
+        self._executor = ThreadPoolExecutor(max_workers=self.num_shards)
+        # 저장하지 않은 등록이 있는 샤드 인덱스 (save는 이 샤드만 저장)
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+
+        # 샤드 구성이 일치하는지 확인
+        for index, shard in enumerate(self.shards):
+            info = shard.call("ping")
+            if info["index"] != index or info["num_shards"] != self.num_shards:
+                raise RuntimeError(
+                    f"샤드 구성 불일치: {shard.address} (기대값 {index}/{self.num_shards}, "
+                    f"실제 {info['index']}/{info['num_shards']})"
+                )
+            shard_version = info["extractor_version"] or (untagged_version if info["count"] else None)
+            if extractor_version and shard_version and shard_version != extractor_version:
+                raise RuntimeError(
+                    f"샤드 추출기 버전 불일치: {shard.address} ({shard_version} 임베딩, 서버 {extractor_version})"
+                )
+
+    def _owner(self, speaker_id):
+        return self.shards[shard_for(speaker_id, self.num_shards)]
+
+    def _fan_out(self, op, **kwargs):
+        futures = [self._executor.submit(shard.call, op, **kwargs) for shard in self.shards]
+        return [future.result() for future in futures]
+
+    def _mark_dirty(self, indices):
+        with self._dirty_lock:
+            self._dirty.update(indices)
+
+    def register(self, speaker_id, embedding, save=False):
+        index = shard_for(speaker_id, self.num_shards)
+        count = self.shards[index].call("register", speaker_id=speaker_id,
+                                        embedding=np.asarray(embedding, dtype=np.float32), save=save,
+                                        extractor_version=self.extractor_version)
+        if not save:
+            self._mark_dirty([index])
+        return count
+
+    def register_many(self, entries, save=False):
+        """
+        여러 화자 임베딩을 소유 샤드별로 묶어 한 번씩 전달 (저장도 해당 샤드만 수행)
+        Args:
+            entries (list): (speaker_id, embedding) 튜플 리스트
+            save (bool): 각 소유 샤드가 추가 후 저장할지 여부 (False면 다음 save에서 저장)
+        """
+        groups = {}
+        for speaker_id, embedding in entries:
+            groups.setdefault(shard_for(speaker_id, self.num_shards), []).append(
+                (speaker_id, np.asarray(embedding, dtype=np.float32))
+            )
+        futures = [self._executor.submit(self.shards[index].call, "register_many", entries=group, save=save,
+                                         extractor_version=self.extractor_version)
+                   for index, group in groups.items()]
+        for future in futures:
+            future.result()
+        if not save:
+            self._mark_dirty(groups)
+
+    def delete(self, speaker_id):
+        return self._owner(speaker_id).call("delete", speaker_id=speaker_id)
+
+    def search(self, embedding, top_k=1):
+        """
+        모든 샤드에 질의를 보내고 top-k 결과 병합
+        Returns:
+            list: (화자 ID, 유사도) 튜플 리스트 (유사도 내림차순)
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        results = self._fan_out("search", embedding=query, top_k=top_k)
+        merged = heapq.nlargest(top_k, (item for shard_results in results for item in shard_results))
+        return [(speaker_id, similarity) for similarity, speaker_id in merged]
+
+    def score(self, speaker_id, embedding):
+        """소유 샤드에만 질의하여 한 화자와의 최대 유사도 계산 (등록되지 않았으면 None)"""
+        return self._owner(speaker_id).call("score", speaker_id=speaker_id,
+                                            embedding=np.asarray(embedding, dtype=np.float32))
+
+    def count(self):
+        return sum(self._fan_out("count"))
+
+    def list(self):
+        speakers = {}
+        for shard_speakers in self._fan_out("list"):
+            speakers.update(shard_speakers)
+        return speakers
+
+    def contains(self, speaker_id):
+        return self._owner(speaker_id).call("contains", speaker_id=speaker_id)
+
+    def save(self):
+        """저장하지 않은 등록이 있는 샤드만 저장 (다른 샤드 파일은 다시 쓰지 않음)"""
+        with self._dirty_lock:
+            dirty, self._dirty = sorted(self._dirty), set()
+        futures = {index: self._executor.submit(self.shards[index].call, "save") for index in dirty}
+        try:
+            for future in futures.values():
+                future.result()
+        except Exception:
+            # 저장하지 못한 샤드는 다음 save에서 다시 시도
+            self._mark_dirty(index for index, future in futures.items()
+                             if future.exception() is not None)
+            raise
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        self._executor.shutdown(wait=False)
+
+
+def partition_embeddings(embeddings_file, num_shards):
+    """
+    기존 단일 임베딩 파일을 화자 ID 해시에 따라 샤드 파일로 분할 (원본 파일은 유지, 추출기 버전도 함께 기록)
+    Args:
+        embeddings_file (str): 기존 임베딩 파일 경로
+        num_shards (int): 전체 샤드 수
+    Returns:
+        list: 샤드별 화자 수
+    Raises:
+        FileExistsError: 샤드 파일이 이미 있는 경우 (샤드에 등록된 화자를 덮어쓰지 않음)
+    """
+    shard_files = [shard_embeddings_file(embeddings_file, index, num_shards) for index in range(num_shards)]
+    existing = [path for path in shard_files if os.path.exists(path)]
+    if existing:
+        raise FileExistsError(f"샤드 파일이 이미 있습니다: {', '.join(existing)}")
+
+    speaker_embeddings, extractor_version = load_gallery_file(embeddings_file)
+    partitions = [{} for _ in range(num_shards)]
+    for speaker_id, embeddings in speaker_embeddings.items():
+        partitions[shard_for(speaker_id, num_shards)][speaker_id] = [
+            np.asarray(e, dtype=np.float32) for e in embeddings
+        ]
+    for path, partition in zip(shard_files, partitions):
+        save_gallery_file(path, partition, extractor_version)
+    return [len(partition) for partition in partitions]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="화자 임베딩 갤러리 샤드 서버")
+    parser.add_argument("--num-shards", type=int, required=True, help="전체 샤드 수")
+    parser.add_argument("--index", type=int, help="실행할 샤드 인덱스 (생략 시 모든 샤드를 로컬 프로세스로 실행)")
+    parser.add_argument("--host", default="127.0.0.1", help="바인드 주소")
+    parser.add_argument("--base-port", type=int, default=6100, help="샤드 0의 포트 (샤드 i는 base-port + i)")
+    parser.add_argument("--embeddings_file", default="speaker_embeddings.pkl", help="기본 임베딩 파일 경로")
+    parser.add_argument("--partition", action="store_true",
+                        help="기존 임베딩 파일을 샤드 파일로 분할한 뒤 종료 (서버를 실행하지 않음)")
+
+    args = parser.parse_args()
+
+    if args.partition:
+        counts = partition_embeddings(args.embeddings_file, args.num_shards)
+        for index, count in enumerate(counts):
+            print(f"샤드 {index}: {count}명의 화자 -> "
+                  f"{shard_embeddings_file(args.embeddings_file, index, args.num_shards)}")
+        return
+
+    try:
+        authkey = load_authkey()
+    except RuntimeError as e:
+        parser.error(str(e))
+
+    if args.index is not None:
+        serve_shard(args.index, args.num_shards, (args.host, args.base_port + args.index),
+                    args.embeddings_file, authkey)
+        return
+
+    processes, addresses = launch_local_shards(args.num_shards, args.base_port, args.embeddings_file,
+                                               args.host, authkey)
+    print("GALLERY_SHARDS=" + ",".join(f"{host}:{port}" for host, port in addresses))
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("\n샤드를 종료합니다.")
+
+
+if __name__ == "__main__":
+    main()
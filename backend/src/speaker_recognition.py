@@ -2,23 +2,59 @@ import torch
 import torchaudio
 import numpy as np
 from pathlib import Path
-import pickle
 import os
 import time
-from espnet2.bin.asr_inference import Speech2Text
+import shutil
+import threading
 from sklearn.metrics.pairwise import cosine_similarity
 from tqdm import tqdm
 
+try:
+    from .sharded_gallery import ShardedGallery
+    from .compact_embeddings import EmbeddingCompactor
+    from .gallery_snapshot import VersionedGallery, load_gallery_file, save_gallery_file
+    from .feature_store import FeatureStore, frontend_signature
+    from .extractors import (ASR_MODEL_TAG, ASR_TOKENS_METHOD, SPEAKER_EMBEDDING_METHOD,
+                             load_extractor, resolve_extractor_version)
+    from .profiling import span
+    from .tuned_profile import apply_torch_threads
+    from .long_audio import LongAudioPolicy
+except ImportError:
+    from sharded_gallery import ShardedGallery
+    from compact_embeddings import EmbeddingCompactor
+    from gallery_snapshot import VersionedGallery, load_gallery_file, save_gallery_file
+    from feature_store import FeatureStore, frontend_signature
+    from extractors import (ASR_MODEL_TAG, ASR_TOKENS_METHOD, SPEAKER_EMBEDDING_METHOD,
+                            load_extractor, resolve_extractor_version)
+    from profiling import span
+    from tuned_profile import apply_torch_threads
+    from long_audio import LongAudioPolicy
+
 class SpeakerRecognition:
-    def __init__(self, embeddings_file="speaker_embeddings.pkl"):
+    def __init__(self, embeddings_file="speaker_embeddings.pkl", shard_addresses=None, compactor_file=None,
+                 num_threads=None, interop_threads=None, long_audio_policy=None, model_tag=None,
+                 feature_store_dir=None, speaker_model=None):
         """
-        화자 인식 시스템 초기화
+        화자 인식 시스템 초기화 (기존 갤러리는 model_tag/speaker_model과 관계없이 파일에 기록된 추출기로 서빙)
         Args:
             embeddings_file (str): 화자 임베딩을 저장할 파일 경로
+            shard_addresses (list): 갤러리 샤드 (host, port) 리스트 (지정 시 샤딩 모드)
+            compactor_file (str): 임베딩 압축기 파일 경로 (지정 시 압축 코드로 유사도 계산)
+            num_threads (int): CPU intra-op 스레드 수 (None이면 튜닝 프로파일 또는 사용 가능 CPU 수)
+            interop_threads (int): CPU inter-op 스레드 수 (None이면 튜닝 프로파일 값)
+            long_audio_policy (LongAudioPolicy): 긴 음성 구간 샘플링 정책 (None이면 기본값)
+            model_tag (str): 음성 인식 텍스트에 사용할 ASR 모델 태그 (None이면 기본 모델)
+            feature_store_dir (str): 등록 음성 특징 저장 디렉터리 (지정 시 모델 교체 마이그레이션 가능)
+            speaker_model (str): 화자 임베딩 전용 모델 체크포인트 경로 또는 태그
+                (지정 시 새 갤러리는 이 모델로 임베딩하고 ASR 모델은 텍스트가 필요할 때만 로드)
         """
+        self.num_threads = num_threads
+        self.interop_threads = interop_threads
+        self.long_audio_policy = long_audio_policy or LongAudioPolicy()
+
         # 텐서 형식을 float32로 설정 (MPS가 float64를 지원하지 않음)
         torch.set_default_dtype(torch.float32)
-        
+
         # MPS(M1/M2), CUDA 또는 CPU 선택
         if torch.backends.mps.is_available() and torch.backends.mps.is_built():
             try:
@@ -36,46 +72,139 @@ class SpeakerRecognition:
         else:
             self.device = "cpu"
             print("CPU를 사용합니다.")
-            
+
         # CPU 사용 시 성능 최적화
         if self.device == "cpu":
-            torch.set_num_threads(os.cpu_count())
-            print(f"CPU 스레드 수를 {os.cpu_count()}로 설정했습니다.")
-        
+            self._configure_cpu_threads()
+
+        self.embeddings_file = embeddings_file
+        self._save_pending = False  # 저장 필요 여부를 추적하는 플래그
+        self._save_lock = threading.Lock()
+        # 등록(특징 저장 + 갤러리 추가)과 모델 교체를 직렬화
+        self._enrol_lock = threading.Lock()
+
+        # 음성 인식 텍스트용 ASR 모델 (화자 임베딩 전용 모델로 서빙할 때는 처음 필요할 때 로드)
+        self.model_tag = model_tag or ASR_MODEL_TAG
+        self._asr_extractor = None
+        self._asr_lock = threading.Lock()
+
+        # 저장된 갤러리가 있으면 먼저 읽어 임베딩을 만든 추출기를 확인
+        speaker_embeddings, stored_version = {}, None
+        if not shard_addresses and embeddings_file and os.path.exists(embeddings_file):
+            speaker_embeddings, stored_version = self._read_gallery_file()
+        configured_version = resolve_extractor_version(
+            f"{SPEAKER_EMBEDDING_METHOD}@{speaker_model}" if speaker_model else self.model_tag
+        )
+        # 빈 갤러리는 바로 설정한 추출기로 시작
+        extractor_version = stored_version if stored_version and speaker_embeddings else configured_version
+        if extractor_version != configured_version and (model_tag or speaker_model):
+            print(f"갤러리는 {extractor_version} 임베딩입니다. {configured_version}로 바꾸려면 마이그레이션을 실행하세요.")
+
+        extractor = self.load_extractor(extractor_version)
+
+        # 임베딩 압축기 (압축 갤러리는 스냅샷마다 처음 식별할 때 생성)
+        self.compactor = None
+        if compactor_file and os.path.exists(compactor_file):
+            compactor = EmbeddingCompactor.load(compactor_file)
+            if compactor.extractor_version and compactor.extractor_version != extractor.version:
+                print(f"임베딩 압축기를 사용하지 않습니다: {compactor.extractor_version} 갤러리로 학습됨 "
+                      f"(현재 {extractor.version}, 다시 학습하세요)")
+            else:
+                self.compactor = compactor
+                print(f"임베딩 압축기 로드됨: {compactor_file} ({compactor.dim}차원, {compactor.dtype})")
+
+        # 갤러리는 불변 스냅샷으로 게시 (식별은 잠금 없이 현재 스냅샷의 모델과 임베딩을 읽음)
+        self._snapshots = VersionedGallery(speaker_embeddings, compactor=self.compactor,
+                                           extractor=extractor, extractor_version=extractor.version)
+
+        # 등록 음성 특징 저장소 (샤딩 모드에서는 사용하지 않음)
+        self.feature_store = None
+        if feature_store_dir and not shard_addresses:
+            self.feature_store = FeatureStore(feature_store_dir)
+
+        # 샤딩 모드: 임베딩은 샤드 프로세스가 소유하고 로컬에는 보관하지 않음
+        self.gallery = None
+        if shard_addresses:
+            # 다른 모델로 만든 샤드에는 연결하지 않음 (버전이 없는 이전 샤드 파일은 기본 모델로 간주)
+            self.gallery = ShardedGallery(shard_addresses, extractor_version=extractor.version,
+                                          untagged_version=f"{ASR_TOKENS_METHOD}@{ASR_MODEL_TAG}")
+            print(f"샤딩된 갤러리에 연결했습니다 ({self.gallery.num_shards}개 샤드, {self.gallery.count()}명의 화자)")
+
+    def _configure_cpu_threads(self):
+        """튜닝 프로파일(없으면 cgroup 할당량을 반영한 CPU 수)에 맞춰 torch 스레드 수 설정"""
+        intra, inter = apply_torch_threads(torch, self.num_threads, self.interop_threads)
+        print(f"CPU 스레드 수를 intra-op {intra}, inter-op {inter or torch.get_num_interop_threads()}로 설정했습니다.")
+
+    def load_extractor(self, extractor_version):
+        """
+        추출기 로드 (실패하면 CPU로 다시 시도)
+        Args:
+            extractor_version (str): 추출기 버전 ("spk-v1@<체크포인트>") 또는 ASR 모델 태그
+        Returns:
+            EmbeddingExtractor: 임베딩 추출기
+        """
         # 모델 로딩 시간 측정
         start_time = time.time()
-        print("ESPnet 모델을 로딩 중입니다...")
-        
+        print(f"ESPnet 모델을 로딩 중입니다... ({extractor_version})")
+
         try:
             # ESPnet 모델 로드
-            self.speech2text = Speech2Text.from_pretrained(
-                "espnet/kan-bayashi_csj_asr_train_asr_transformer_raw_char_sp_valid.acc.ave",
-                device=self.device
-            )
+            extractor = load_extractor(extractor_version, device=self.device)
             print(f"모델 로딩 완료 ({time.time() - start_time:.2f}초)")
         except Exception as e:
+            if self.device == "cpu":
+                raise RuntimeError(f"모델 로딩 실패: {e}")
             print(f"모델 로딩 실패: {e}")
             print("CPU로 대체하여 다시 시도합니다.")
             self.device = "cpu"
-            torch.set_num_threads(os.cpu_count())
-            
+            self._configure_cpu_threads()
+
             try:
-                self.speech2text = Speech2Text.from_pretrained(
-                    "espnet/kan-bayashi_csj_asr_train_asr_transformer_raw_char_sp_valid.acc.ave",
-                    device=self.device
-                )
+                extractor = load_extractor(extractor_version, device=self.device)
                 print(f"CPU 모델 로딩 완료 ({time.time() - start_time:.2f}초)")
             except Exception as e2:
                 raise RuntimeError(f"모델 로딩 실패: {e2}")
-        
-        self.embeddings_file = embeddings_file
-        self._save_pending = False  # 저장 필요 여부를 추적하는 플래그
-        
-        # 저장된 임베딩이 있으면 로드
-        if os.path.exists(embeddings_file):
-            self.load_embeddings()
-        else:
-            self.speaker_embeddings = {}
+        return extractor
+
+    @property
+    def extractor(self):
+        """현재 갤러리 스냅샷의 임베딩 추출기"""
+        return self._snapshots.current().extractor
+
+    @property
+    def asr_loaded(self):
+        """음성 인식 모델이 메모리에 있는지 여부"""
+        return self.extractor.supports_text or self._asr_extractor is not None
+
+    def asr_extractor(self, snapshot=None):
+        """
+        음성 인식 텍스트용 추출기 (서빙 중인 추출기가 ASR이면 그대로 사용, 아니면 처음 호출할 때 로드)
+        Args:
+            snapshot (GallerySnapshot): 요청이 사용 중인 스냅샷 (None이면 현재 스냅샷)
+        Returns:
+            AsrTokenExtractor: ASR 추출기
+        """
+        snapshot = snapshot or self._snapshots.current()
+        if snapshot.extractor.supports_text:
+            return snapshot.extractor
+        with self._asr_lock:
+            if self._asr_extractor is None:
+                self._asr_extractor = self.load_extractor(f"{ASR_TOKENS_METHOD}@{self.model_tag}")
+            return self._asr_extractor
+
+    @property
+    def extractor_version(self):
+        """현재 갤러리 임베딩의 추출기 버전"""
+        return self._snapshots.current().extractor_version
+
+    @property
+    def speaker_embeddings(self):
+        """현재 갤러리 스냅샷의 읽기 전용 {화자 ID: 임베딩 튜플} 매핑"""
+        return self._snapshots.current().speaker_embeddings
+
+    @speaker_embeddings.setter
+    def speaker_embeddings(self, speaker_embeddings):
+        self._snapshots.replace(speaker_embeddings)
 
     def extract_speaker_embedding(self, audio_path):
         """
@@ -85,18 +214,93 @@ class SpeakerRecognition:
         Returns:
             numpy.ndarray: 화자 임베딩 벡터
         """
-        waveform, sample_rate = torchaudio.load(audio_path)
+        with span("load_audio"):
+            waveform, sample_rate = torchaudio.load(audio_path)
+        return self.extract_speaker_embedding_from_waveform(waveform, sample_rate)
+
+    def extract_speaker_embedding_from_waveform(self, waveform, sample_rate=16000, snapshot=None):
+        """
+        메모리 상의 파형에서 화자 임베딩 추출 (WAV 파일을 거치지 않음)
+        Args:
+            waveform (numpy.ndarray | torch.Tensor): [-1, 1] 범위의 float 파형
+            sample_rate (int): 파형의 샘플링 레이트
+            snapshot (GallerySnapshot): 추출에 사용할 모델의 스냅샷 (None이면 현재 스냅샷)
+        Returns:
+            numpy.ndarray: 화자 임베딩 벡터
+        """
+        snapshot = snapshot or self._snapshots.current()
+        speech = self._prepare_speech(waveform, sample_rate)
+        return self._embed_segments(speech, snapshot.extractor)
+
+    def _prepare_speech(self, waveform, sample_rate):
+        """파형을 16kHz 모노 numpy 배열로 변환"""
+        if isinstance(waveform, np.ndarray):
+            waveform = torch.from_numpy(waveform)
+        waveform = waveform.to(torch.float32)
         if sample_rate != 16000:
             waveform = torchaudio.transforms.Resample(sample_rate, 16000)(waveform)
-        
-        speech = waveform.squeeze().numpy()
-        
+        if waveform.dim() > 1 and waveform.shape[0] > 1:
+            waveform = waveform.mean(dim=0)
+        return waveform.squeeze().numpy()
+
+    def _embed_segments(self, speech, extractor):
+        """
+        긴 음성 정책에 따라 고른 구간들의 임베딩을 하나로 결합
+        (모델이 처리하는 길이가 long_audio_policy.max_analyzed_seconds를 넘지 않음)
+        Args:
+            speech (numpy.ndarray): 16kHz 모노 파형
+            extractor (EmbeddingExtractor): 임베딩 추출기
+        Returns:
+            numpy.ndarray: 화자 임베딩 벡터
+        """
+        segments = self.long_audio_policy.select_segments(speech)
         # with torch.no_grad() 추가로 메모리 사용 최적화
+        with span(extractor.span_name), torch.no_grad():
+            embeddings = [extractor.embed(segment) for segment in segments]
+        return self.long_audio_policy.aggregate(embeddings, fixed_size=extractor.fixed_size)
+
+    def _recognize_segments(self, speech, asr_extractor):
+        """
+        긴 음성 정책에 따라 고른 구간들에 대해 ESPnet 음성 인식 수행
+        Args:
+            speech (numpy.ndarray): 16kHz 모노 파형
+            asr_extractor (AsrTokenExtractor): 음성 인식 추출기
+        Returns:
+            list: 구간별 (인식된 텍스트, 화자 임베딩) 튜플 리스트
+        """
+        segments = self.long_audio_policy.select_segments(speech)
+        with span("asr_inference"), torch.no_grad():
+            return [asr_extractor.recognize(segment) for segment in segments]
+
+    def _segment_features(self, speech, extractor):
+        """
+        긴 음성 정책이 임베딩에 사용하는 구간별 프론트엔드 특징 (특징 저장소 보관용)
+        Args:
+            speech (numpy.ndarray): 16kHz 모노 파형
+            extractor (EmbeddingExtractor): 임베딩 추출기
+        Returns:
+            list: 구간별 (프레임 수, 특징 차원) 특징 리스트 (프론트엔드가 없으면 None)
+        """
+        if extractor.frontend is None:
+            return None
+        return [extractor.extract_features(segment) for segment in self.long_audio_policy.select_segments(speech)]
+
+    def embed_features(self, segments, extractor):
+        """
+        저장된 fbank 특징에서 화자 임베딩 추출 (프론트엔드 이후 단계만 수행, 마이그레이션용)
+        등록 때와 같이 구간별로 임베딩한 뒤 긴 음성 정책으로 결합합니다.
+        Args:
+            segments (list): 구간별 (프레임 수, 특징 차원) 특징 리스트
+            extractor (EmbeddingExtractor): 임베딩을 만들 추출기 (저장 시와 같은 프론트엔드 설정)
+        Returns:
+            numpy.ndarray: 화자 임베딩 벡터
+        """
+        if len(segments) == 1:
+            # 구간 저장 이전에 보관된 전체 음성 특징은 같은 정책을 프레임 단위로 적용 (짧은 구간은 그대로)
+            segments = self.long_audio_policy.select_segments(segments[0], extractor.frame_rate)
         with torch.no_grad():
-            nbests = self.speech2text(speech)
-            
-        embedding = nbests[0][2]  # 화자 임베딩 추출
-        return embedding
+            embeddings = [extractor.embed_features(segment) for segment in segments]
+        return self.long_audio_policy.aggregate(embeddings, fixed_size=extractor.fixed_size)
 
     def extract_speaker_embeddings_batch(self, audio_paths):
         """
@@ -115,27 +319,41 @@ class SpeakerRecognition:
 
     def save_embeddings(self):
         """화자 임베딩을 파일에 저장"""
-        with open(self.embeddings_file, 'wb') as f:
-            pickle.dump(self.speaker_embeddings, f)
-        print(f"임베딩 저장됨: {self.embeddings_file}")
+        if self.gallery is not None:
+            self.gallery.save()
+            self._save_pending = False
+            return
+        # 저장 시점의 스냅샷을 추출기 버전과 함께 저장 (동시 저장 직렬화)
+        with self._save_lock:
+            snapshot = self._snapshots.current()
+            save_gallery_file(self.embeddings_file, snapshot.to_dict(), snapshot.extractor_version)
+        print(f"임베딩 저장됨: {self.embeddings_file} (버전 {snapshot.version}, {snapshot.extractor_version})")
         self._save_pending = False
-    
-    def load_embeddings(self):
-        """파일에서 화자 임베딩 로드"""
+
+    def _read_gallery_file(self):
+        """
+        갤러리 파일 읽기 (추출기 버전이 없는 이전 형식은 기본 모델로 만든 것으로 간주)
+        Returns:
+            tuple: ({화자 ID: 임베딩 리스트}, 추출기 버전)
+        """
         try:
             start_time = time.time()
-            with open(self.embeddings_file, 'rb') as f:
-                self.speaker_embeddings = pickle.load(f)
-            
-            # 이전 포맷과의 호환성 유지: 단일 임베딩을 리스트로 변환
-            for speaker_id, embeddings in self.speaker_embeddings.items():
-                if not isinstance(embeddings, list):
-                    self.speaker_embeddings[speaker_id] = [embeddings]
-                    
-            print(f"임베딩 로드됨: {self.embeddings_file} ({len(self.speaker_embeddings)}명의 화자, {time.time() - start_time:.2f}초)")
+            speaker_embeddings, extractor_version = load_gallery_file(self.embeddings_file)
+            extractor_version = extractor_version or f"{ASR_TOKENS_METHOD}@{ASR_MODEL_TAG}"
+            print(f"임베딩 로드됨: {self.embeddings_file} ({len(speaker_embeddings)}명의 화자, "
+                  f"{extractor_version}, {time.time() - start_time:.2f}초)")
+            return speaker_embeddings, extractor_version
         except Exception as e:
             print(f"임베딩 로드 실패: {e}")
-            self.speaker_embeddings = {}
+            return {}, None
+
+    def load_embeddings(self):
+        """파일에서 화자 임베딩 다시 로드 (현재 모델과 다른 버전의 갤러리는 거부)"""
+        speaker_embeddings, extractor_version = self._read_gallery_file()
+        if extractor_version is not None and extractor_version != self.extractor_version:
+            print(f"임베딩을 로드하지 않습니다: {extractor_version} 갤러리 (현재 모델 {self.extractor_version})")
+            return
+        self._snapshots.replace(speaker_embeddings)
 
     def register_speaker(self, speaker_id, audio_path, save_immediately=False):
         """
@@ -145,21 +363,137 @@ class SpeakerRecognition:
             audio_path (str): 화자의 음성 파일 경로
             save_immediately (bool): 즉시 저장 여부
         """
-        embedding = self.extract_speaker_embedding(audio_path)
-        
-        # 새로운 화자면 리스트 생성, 기존 화자면 임베딩 추가
-        if speaker_id not in self.speaker_embeddings:
-            self.speaker_embeddings[speaker_id] = [embedding]
-        else:
-            self.speaker_embeddings[speaker_id].append(embedding)
-        
+        with span("load_audio"):
+            waveform, sample_rate = torchaudio.load(audio_path)
+        self.register_speaker_waveform(speaker_id, waveform, sample_rate, save_immediately)
+
+    def register_speaker_waveform(self, speaker_id, waveform, sample_rate=16000, save_immediately=False):
+        """
+        메모리 상의 파형으로 화자 등록 (WAV 파일을 거치지 않음)
+        Args:
+            speaker_id (str): 화자 ID
+            waveform (numpy.ndarray | torch.Tensor): [-1, 1] 범위의 float 파형
+            sample_rate (int): 파형의 샘플링 레이트
+            save_immediately (bool): 즉시 저장 여부
+        """
+        error = self.register_speakers_waveforms([(speaker_id, waveform, sample_rate)], save=save_immediately)[0]
+        if error is not None:
+            raise error
+
+    def register_speakers_waveforms(self, items, save=True):
+        """
+        여러 파형을 등록하고 한 버전으로 갤러리에 추가 (비동기 등록 배치용)
+        추출 도중 모델이 교체되면 새 모델로 한 번 다시 추출
+        Args:
+            items (list): (speaker_id, waveform, sample_rate) 튜플 리스트
+            save (bool): 추가 후 한 번 저장할지 여부
+        Returns:
+            list: 항목별 예외 (성공한 항목은 None)
+        """
+        errors = [None] * len(items)
+        pending = list(range(len(items)))
+        for _ in range(2):
+            snapshot = self._snapshots.current()
+            prepared = []
+            for index in pending:
+                speaker_id, waveform, sample_rate = items[index]
+                try:
+                    speech = self._prepare_speech(waveform, sample_rate)
+                    embedding = self._embed_segments(speech, snapshot.extractor)
+                    features = None
+                    if self.feature_store is not None:
+                        # 임베딩에 사용한 구간의 특징만 보관 (마이그레이션 때 같은 구간을 다시 임베딩)
+                        features = self._segment_features(speech, snapshot.extractor)
+                    prepared.append((index, speaker_id, embedding, features))
+                except Exception as e:
+                    errors[index] = e
+            if not prepared:
+                pending = []
+                break
+            if self._commit_enrolments([entry[1:] for entry in prepared], snapshot):
+                pending = []
+                break
+            print("등록 중 모델이 교체되어 새 모델로 다시 추출합니다.")
+            pending = [entry[0] for entry in prepared]
+        for index in pending:
+            errors[index] = RuntimeError("모델 교체 중이라 등록하지 못했습니다. 다시 시도하세요.")
+
+        if save and self._save_pending:
+            self.save_embeddings()
+        return errors
+
+    def _commit_enrolments(self, entries, snapshot):
+        """
+        추출된 임베딩(과 특징)을 갤러리에 추가
+        Args:
+            entries (list): (speaker_id, embedding, features) 튜플 리스트
+            snapshot (GallerySnapshot): 임베딩 추출에 사용한 스냅샷
+        Returns:
+            bool: 추가 여부 (그 사이 모델이 교체되었으면 False)
+        """
+        # 샤딩 모드에서는 소유 샤드별로 묶어 전달 (저장 시 변경된 샤드만 자신의 파일에 기록)
+        if self.gallery is not None:
+            self.gallery.register_many([(speaker_id, embedding) for speaker_id, embedding, _ in entries])
+            self._save_pending = True
+            return True
+
+        with self._enrol_lock:
+            if self._snapshots.current().extractor_version != snapshot.extractor_version:
+                return False
+            if self.feature_store is not None:
+                signature = frontend_signature(snapshot.extractor.frontend)
+                for speaker_id, _, features in entries:
+                    if features is not None:
+                        self.feature_store.add(speaker_id, features, signature)
+            # 배치 전체를 한 버전으로 게시 (진행 중인 식별은 이전 스냅샷을 계속 사용)
+            self._snapshots.add_many([(speaker_id, embedding) for speaker_id, embedding, _ in entries],
+                                     extractor_version=snapshot.extractor_version)
+
         # 저장 플래그 설정
         self._save_pending = True
-        
-        # 즉시 저장 요청이 있을 경우에만 저장
-        if save_immediately:
+        return True
+
+    def speakers_without_features(self):
+        """특징이 저장되지 않아 다시 임베딩할 수 없는 화자 ID 목록 (특징 저장 이전에 등록된 화자)"""
+        if self.feature_store is None:
+            return sorted(self.speaker_embeddings)
+        return sorted(set(self.speaker_embeddings) - self.feature_store.speakers())
+
+    def switch_extractor(self, extractor, catch_up, drop_missing=False):
+        """
+        새 모델로 다시 임베딩한 갤러리로 원자적 교체 (등록만 잠시 막고 식별은 계속 서빙)
+        Args:
+            extractor (EmbeddingExtractor): 새 추출기
+            catch_up (callable): 등록 잠금 안에서 남은 특징을 임베딩하고
+                {(speaker_id, feature_id): 임베딩}을 반환하는 함수
+            drop_missing (bool): 특징이 없는 화자를 새 갤러리에서 제외할지 여부
+        Raises:
+            ValueError: 특징이 없는 화자가 있는데 drop_missing이 False
+        """
+        if self.gallery is not None:
+            raise ValueError("샤딩 모드에서는 모델 교체를 지원하지 않습니다")
+        with self._enrol_lock:
+            migrated = catch_up()
+            speaker_embeddings = {}
+            for (speaker_id, _), embedding in sorted(migrated.items(), key=lambda item: item[0][1]):
+                speaker_embeddings.setdefault(speaker_id, []).append(embedding)
+
+            missing = set(self.speaker_embeddings) - set(speaker_embeddings)
+            if missing and not drop_missing:
+                raise ValueError(f"특징이 없는 화자가 {len(missing)}명 있습니다: {', '.join(sorted(missing)[:5])}")
+
+            # 되돌릴 수 있도록 이전 갤러리 파일 보관
+            if os.path.exists(self.embeddings_file):
+                shutil.copy2(self.embeddings_file, f"{self.embeddings_file}.bak")
+            previous_version = self.extractor_version
+            # 이전 압축기는 이전 임베딩으로 학습되었으므로 사용하지 않음
+            self.compactor = None
+            self._snapshots.switch_extractor(speaker_embeddings, extractor, extractor.version)
             self.save_embeddings()
-    
+
+        print(f"모델 교체 완료: {previous_version} -> {extractor.version} "
+              f"({len(speaker_embeddings)}명의 화자, 제외된 화자 {len(missing)}명)")
+
     def register_speakers_batch(self, speaker_data):
         """
         여러 화자/오디오 파일 일괄 등록
@@ -172,7 +506,120 @@ class SpeakerRecognition:
           # 모든 등록 완료 후 한 번만 저장
         if self._save_pending:
             self.save_embeddings()
+    
+    def delete_speaker(self, speaker_id):
+        """
+        화자 삭제 후 저장
+        Args:
+            speaker_id (str): 화자 ID
+        Returns:
+            bool: 삭제 여부 (등록되지 않은 화자면 False)
+        """
+        if self.gallery is not None:
+            return self.gallery.delete(speaker_id)
+        
+        with self._enrol_lock:
+            removed = self._snapshots.remove(speaker_id)
+            if self.feature_store is not None:
+                self.feature_store.delete_speaker(speaker_id)
+        if not removed:
+            return False
+        self.save_embeddings()
+        return True
+    
+    def get_speaker_count(self):
+        """등록된 화자 수"""
+        if self.gallery is not None:
+            return self.gallery.count()
+        return len(self.speaker_embeddings)
+    
+    def get_embedding_counts(self):
+        """
+        화자별 등록된 임베딩 개수
+        Returns:
+            dict: {화자 ID: 임베딩 개수}
+        """
+        if self.gallery is not None:
+            return self.gallery.list()
+        return {speaker_id: len(embeddings) for speaker_id, embeddings in self.speaker_embeddings.items()}
+        
+    def has_speaker(self, speaker_id):
+        """화자 등록 여부"""
+        if self.gallery is not None:
+            return self.gallery.contains(speaker_id)
+        return speaker_id in self.speaker_embeddings
+
+    def verify_speaker(self, speaker_id, audio_path, threshold=0.7):
+        """
+        입력된 음성이 주장한 화자인지 1:1 검증
+        (음성 인식 텍스트 없이 임베딩만 추출하고 해당 화자의 임베딩과만 비교하므로
+        비용이 갤러리 크기와 무관함)
+        Args:
+            speaker_id (str): 주장한 화자 ID
+            audio_path (str): 검증할 음성 파일 경로
+            threshold (float): 유사도 임계값
+        Returns:
+            tuple: (일치 여부, 유사도 점수)
+        Raises:
+            KeyError: 등록되지 않은 화자
+        """
+        with span("load_audio"):
+            waveform, sample_rate = torchaudio.load(audio_path)
+        return self.verify_speaker_waveform(speaker_id, waveform, sample_rate, threshold)
+
+    def verify_speaker_waveform(self, speaker_id, waveform, sample_rate=16000, threshold=0.7):
+        """
+        메모리 상의 파형으로 1:1 화자 검증
+        Args:
+            speaker_id (str): 주장한 화자 ID
+            waveform (numpy.ndarray | torch.Tensor): [-1, 1] 범위의 float 파형
+            sample_rate (int): 파형의 샘플링 레이트
+            threshold (float): 유사도 임계값
+        Returns:
+            tuple: (일치 여부, 유사도 점수)
+        Raises:
+            KeyError: 등록되지 않은 화자
+        """
+        # 추론 전에 등록 여부부터 확인
+        if not self.has_speaker(speaker_id):
+            raise KeyError(speaker_id)
+        
+        # 시작 시점 스냅샷의 모델로 추출하고 같은 버전의 임베딩과 비교
+        snapshot = self._snapshots.current()
+        start_time = time.time()
+        test_embedding = self.extract_speaker_embedding_from_waveform(waveform, sample_rate, snapshot)
+        print(f"임베딩 추출 시간: {time.time() - start_time:.2f}초")
         
+        with span("scoring"):
+            similarity = self._score_speaker(speaker_id, test_embedding, snapshot)
+        if similarity is None:
+            raise KeyError(speaker_id)  # 추론 중에 삭제됨
+        return similarity >= threshold, similarity
+
+    def _score_speaker(self, speaker_id, test_embedding, snapshot=None):
+        """
+        한 화자의 임베딩들과의 최대 유사도
+        Args:
+            speaker_id (str): 화자 ID
+            test_embedding: 추출된 화자 임베딩
+            snapshot (GallerySnapshot): 비교할 스냅샷 (None이면 현재 스냅샷)
+        Returns:
+            float: 유사도 (등록되지 않은 화자면 None)
+        """
+        test_embedding = np.asarray(test_embedding)
+        
+        # 샤딩 모드: 소유 샤드에만 질의
+        if self.gallery is not None:
+            return self.gallery.score(speaker_id, test_embedding)
+        
+        snapshot = snapshot or self._snapshots.current()
+        speaker_embeddings = snapshot.speaker_embeddings.get(speaker_id)
+        if speaker_embeddings is None:
+            return None
+        if snapshot.compact_gallery is not None:
+            return snapshot.compact_gallery.speaker_score(test_embedding, speaker_id)
+        return float(self._max_similarity(test_embedding, speaker_embeddings))
+
     def identify_speaker(self, audio_path, threshold=0.7):
         """
         입력된 음성의 화자 식별
@@ -182,11 +629,27 @@ class SpeakerRecognition:
         Returns:
             tuple: (가장 유사한 화자 ID, 유사도 점수)
         """
+        with span("load_audio"):
+            waveform, sample_rate = torchaudio.load(audio_path)
+        return self.identify_speaker_waveform(waveform, sample_rate, threshold)
+    
+    def identify_speaker_waveform(self, waveform, sample_rate=16000, threshold=0.7):
+        """
+        메모리 상의 파형으로 화자 식별 (WAV 파일을 거치지 않음)
+        Args:
+            waveform (numpy.ndarray | torch.Tensor): [-1, 1] 범위의 float 파형
+            sample_rate (int): 파형의 샘플링 레이트
+            threshold (float): 유사도 임계값
+        Returns:
+            tuple: (가장 유사한 화자 ID, 유사도 점수)
+        """
+        # 시작 시점 스냅샷의 모델로 추출하고 같은 버전의 임베딩과 비교
+        snapshot = self._snapshots.current()
         start_time = time.time()
-        test_embedding = self.extract_speaker_embedding(audio_path)
+        test_embedding = self.extract_speaker_embedding_from_waveform(waveform, sample_rate, snapshot)
         print(f"임베딩 추출 시간: {time.time() - start_time:.2f}초")
         
-        return self._identify_speaker_with_embedding(test_embedding, threshold)
+        return self._identify_speaker_with_embedding(test_embedding, threshold, snapshot)
     
     def identify_speaker_with_text(self, audio_path, threshold=0.7):
         """
@@ -197,37 +660,66 @@ class SpeakerRecognition:
         Returns:
             tuple: (가장 유사한 화자 ID, 유사도 점수, 인식된 텍스트)
         """
-        start_time = time.time()
-        
         # 오디오 파일 로드
-        waveform, sample_rate = torchaudio.load(audio_path)
-        if sample_rate != 16000:
-            waveform = torchaudio.transforms.Resample(sample_rate, 16000)(waveform)
-        
-        speech = waveform.squeeze().numpy()
+        with span("load_audio"):
+            waveform, sample_rate = torchaudio.load(audio_path)
         
-        # ESPnet 추론으로 임베딩과 텍스트 동시 추출
-        with torch.no_grad():
-            nbests = self.speech2text(speech)
+        return self.identify_speaker_waveform_with_text(waveform, sample_rate, threshold)
+
+    def identify_speaker_waveform_with_text(self, waveform, sample_rate=16000, threshold=0.7):
+        """
+        메모리 상의 파형으로 화자 식별 및 음성 인식 텍스트 반환 (클라이언트 PCM 등)
+        Args:
+            waveform (numpy.ndarray | torch.Tensor): [-1, 1] 범위의 float 파형
+            sample_rate (int): 파형의 샘플링 레이트
+            threshold (float): 유사도 임계값
+        Returns:
+            tuple: (가장 유사한 화자 ID, 유사도 점수, 인식된 텍스트)
+        """
+        snapshot = self._snapshots.current()
+        start_time = time.time()
+        speech = self._prepare_speech(waveform, sample_rate)
         
-        # 임베딩과 텍스트 추출
-        test_embedding = nbests[0][2]  # 화자 임베딩
-        recognized_text = nbests[0][0]  # 인식된 텍스트
+        if snapshot.extractor.supports_text:
+            # ESPnet 추론으로 임베딩과 텍스트 동시 추출 (긴 음성은 샘플링한 구간만)
+            results = self._recognize_segments(speech, snapshot.extractor)
+            test_embedding = self.long_audio_policy.aggregate([tokens for _, tokens in results],
+                                                              fixed_size=snapshot.extractor.fixed_size)  # 화자 임베딩
+        else:
+            # 화자 임베딩 전용 모델로 임베딩하고, 텍스트는 ASR 모델로 따로 인식 (처음 호출 시 로드)
+            test_embedding = self._embed_segments(speech, snapshot.extractor)
+            results = self._recognize_segments(speech, self.asr_extractor(snapshot))
+        # 인식된 텍스트 (긴 음성은 샘플링한 구간의 텍스트만 이어 붙이므로 전체 전사가 아님)
+        recognized_text = " ".join(text for text, _ in results)
         
         print(f"임베딩 및 텍스트 추출 시간: {time.time() - start_time:.2f}초")
         print(f"인식된 텍스트: {recognized_text}")
         
         # 화자 식별
-        speaker_id, similarity = self._identify_speaker_with_embedding(test_embedding, threshold)
+        speaker_id, similarity = self._identify_speaker_with_embedding(test_embedding, threshold, snapshot)
         
         return speaker_id, similarity, recognized_text
     
-    def _identify_speaker_with_embedding(self, test_embedding, threshold=0.7):
+    def _identify_speaker_with_embedding(self, test_embedding, threshold=0.7, snapshot=None):
+        """
+        추출된 임베딩으로 화자 식별 수행 (프로파일링 시 scoring 구간으로 기록)
+        Args:
+            test_embedding: 추출된 화자 임베딩
+            threshold (float): 유사도 임계값
+            snapshot (GallerySnapshot): 비교할 스냅샷 (None이면 현재 스냅샷)
+        Returns:
+            tuple: (가장 유사한 화자 ID, 유사도 점수)
+        """
+        with span("scoring"):
+            return self._score_embedding(test_embedding, threshold, snapshot)
+    
+    def _score_embedding(self, test_embedding, threshold=0.7, snapshot=None):
         """
-        추출된 임베딩으로 화자 식별 수행
+        갤러리와 유사도를 계산하여 화자 식별
         Args:
             test_embedding: 추출된 화자 임베딩
             threshold (float): 유사도 임계값
+            snapshot (GallerySnapshot): 비교할 스냅샷 (None이면 현재 스냅샷)
         Returns:
             tuple: (가장 유사한 화자 ID, 유사도 점수)
         """        
@@ -239,31 +731,31 @@ class SpeakerRecognition:
         max_similarity = -1
         best_speaker_id = None
         
-        if not self.speaker_embeddings:
+        # 샤딩 모드: 모든 샤드에 질의하고 top-1 병합
+        if self.gallery is not None:
+            results = self.gallery.search(test_embedding, top_k=1)
+            print(f"유사도 계산 시간: {time.time() - start_time:.2f}초")
+            if not results:
+                return None, -1
+            best_speaker_id, max_similarity = results[0]
+            if max_similarity < threshold:
+                return None, max_similarity
+            return best_speaker_id, max_similarity
+        
+        # 시작 시점의 스냅샷만 사용 (동시 등록/삭제/모델 교체와 무관하게 일관된 결과)
+        snapshot = snapshot or self._snapshots.current()
+        if not snapshot.speaker_embeddings:
             return None, -1  # 등록된 화자가 없음
         
-        for speaker_id, speaker_embeddings in self.speaker_embeddings.items():
+        # 압축 코드로 유사도 계산
+        if snapshot.compact_gallery is not None:
+            best_speaker_id, max_similarity = snapshot.compact_gallery.identify(test_embedding, threshold)
+            print(f"유사도 계산 시간: {time.time() - start_time:.2f}초 (압축 코드)")
+            return best_speaker_id, max_similarity
+        
+        for speaker_id, speaker_embeddings in snapshot.speaker_embeddings.items():
             # 각 화자의 모든 임베딩과 비교하여 최대 유사도 찾기
-            speaker_max_similarity = -1
-            
-            for stored_embedding in speaker_embeddings:
-                # 저장된 임베딩도 리스트인 경우 NumPy 배열로 변환
-                if isinstance(stored_embedding, list):
-                    stored_embedding = np.array(stored_embedding)
-                
-                # 임베딩 차원 맞추기 - 더 작은 차원으로 맞춤
-                min_dim = min(test_embedding.shape[0], stored_embedding.shape[0])
-                test_embedding_resized = test_embedding[:min_dim]
-                stored_embedding_resized = stored_embedding[:min_dim]
-                
-                similarity = cosine_similarity(
-                    test_embedding_resized.reshape(1, -1),
-                    stored_embedding_resized.reshape(1, -1)
-                )[0][0]
-                
-                # 화자별 최대 유사도 업데이트
-                if similarity > speaker_max_similarity:
-                    speaker_max_similarity = similarity
+            speaker_max_similarity = self._max_similarity(test_embedding, speaker_embeddings)
             
             # 전체 최대 유사도 업데이트
             if speaker_max_similarity > max_similarity:
@@ -275,4 +767,30 @@ class SpeakerRecognition:
         if max_similarity < threshold:
             return None, max_similarity
             
-        return best_speaker_id, max_similarity
\ No newline at end of file
+        return best_speaker_id, max_similarity
+
+    @staticmethod
+    def _max_similarity(test_embedding, speaker_embeddings):
+        """한 화자의 저장된 임베딩들과의 최대 코사인 유사도"""
+        speaker_max_similarity = -1
+        
+        for stored_embedding in speaker_embeddings:
+            # 저장된 임베딩도 리스트인 경우 NumPy 배열로 변환
+            if isinstance(stored_embedding, list):
+                stored_embedding = np.array(stored_embedding)
+            
+            # 임베딩 차원 맞추기 - 더 작은 차원으로 맞춤
+            min_dim = min(test_embedding.shape[0], stored_embedding.shape[0])
+            test_embedding_resized = test_embedding[:min_dim]
+            stored_embedding_resized = stored_embedding[:min_dim]
+            
+            similarity = cosine_similarity(
+                test_embedding_resized.reshape(1, -1),
+                stored_embedding_resized.reshape(1, -1)
+            )[0][0]
+            
+            # 화자별 최대 유사도 업데이트
+            if similarity > speaker_max_similarity:
+                speaker_max_similarity = similarity
+        
+        return speaker_max_similarity
\ No newline at end of file
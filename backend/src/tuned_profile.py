@@ -0,0 +1,107 @@
+"""
+튜닝 프로파일 로드 및 CPU 자원 확인
+
+autotune.py가 만든 튜닝 프로파일(JSON)을 읽어 서버와 CLI가 시작할 때
+스레드 수, 워커 수, 배치 크기 기본값으로 사용합니다.
+프로파일이 없으면 cgroup CPU 할당량을 반영한 사용 가능 CPU 수로 대체합니다.
+"""
+import os
+import json
+import math
+
+# 튜닝 프로파일 기본 경로
+DEFAULT_PROFILE_FILE = os.environ.get("TUNED_PROFILE", "tuned_profile.json")
+
+
+def _cgroup_cpu_limit():
+    """cgroup CPU 할당량 (제한이 없거나 확인할 수 없으면 None)"""
+    # cgroup v2: "quota period" 또는 "max period"
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return float(quota) / float(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    # cgroup v1
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus():
+    """
+    이 프로세스가 실제로 쓸 수 있는 CPU 수
+    (CPU affinity와 컨테이너 cgroup 할당량을 모두 반영)
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return max(1, cpus)
+
+
+def load_tuned_profile(path=None):
+    """
+    튜닝 프로파일 로드
+    Args:
+        path (str): 프로파일 경로 (None이면 TUNED_PROFILE 환경 변수 또는 tuned_profile.json)
+    Returns:
+        dict: 프로파일 (없거나 읽을 수 없으면 빈 dict)
+    """
+    path = path or DEFAULT_PROFILE_FILE
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"튜닝 프로파일을 읽을 수 없습니다: {path} ({e})")
+        return {}
+    # 다른 머신/할당량에서 만든 프로파일이면 스레드 수를 현재 CPU 수로 제한
+    cpus = available_cpus()
+    for key in ("intra_op_threads", "inter_op_threads", "workers"):
+        if key in profile:
+            profile[key] = max(1, min(int(profile[key]), cpus))
+    return profile
+
+
+def resolve_thread_settings(num_threads=None, interop_threads=None, profile=None):
+    """
+    사용할 intra-op / inter-op 스레드 수 결정 (명시값 > 튜닝 프로파일 > 사용 가능 CPU 수)
+    Returns:
+        tuple: (intra-op 스레드 수, inter-op 스레드 수 또는 None)
+    """
+    if profile is None:
+        profile = load_tuned_profile()
+    intra = num_threads or profile.get("intra_op_threads") or available_cpus()
+    inter = interop_threads or profile.get("inter_op_threads")
+    return intra, inter
+
+
+def apply_torch_threads(torch, num_threads=None, interop_threads=None, profile=None):
+    """
+    torch 스레드 수 설정
+    (inter-op 스레드 수는 병렬 작업 전에 한 번만 설정할 수 있으므로 실패하면 무시)
+    Returns:
+        tuple: 적용한 (intra-op, inter-op) 스레드 수
+    """
+    intra, inter = resolve_thread_settings(num_threads, interop_threads, profile)
+    torch.set_num_threads(intra)
+    if inter:
+        try:
+            torch.set_num_interop_threads(inter)
+        except RuntimeError:
+            inter = torch.get_num_interop_threads()
+    return intra, inter
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# src의 모듈은 스크립트처럼 서로 평면 임포트하므로 src를 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
@@ -0,0 +1,64 @@
+"""PCA 식별 인덱스 검증 (부분 갱신 결과가 전체 재생성과 같은지)"""
+import numpy as np
+import pytest
+
+from compact_embeddings import EmbeddingCompactor, CompactGallery, SCORE_BLOCK_ROWS
+
+
+def _gallery(rng, num_speakers, dim=32):
+    return {f"spk{i}": tuple(rng.standard_normal(dim).astype(np.float32)
+                             for _ in range(int(rng.integers(1, 4))))
+            for i in range(num_speakers)}
+
+
+def _assert_same_scores(updated, rebuilt, queries):
+    assert sorted(updated.speaker_ids) == sorted(rebuilt.speaker_ids)
+    assert updated.codes.dtype == rebuilt.codes.dtype
+    assert updated.nbytes == rebuilt.nbytes
+    for query in queries:
+        updated_scores = dict(zip(updated.speaker_ids, updated.speaker_scores(query)))
+        rebuilt_scores = dict(zip(rebuilt.speaker_ids, rebuilt.speaker_scores(query)))
+        for speaker_id, score in rebuilt_scores.items():
+            assert updated_scores[speaker_id] == pytest.approx(score, abs=1e-6)
+            assert updated.speaker_score(query, speaker_id) == pytest.approx(score, abs=1e-6)
+        assert updated.identify(query, threshold=-1.0) == rebuilt.identify(query, threshold=-1.0)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_updated_matches_full_rebuild(dtype):
+    rng = np.random.default_rng(0)
+    speaker_embeddings = _gallery(rng, 40)
+    compactor = EmbeddingCompactor(dim=16, dtype=dtype).fit(
+        [e for embeddings in speaker_embeddings.values() for e in embeddings]
+    )
+    gallery = CompactGallery(compactor, speaker_embeddings)
+    queries = [rng.standard_normal(32).astype(np.float32) for _ in range(5)]
+
+    # 새 화자만 추가
+    speaker_embeddings = dict(speaker_embeddings)
+    speaker_embeddings["new0"] = (rng.standard_normal(32).astype(np.float32),)
+    gallery = gallery.updated(speaker_embeddings, ["new0"])
+    _assert_same_scores(gallery, CompactGallery(compactor, speaker_embeddings), queries)
+
+    # 기존 화자에 임베딩 추가 + 새 화자 + 삭제를 한 번에
+    speaker_embeddings["spk3"] = speaker_embeddings["spk3"] + (rng.standard_normal(32).astype(np.float32),)
+    speaker_embeddings["new1"] = (rng.standard_normal(32).astype(np.float32),)
+    del speaker_embeddings["spk7"]
+    gallery = gallery.updated(speaker_embeddings, ["spk3", "new1", "spk7"])
+    _assert_same_scores(gallery, CompactGallery(compactor, speaker_embeddings), queries)
+    assert gallery.speaker_score(queries[0], "spk7") is None
+
+
+def test_float16_codes_stay_float16_across_score_blocks():
+    rng = np.random.default_rng(1)
+    speaker_embeddings = {f"spk{i}": (rng.standard_normal(8).astype(np.float32),)
+                          for i in range(SCORE_BLOCK_ROWS + 10)}
+    compactor = EmbeddingCompactor(dim=8, dtype="float16").fit(
+        [embeddings[0] for embeddings in speaker_embeddings.values()]
+    )
+    gallery = CompactGallery(compactor, speaker_embeddings)
+    assert gallery.codes.dtype == np.float16
+
+    query = rng.standard_normal(8).astype(np.float32)
+    expected = gallery.codes.astype(np.float32) @ compactor.project([query])[0]
+    np.testing.assert_allclose(compactor.score(query, gallery.codes), expected, rtol=1e-5, atol=1e-6)
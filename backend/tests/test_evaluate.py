@@ -0,0 +1,78 @@
+"""오프라인 평가 점수 계산 검증 (모델 없이 numpy만 사용)"""
+import numpy as np
+import pytest
+
+from evaluate import score_matrix, compute_eer, identification_accuracy, best_accuracy_threshold
+
+
+def _max_similarity(test_embedding, speaker_embeddings):
+    """서빙(SpeakerRecognition._max_similarity)과 같은 쌍별 계산: 작은 차원으로 자른 코사인 유사도의 최대값"""
+    best = -1.0
+    for stored in speaker_embeddings:
+        dim = min(len(test_embedding), len(stored))
+        a, b = test_embedding[:dim], stored[:dim]
+        best = max(best, float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))))
+    return best
+
+
+def _random_embeddings(rng, count, dims):
+    return [rng.standard_normal(int(rng.choice(dims))).astype(np.float32) for _ in range(count)]
+
+
+@pytest.mark.parametrize("dims", [(64,), (48, 64, 80)])
+def test_score_matrix_matches_serving_rule(dims):
+    rng = np.random.default_rng(0)
+    enroll_embeddings = _random_embeddings(rng, 30, dims)
+    enroll_labels = [f"spk{i % 7}" for i in range(30)]
+    test_embeddings = _random_embeddings(rng, 12, dims)
+
+    scores, speakers = score_matrix(test_embeddings, enroll_embeddings, enroll_labels)
+
+    assert speakers == sorted(set(enroll_labels))
+    for row, test_embedding in enumerate(test_embeddings):
+        for column, speaker in enumerate(speakers):
+            stored = [e for e, label in zip(enroll_embeddings, enroll_labels) if label == speaker]
+            assert scores[row, column] == pytest.approx(_max_similarity(test_embedding, stored), abs=1e-5)
+
+
+def test_compute_eer_separable_scores():
+    eer, threshold, det = compute_eer(np.array([0.8, 0.9, 0.95]), np.array([0.1, 0.2, 0.3]))
+    assert eer == 0.0
+    assert 0.3 < threshold <= 0.8
+    assert det
+
+
+def test_compute_eer_matches_brute_force():
+    rng = np.random.default_rng(1)
+    targets = rng.normal(0.7, 0.1, 200)
+    nontargets = rng.normal(0.4, 0.1, 500)
+
+    eer, threshold, _ = compute_eer(targets, nontargets)
+
+    # 임계값 이상이면 수락할 때 모든 후보 임계값에서 FAR/FRR 차이가 가장 작은 점
+    candidates = np.unique(np.concatenate([targets, nontargets]))
+    far = np.array([np.mean(nontargets >= t) for t in candidates])
+    frr = np.array([np.mean(targets < t) for t in candidates])
+    index = int(np.argmin(np.abs(far - frr)))
+    assert threshold == pytest.approx(candidates[index])
+    assert eer == pytest.approx((far[index] + frr[index]) / 2)
+
+
+@pytest.mark.parametrize("decimals", [None, 1])
+@pytest.mark.parametrize("seed", range(5))
+def test_best_accuracy_threshold_matches_brute_force(decimals, seed):
+    rng = np.random.default_rng(seed)
+    speakers = ["a", "b", "c"]
+    test_labels = [str(label) for label in rng.choice(["a", "b", "c", "unknown"], 40)]
+    scores = rng.uniform(0, 1, (40, 3)).astype(np.float32)
+    if decimals is not None:
+        # 같은 점수가 여러 개인 경우
+        scores = np.round(scores, decimals)
+
+    threshold, accuracy = best_accuracy_threshold(scores, speakers, test_labels)
+
+    best_scores = scores.max(axis=1)
+    candidates = np.concatenate([np.unique(best_scores), [best_scores.max() + 1e-6]])
+    brute_force = max(identification_accuracy(scores, speakers, test_labels, t) for t in candidates)
+    assert accuracy == pytest.approx(brute_force)
+    assert identification_accuracy(scores, speakers, test_labels, threshold) == pytest.approx(accuracy)
@@ -0,0 +1,72 @@
+// 마이크 입력을 녹음 중에 16kHz 모노 Int16 PCM으로 변환하는 AudioWorklet 프로세서
+// 입력 샘플레이트(보통 44.1/48kHz)에서 출력 샘플 구간마다 평균을 내어 다운샘플링하고,
+// frameSize 샘플이 모일 때마다 ArrayBuffer로 메인 스레드에 전달합니다.
+class PcmRecorderProcessor extends AudioWorkletProcessor {
+  constructor(options) {
+    super();
+    const processorOptions = (options && options.processorOptions) || {};
+    this.targetRate = processorOptions.targetRate || 16000;
+    this.frameSize = processorOptions.frameSize || 1600; // 100ms
+    this.ratio = sampleRate / this.targetRate; // 입력 샘플 수 / 출력 샘플 1개
+    this.position = 0; // 현재 출력 샘플 구간 안에서의 입력 위치
+    this.sum = 0;
+    this.count = 0;
+    this.frame = new Int16Array(this.frameSize);
+    this.frameIndex = 0;
+
+    this.port.onmessage = (event) => {
+      if (event.data && event.data.type === 'flush') {
+        this.flushFrame();
+        this.port.postMessage({ type: 'flushed' });
+      }
+    };
+  }
+
+  pushSample(value) {
+    const clamped = Math.max(-1, Math.min(1, value));
+    this.frame[this.frameIndex++] = clamped < 0 ? clamped * 0x8000 : clamped * 0x7fff;
+    if (this.frameIndex === this.frameSize) {
+      this.flushFrame();
+    }
+  }
+
+  flushFrame() {
+    if (this.frameIndex === 0) {
+      return;
+    }
+    const buffer = this.frame.slice(0, this.frameIndex).buffer;
+    this.port.postMessage({ type: 'frame', buffer }, [buffer]);
+    this.frameIndex = 0;
+  }
+
+  process(inputs) {
+    const input = inputs[0];
+    if (!input || input.length === 0) {
+      return true;
+    }
+    const channels = input.length;
+    const length = input[0].length;
+
+    for (let i = 0; i < length; i++) {
+      // 모노 다운믹스
+      let sample = 0;
+      for (let c = 0; c < channels; c++) {
+        sample += input[c][i];
+      }
+      this.sum += sample / channels;
+      this.count++;
+      this.position++;
+
+      // 출력 샘플 하나에 해당하는 입력 구간이 끝나면 평균값 출력 (간단한 저역 통과)
+      if (this.position >= this.ratio) {
+        this.position -= this.ratio;
+        this.pushSample(this.sum / this.count);
+        this.sum = 0;
+        this.count = 0;
+      }
+    }
+    return true;
+  }
+}
+
+registerProcessor('pcm-recorder', PcmRecorderProcessor);
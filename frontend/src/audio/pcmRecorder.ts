@@ -0,0 +1,79 @@
+// 마이크 스트림을 AudioWorklet으로 16kHz 모노 Int16 PCM 프레임으로 변환하는 녹음기
+// 서버는 이 PCM을 ffmpeg 변환 없이 바로 사용합니다 (/speakers/*/pcm, /streams/{id}/frames)
+
+export const PCM_SAMPLE_RATE = 16000;
+const FRAME_SIZE = 1600; // 100ms
+const WORKLET_URL = '/pcm-recorder-worklet.js';
+
+type WorkletMessage = { type: 'frame'; buffer: ArrayBuffer } | { type: 'flushed' };
+
+export class PcmRecorder {
+  private context: AudioContext | null = null;
+  private source: MediaStreamAudioSourceNode | null = null;
+  private node: AudioWorkletNode | null = null;
+  private frames: Int16Array[] = [];
+  private onFrame: ((frame: Int16Array) => void) | null = null;
+  private onFlushed: (() => void) | null = null;
+
+  // 녹음 시작 (onFrame이 있으면 100ms 프레임마다 호출)
+  async start(stream: MediaStream, onFrame?: (frame: Int16Array) => void): Promise<void> {
+    this.frames = [];
+    this.onFrame = onFrame ?? null;
+
+    const context = new AudioContext();
+    await context.audioWorklet.addModule(WORKLET_URL);
+    const node = new AudioWorkletNode(context, 'pcm-recorder', {
+      numberOfOutputs: 0,
+      processorOptions: { targetRate: PCM_SAMPLE_RATE, frameSize: FRAME_SIZE }
+    });
+    node.port.onmessage = (event: MessageEvent<WorkletMessage>) => {
+      if (event.data.type === 'frame') {
+        const frame = new Int16Array(event.data.buffer);
+        this.frames.push(frame);
+        this.onFrame?.(frame);
+      } else if (event.data.type === 'flushed') {
+        this.onFlushed?.();
+      }
+    };
+
+    const source = context.createMediaStreamSource(stream);
+    source.connect(node);
+
+    this.context = context;
+    this.source = source;
+    this.node = node;
+  }
+
+  // 녹음 중지 (남은 샘플까지 받은 뒤 전체 PCM 반환)
+  async stop(): Promise<Int16Array> {
+    const node = this.node;
+    if (node) {
+      await new Promise<void>((resolve) => {
+        this.onFlushed = resolve;
+        node.port.postMessage({ type: 'flush' });
+      });
+      this.onFlushed = null;
+      node.port.onmessage = null;
+    }
+    this.source?.disconnect();
+    node?.disconnect();
+    await this.context?.close();
+
+    this.context = null;
+    this.source = null;
+    this.node = null;
+    this.onFrame = null;
+    return concatPcm(this.frames);
+  }
+}
+
+export function concatPcm(frames: Int16Array[]): Int16Array {
+  const length = frames.reduce((total, frame) => total + frame.length, 0);
+  const pcm = new Int16Array(length);
+  let offset = 0;
+  for (const frame of frames) {
+    pcm.set(frame, offset);
+    offset += frame.length;
+  }
+  return pcm;
+}
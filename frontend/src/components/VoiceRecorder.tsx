@@ -1,5 +1,6 @@
 import React, { useState, useRef, useCallback } from 'react';
-import { Mic, MicOff, Upload, File } from 'lucide-react';
+import { Mic, MicOff, Upload, File, Radio } from 'lucide-react';
+import { PcmRecorder, concatPcm } from '../audio/pcmRecorder';
 
 interface VoiceRecorderProps {
   isRecording: boolean;
@@ -23,44 +24,134 @@ const VoiceRecorder: React.FC<VoiceRecorderProps> = ({
   const [speakerId, setSpeakerId] = useState('');
   const [inputMode, setInputMode] = useState<'mic' | 'file'>('mic'); // 입력 모드 선택
   const [selectedFile, setSelectedFile] = useState<File | null>(null); // 선택된 파일
+  const [liveStreaming, setLiveStreaming] = useState(false); // 녹음 중 실시간 식별
   
-  const mediaRecorderRef = useRef<MediaRecorder | null>(null);
-  const audioChunksRef = useRef<Blob[]>([]);
+  const pcmRecorderRef = useRef<PcmRecorder | null>(null);
+  const mediaStreamRef = useRef<MediaStream | null>(null);
   const timerRef = useRef<number | null>(null);
+  const autoStopRef = useRef<number | null>(null);
   const fileInputRef = useRef<HTMLInputElement>(null); // 파일 입력 ref
+  // 실시간 스트리밍 상태 (전송 대기 프레임, 진행 중인 요청, 스트림 ID)
+  const pendingFramesRef = useRef<Int16Array[]>([]);
+  const streamRequestRef = useRef<Promise<void> | null>(null);
+  const streamIdRef = useRef<string | null>(null);
+  const streamTimerRef = useRef<number | null>(null);
+  // 메모이즈된 콜백과 타이머가 첫 렌더의 값을 쓰지 않도록 최신 모드/화자 ID를 ref로 읽음
+  const registrationModeRef = useRef(registrationMode);
+  const speakerIdRef = useRef(speakerId);
+  registrationModeRef.current = registrationMode;
+  speakerIdRef.current = speakerId;
+
+  const handleResult = (result: any) => {
+    if (registrationModeRef.current) {
+      setError(null);
+      setSpeakerId('');
+      setRegistrationMode(false);
+      setError(`등록 완료: ${result.anonymousId || '알 수 없음'}`);
+    } else {
+      onSpeakerIdentified(result);
+      // 인식된 텍스트가 있으면 콜백 호출
+      if (result.recognizedText) {
+        onTextRecognized(result.recognizedText, result.anonymousId);
+      }
+    }
+  };
+
+  const ensureServerConnected = async () => {
+    // 실시간으로 서버 연결 상태 재확인
+    let serverConnected = isConnected;
+    if (!serverConnected) {
+      console.log('🔄 서버 연결 상태 재확인...');
+      try {
+        const healthResponse = await fetch('http://127.0.0.1:8000/health', {
+          method: 'GET',
+          headers: { 'Content-Type': 'application/json' },
+          mode: 'cors'
+        });
+        serverConnected = healthResponse.ok;
+        console.log('🔄 재확인 결과:', serverConnected);
+      } catch (error) {
+        console.error('🔄 재확인 실패:', error);
+        serverConnected = false;
+      }
+    }
+    
+    if (!serverConnected) {
+      console.error('❌ 서버 연결 상태:', serverConnected);
+      setError('서버에 연결되어 있지 않습니다.');
+    }
+    return serverConnected;
+  };
+
+  // 쌓인 PCM 프레임을 스트림으로 전송 (이전 요청이 진행 중이면 다음 주기로 미룸)
+  const sendStreamFrames = async (final: boolean) => {
+    if (streamRequestRef.current) {
+      if (!final) {
+        return;
+      }
+      await streamRequestRef.current;
+    }
+    const pcm = concatPcm(pendingFramesRef.current);
+    pendingFramesRef.current = [];
+    // 보낼 음성이 없으면 중간 요청은 생략하고, 마지막 요청은 빈 본문으로라도 보내
+    // 서버가 남은 음성을 식별하고 스트림을 바로 정리하도록 함
+    if (pcm.length === 0 && !final) {
+      return;
+    }
+
+    const request = (async () => {
+      try {
+        const response = await fetch(
+          `http://127.0.0.1:8000/streams/${streamIdRef.current}/frames?threshold=0.7&final=${final}`,
+          {
+            method: 'POST',
+            headers: {
+              'Content-Type': 'application/octet-stream',
+              'X-API-Key': 'metaverse_demo_key'
+            },
+            body: pcm
+          }
+        );
+        if (!response.ok) {
+          throw new Error(`서버 오류: ${response.status} - ${await response.text()}`);
+        }
+        const result = await response.json();
+        // 새 식별 결과가 있을 때만 반영 (buffering은 음성 누적 중)
+        if (result.status === 'success') {
+          handleResult(result);
+        }
+      } catch (streamError) {
+        console.error('스트리밍 오류:', streamError);
+        setError(`네트워크 오류: ${(streamError as Error).message}`);
+      } finally {
+        streamRequestRef.current = null;
+      }
+    })();
+    streamRequestRef.current = request;
+    await request;
+  };
 
   const startRecording = useCallback(async () => {
     try {
-      console.log('🎙️ 녹음 시작 시도:', { isConnected, registrationMode, speakerId });
+      console.log('🎙️ 녹음 시작 시도:', { isConnected, registrationMode, speakerId, liveStreaming });
       setError(null);
       const stream = await navigator.mediaDevices.getUserMedia({ 
         audio: {
           echoCancellation: true,
           noiseSuppression: true,
+          channelCount: 1,
           sampleRate: 16000
         } 
       });
       
-      const mediaRecorder = new MediaRecorder(stream, {
-        mimeType: 'audio/webm'
-      });
-      
-      audioChunksRef.current = [];
+      // AudioWorklet에서 16kHz 모노 Int16으로 변환하며 녹음
+      const streaming = liveStreaming && !registrationMode;
+      pendingFramesRef.current = [];
+      const recorder = new PcmRecorder();
+      await recorder.start(stream, streaming ? (frame) => pendingFramesRef.current.push(frame) : undefined);
       
-      mediaRecorder.ondataavailable = (event) => {
-        if (event.data.size > 0) {
-          audioChunksRef.current.push(event.data);
-        }
-      };
-      
-      mediaRecorder.onstop = async () => {
-        const audioBlob = new Blob(audioChunksRef.current, { type: 'audio/webm' });
-        await processAudio(audioBlob);
-        stream.getTracks().forEach(track => track.stop());
-      };
-      
-      mediaRecorderRef.current = mediaRecorder;
-      mediaRecorder.start();
+      pcmRecorderRef.current = recorder;
+      mediaStreamRef.current = stream;
       onRecordingChange(true);
       
       // 타이머 시작
@@ -69,55 +160,101 @@ const VoiceRecorder: React.FC<VoiceRecorderProps> = ({
         setRecordingTime(prev => prev + 1);
       }, 1000);
       
-      // 10초 후 자동 중지
-      setTimeout(() => {
-        if (mediaRecorderRef.current && mediaRecorderRef.current.state === 'recording') {
+      if (streaming) {
+        // 0.5초마다 쌓인 프레임 전송 (서버가 1초 간격으로 최근 구간 식별)
+        streamIdRef.current = `stream_${Date.now()}_${Math.random().toString(36).slice(2, 8)}`;
+        streamTimerRef.current = setInterval(() => {
+          sendStreamFrames(false);
+        }, 500);
+      } else {
+        // 10초 후 자동 중지
+        autoStopRef.current = setTimeout(() => {
           stopRecording();
-        }
-      }, 10000);
+        }, 10000);
+      }
       
     } catch (err) {
       setError('마이크 접근이 거부되었습니다.');
       console.error('Error accessing microphone:', err);
     }
-  }, [onRecordingChange]);
+  }, [onRecordingChange, liveStreaming, registrationMode]);
 
-  const stopRecording = useCallback(() => {
-    if (mediaRecorderRef.current && mediaRecorderRef.current.state === 'recording') {
-      mediaRecorderRef.current.stop();
-      onRecordingChange(false);
-      
-      if (timerRef.current) {
-        clearInterval(timerRef.current);
-        timerRef.current = null;
+  const stopRecording = useCallback(async () => {
+    const recorder = pcmRecorderRef.current;
+    if (!recorder) {
+      return;
+    }
+    pcmRecorderRef.current = null;
+    onRecordingChange(false);
+    
+    for (const ref of [timerRef, autoStopRef, streamTimerRef]) {
+      if (ref.current) {
+        clearInterval(ref.current);
+        ref.current = null;
       }
     }
+    
+    const pcm = await recorder.stop();
+    mediaStreamRef.current?.getTracks().forEach(track => track.stop());
+    mediaStreamRef.current = null;
+    
+    if (streamIdRef.current) {
+      // 남은 프레임을 보내고 스트림 종료
+      await sendStreamFrames(true);
+      streamIdRef.current = null;
+    } else {
+      await processPcm(pcm);
+    }
   }, [onRecordingChange]);
 
-  const processAudio = async (audioBlob: Blob) => {
-    console.log('🔊 오디오 처리 시작:', { isConnected, size: audioBlob.size });
+  // 녹음된 16kHz PCM을 그대로 업로드 (서버 측 디코딩 없음)
+  const processPcm = async (pcm: Int16Array) => {
+    console.log('🔊 PCM 처리 시작:', { isConnected, samples: pcm.length });
+    if (!(await ensureServerConnected())) {
+      return;
+    }
     
-    // 실시간으로 서버 연결 상태 재확인
-    let serverConnected = isConnected;
-    if (!serverConnected) {
-      console.log('🔄 서버 연결 상태 재확인...');
-      try {
-        const healthResponse = await fetch('http://127.0.0.1:8000/health', {
-          method: 'GET',
-          headers: { 'Content-Type': 'application/json' },
-          mode: 'cors'
-        });
-        serverConnected = healthResponse.ok;
-        console.log('🔄 재확인 결과:', serverConnected);
-      } catch (error) {
-        console.error('🔄 재확인 실패:', error);
-        serverConnected = false;
+    setIsProcessing(true);
+    try {
+      const endpoint = registrationModeRef.current
+        ? `/speakers/register/pcm?anonymousId=${encodeURIComponent(speakerIdRef.current || `speaker_${Date.now()}`)}` +
+          `&metadata=${encodeURIComponent(JSON.stringify({ registeredAt: new Date().toISOString() }))}`
+        : '/speakers/identify/pcm?threshold=0.7';
+      
+      console.log('API 요청 시작:', { endpoint, payloadSize: pcm.byteLength });
+      
+      const response = await fetch(`http://127.0.0.1:8000${endpoint}`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/octet-stream',
+          'X-API-Key': 'metaverse_demo_key'
+        },
+        body: pcm
+      });
+      
+      console.log('서버 응답:', { status: response.status, statusText: response.statusText });
+      
+      if (!response.ok) {
+        const errorText = await response.text();
+        console.error('서버 오류 응답:', errorText);
+        throw new Error(`서버 오류: ${response.status} - ${errorText}`);
       }
+      
+      const result = await response.json();
+      console.log('응답 데이터:', result);
+      handleResult(result);
+    } catch (fetchError) {
+      console.error('Fetch 오류:', fetchError);
+      setError(`네트워크 오류: ${(fetchError as Error).message}`);
+    } finally {
+      setIsProcessing(false);
     }
+  };
+
+  const processAudio = async (audioBlob: Blob) => {
+    console.log('🔊 오디오 처리 시작:', { isConnected, size: audioBlob.size });
     
-    if (!serverConnected) {
-      console.error('❌ 서버 연결 상태:', serverConnected);
-      setError('서버에 연결되어 있지 않습니다.');
+    if (!(await ensureServerConnected())) {
       return;
     }
 
@@ -165,19 +302,7 @@ const VoiceRecorder: React.FC<VoiceRecorderProps> = ({
 
           const result = await response.json();
           console.log('응답 데이터:', result);
-          
-          if (registrationMode) {
-            setError(null);
-            setSpeakerId('');
-            setRegistrationMode(false);
-            setError(`등록 완료: ${result.anonymousId || '알 수 없음'}`);
-          } else {
-            onSpeakerIdentified(result);
-            // 인식된 텍스트가 있으면 콜백 호출
-            if (result.recognizedText) {
-              onTextRecognized(result.recognizedText, result.anonymousId);
-            }
-          }
+          handleResult(result);
         } catch (fetchError) {
           console.error('Fetch 오류:', fetchError);
           setError(`네트워크 오류: ${(fetchError as Error).message}`);
@@ -325,6 +450,24 @@ const VoiceRecorder: React.FC<VoiceRecorderProps> = ({
           </div>
         )}
         
+        {/* 실시간 스트리밍 (마이크 식별 모드일 때만) */}
+        {inputMode === 'mic' && !registrationMode && (
+          <div className="mb-4">
+            <button
+              onClick={() => setLiveStreaming(prev => !prev)}
+              disabled={isRecording}
+              className={`w-full px-4 py-2 rounded-lg text-sm transition-all flex items-center justify-center space-x-2 ${
+                liveStreaming
+                  ? 'bg-purple-500 text-white shadow-md'
+                  : 'bg-white/10 text-white/70 hover:bg-white/20'
+              } ${isRecording ? 'opacity-50 cursor-not-allowed' : ''}`}
+            >
+              <Radio className="w-5 h-5" />
+              <span>실시간 식별 {liveStreaming ? '켜짐' : '꺼짐'}</span>
+            </button>
+          </div>
+        )}
+        
         {/* 녹음 버튼 (마이크 모드일 때만) */}
         {inputMode === 'mic' && (
           <div className='flex items-center justify-center'>
@@ -395,7 +538,9 @@ const VoiceRecorder: React.FC<VoiceRecorderProps> = ({
           {inputMode === 'mic' ? (
             registrationMode 
               ? '새로운 화자를 등록하려면 화자 ID를 입력하고 10초간 말하세요.'
-              : '10초간 말하면 자동으로 화자를 식별합니다.'
+              : liveStreaming
+                ? '말하는 동안 1초마다 화자를 식별합니다. 버튼을 다시 누르면 종료됩니다.'
+                : '10초간 말하면 자동으로 화자를 식별합니다.'
           ) : (
             registrationMode
               ? 'WAV 파일을 업로드하여 새로운 화자를 등록하세요.'